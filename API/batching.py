@@ -0,0 +1,98 @@
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    """
+    Regroupe des requêtes unitaires concurrentes en un seul passage du modèle.
+
+    Chaque appel à submit() dépose son élément dans une file asyncio et attend
+    son propre résultat. Une tâche de fond prend le premier élément en attente,
+    collecte les suivants pendant au plus max_wait_ms (ou jusqu'à max_batch_size
+    éléments), puis appelle score_batch(items) une seule fois, hors de la boucle
+    d'événements via run_sync (pool de threads par défaut). score_batch doit
+    renvoyer un résultat par élément, dans le même ordre.
+    """
+
+    def __init__(self, score_batch, max_batch_size=64, max_wait_ms=2.0, run_sync=run_in_threadpool):
+        self.score_batch = score_batch
+        self.run_sync = run_sync
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        """Démarre la tâche de collecte ; à appeler depuis la boucle d'événements (startup)."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def submit(self, item):
+        """Ajoute un élément au prochain lot et attend son résultat."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        """Attend un premier élément puis complète le lot jusqu'à la taille ou au délai maximal."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Éléments déjà en file : pas d'attente
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Un appelant parti entre-temps (déconnexion) n'a plus besoin d'être scoré
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await self.run_sync(self.score_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from API.encoder import CATEGORICAL_FIELDS, NUMERIC_FIELDS, field_getter, normalize_category
+
+
+def artifact_fingerprint(*paths):
+    """
+    Empreinte des fichiers du modèle (chemin, date de modification, taille).
+    Change dès qu'un artefact est réécrit, ce qui invalide le cache lié.
+    """
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{os.path.basename(str(path))}:{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append(f"{os.path.basename(str(path))}:absent")
+    return "|".join(parts)
+
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier (indépendante de sa date de modification)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def customer_key(customer):
+    """
+    Clé canonique d'un client : tuple normalisé des 19 champs.
+    Les numériques sont convertis en float (12 et 12.0 donnent la même clé),
+    les catégories normalisées comme par l'encodeur (normalize_category).
+    """
+    get = field_getter(customer)
+    numeric = [get(field) for field in NUMERIC_FIELDS]
+    categorical = [get(field) for field in CATEGORICAL_FIELDS]
+    return (
+        *[float(value) if value is not None else None for value in numeric],
+        *[normalize_category(value) for value in categorical]
+    )
+
+
+class PredictionCache:
+    """
+    Cache LRU borné des prédictions, avec durée de vie (TTL) par entrée.
+
+    Le cache est lié à une version du modèle (ensure_model) : si la version
+    change, toutes les entrées sont invalidées. Les compteurs (hits, misses,
+    évictions, expirations) servent à dimensionner max_entries et ttl_seconds.
+    max_entries=0 désactive le cache.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.model_token = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def ensure_model(self, model_token):
+        """Lie le cache à une version du modèle ; vide le cache si elle a changé."""
+        with self._lock:
+            if model_token != self.model_token:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.model_token = model_token
+
+    def get(self, key):
+        """Retourne la valeur en cache, ou None (absente ou expirée)."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_many(self, keys):
+        """Comme get, pour une liste de clés, sous un seul verrou."""
+        if not self.enabled:
+            return [None] * len(keys)
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values.append(entry[1])
+        return values
+
+    def put(self, key, value):
+        """Ajoute ou rafraîchit une entrée, en évinçant la moins récemment utilisée si besoin."""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put_many(self, items):
+        """Comme put, pour une liste de couples (clé, valeur), sous un seul verrou."""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Compteurs du cache, pour le dimensionner."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_token": self.model_token
+            }
@@ -0,0 +1,97 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from API.encoder import CATEGORICAL_FIELDS, NUMERIC_FIELDS
+
+# Types MIME des formats colonnes acceptés et renvoyés par /predict/columnar
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ColumnarError(ValueError):
+    """Fichier illisible ou schéma incompatible avec celui de telco_clean.csv."""
+
+
+def read_table(body, input_format):
+    """Lit un flux Arrow IPC (ou un fichier Arrow) ou un fichier Parquet en pyarrow.Table."""
+    buffer = pa.py_buffer(body)
+    try:
+        if input_format == "parquet":
+            return pq.read_table(pa.BufferReader(buffer))
+        try:
+            return pa.ipc.open_stream(buffer).read_all()
+        except pa.ArrowInvalid:
+            return pa.ipc.open_file(buffer).read_all()
+    except (pa.ArrowException, OSError) as e:
+        raise ColumnarError(f"Fichier {input_format} illisible : {e}")
+
+
+def table_features(table):
+    """
+    Colonnes de la table prêtes pour FeatureEncoder.encode_columns, sans conversion
+    ligne par ligne : valeurs numériques en float32 et champs catégoriels encodés en
+    dictionnaire (codes, valeurs distinctes). Retourne (numeric, categorical, valid) où
+    valid marque les lignes sans valeur manquante.
+    """
+    missing = [field for field in NUMERIC_FIELDS + CATEGORICAL_FIELDS if field not in table.column_names]
+    if missing:
+        raise ColumnarError(f"Colonnes manquantes : {', '.join(missing)}")
+
+    valid = np.ones(table.num_rows, dtype=bool)
+    numeric = {}
+    for field in NUMERIC_FIELDS:
+        column = table.column(field)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            # Chaînes vides (TotalCharges d'un nouveau client) traitées comme absentes
+            column = pc.if_else(pc.equal(pc.utf8_trim_whitespace(column), ""), None, column)
+        try:
+            values = pc.cast(column, pa.float32())
+        except pa.ArrowInvalid as e:
+            raise ColumnarError(f"Colonne {field} non numérique : {e}")
+        valid &= ~pc.is_null(values).to_numpy(zero_copy_only=False)
+        numeric[field] = values.to_numpy(zero_copy_only=False)
+
+    categorical = {}
+    for field in CATEGORICAL_FIELDS:
+        column = table.column(field).combine_chunks()
+        if not pa.types.is_dictionary(column.type):
+            if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+                column = pc.cast(column, pa.string())
+            column = pc.dictionary_encode(column)
+        valid &= ~column.is_null().to_numpy(zero_copy_only=False)
+        codes = column.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+        categorical[field] = (codes, column.dictionary.cast(pa.string()).to_pylist())
+
+    return numeric, categorical, valid
+
+
+def scores_table(table, valid, is_churn, churn_proba, model_version):
+    """
+    Table de résultats (index, customerID s'il est présent, churn, churn_proba) ;
+    les lignes invalides ont des scores nuls. La version du modèle et le nombre
+    de lignes rejetées sont inscrits dans les métadonnées du schéma.
+    """
+    columns = {"index": pa.array(np.arange(table.num_rows, dtype=np.int64))}
+    if "customerID" in table.column_names:
+        columns["customerID"] = table.column("customerID")
+    columns["churn"] = pa.array(is_churn, mask=~valid)
+    columns["churn_proba"] = pa.array(churn_proba, mask=~valid)
+    return pa.table(columns).replace_schema_metadata({
+        "model_version": model_version,
+        "rows_rejected": str(int((~valid).sum()))
+    })
+
+
+def write_table(table, output_format):
+    """Sérialise une table en flux Arrow IPC ou en fichier Parquet."""
+    sink = pa.BufferOutputStream()
+    if output_format == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,173 @@
+"""
+Compaction d'une version du modèle en artefact dense (forest_arrays.joblib).
+
+Les arbres sont réécrits en tableaux float32 / int32 (un seul tableau d'enfants,
+aucune métadonnée scikit-learn / XGBoost), avec les colonnes d'entraînement et
+les importances : l'API (FAST_STARTUP=1 ou INFERENCE_ENGINE=numpy) et la page
+de prédiction le chargent à la place du modèle joblib. En option, les arbres dont
+le retrait ne change presque pas les prédictions sur le jeu de validation sont
+élagués. Le rapport compare taille, temps de chargement, temps d'inférence et
+exactitude au modèle d'origine.
+
+Lancer depuis la racine du projet :
+    python -m API.compact
+    python -m API.compact --prune-tolerance 0.002 --max-proba-shift 0.01 --report compact_report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from API.cache import file_digest
+from API.encoder import FeatureEncoder, get_churn_class_index
+from API.forest import ArrayForest
+from API.registry import FOREST_FILE, ModelRegistry
+
+# Chargements mesurés dans un interpréteur neuf : les imports déclenchés par le dépickling comptent
+LOAD_MODEL = "import joblib, time; t = time.perf_counter(); joblib.load({model!r}); joblib.load({columns!r}); print(time.perf_counter() - t)"
+LOAD_COMPACT = "from API.forest import ArrayForest; import time; t = time.perf_counter(); ArrayForest.load({path!r}); print(time.perf_counter() - t)"
+
+
+def _churn_proba(forest, leaf_sums, n_trees):
+    if forest.kind == "xgboost":
+        return 1.0 / (1.0 + np.exp(-(forest.base_margin + leaf_sums)))
+    return leaf_sums / n_trees
+
+
+def prune_trees(forest, X, y, max_accuracy_drop, max_proba_shift):
+    """
+    Élagage glouton : retire à chaque tour l'arbre dont l'absence modifie le moins les
+    probabilités de validation, tant que l'exactitude ne baisse pas de plus de max_accuracy_drop
+    et que l'écart moyen des probabilités au modèle complet reste sous max_proba_shift.
+    Retourne les indices des arbres conservés.
+    """
+    values = forest.tree_values(X).astype(np.float64)
+    kept = np.ones(forest.n_trees, dtype=bool)
+    sums = values.sum(axis=1)
+    reference = _churn_proba(forest, sums, forest.n_trees)
+    reference_accuracy = ((reference >= 0.5) == y).mean()
+
+    while kept.sum() > 1:
+        candidates = np.flatnonzero(kept)
+        # Une colonne par arbre candidat : prédictions sans cet arbre
+        without = sums[:, None] - values[:, candidates]
+        proba = _churn_proba(forest, without, len(candidates) - 1)
+        shifts = np.abs(proba - reference[:, None]).mean(axis=0)
+        best = int(np.argmin(shifts))
+        accuracy = ((proba[:, best] >= 0.5) == y).mean()
+        shift = shifts[best]
+        if reference_accuracy - accuracy > max_accuracy_drop or shift > max_proba_shift:
+            break
+        kept[candidates[best]] = False
+        sums = without[:, best]
+    return np.flatnonzero(kept)
+
+
+def _median_seconds(code, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return float(np.median(timings))
+
+
+def _inference_ms(predict, X, single_calls=200):
+    """Latence médiane d'un client et durée du lot complet, en millisecondes."""
+    single = []
+    for i in range(single_calls):
+        t0 = time.perf_counter()
+        predict(X[i % len(X):i % len(X) + 1])
+        single.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    predict(X)
+    return float(np.median(single)) * 1000, (time.perf_counter() - t0) * 1000
+
+
+def compaction_report(model, compact, n_original, model_path, columns_path, compact_path, X, y, churn_index):
+    """Taille, chargement, inférence et exactitude : modèle d'origine contre artefact compact."""
+    original_proba = model.predict_proba(X)[:, churn_index]
+    compact_proba = compact.predict_proba(X)[:, churn_index]
+    model_single, model_full = _inference_ms(model.predict_proba, X)
+    compact_single, compact_full = _inference_ms(compact.predict_proba, X)
+    original_accuracy = float(((original_proba >= 0.5) == y).mean())
+    compact_accuracy = float(((compact_proba >= 0.5) == y).mean())
+    return {
+        "trees": {"original": int(n_original), "compact": int(compact.n_trees)},
+        "nodes_compact": int(len(compact.feature)),
+        "size_bytes": {"original": os.path.getsize(model_path) + os.path.getsize(columns_path),
+                       "compact": os.path.getsize(compact_path)},
+        "load_seconds": {"original": _median_seconds(LOAD_MODEL.format(model=model_path, columns=columns_path)),
+                         "compact": _median_seconds(LOAD_COMPACT.format(path=compact_path))},
+        "inference_ms": {"original_single": model_single, "compact_single": compact_single,
+                         "original_batch": model_full, "compact_batch": compact_full, "batch_rows": len(X)},
+        "accuracy": {"original": original_accuracy, "compact": compact_accuracy,
+                     "delta": compact_accuracy - original_accuracy},
+        "proba_abs_diff": {"mean": float(np.abs(compact_proba - original_proba).mean()),
+                           "max": float(np.abs(compact_proba - original_proba).max())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default="model")
+    parser.add_argument("--version", help="version à compacter (par défaut la version active)")
+    parser.add_argument("--validation", default="APP/data/telco_clean.csv", help="CSV avec la colonne Churn")
+    parser.add_argument("--prune-tolerance", type=float, default=None,
+                        help="baisse d'exactitude tolérée pour l'élagage (absent = pas d'élagage)")
+    parser.add_argument("--max-proba-shift", type=float, default=0.01,
+                        help="écart moyen maximal des probabilités dû à l'élagage")
+    parser.add_argument("--report", help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    registry = ModelRegistry(args.root)
+    version = args.version or registry.active_version()
+    model_path, columns_path = registry.model_path(version), registry.columns_path(version)
+    compact_path = os.path.join(registry.version_dir(version), FOREST_FILE)
+
+    model = joblib.load(model_path)
+    training_columns = joblib.load(columns_path)
+    churn_index = get_churn_class_index(model)
+
+    validation = pd.read_csv(args.validation)
+    customers = validation.drop(columns=["customerID", "Churn"], errors="ignore").to_dict("records")
+    X = FeatureEncoder(training_columns).encode_many(customers)
+    # Churn codé 'Yes' / 'No' ou 1 / 0
+    y = validation["Churn"].isin(["Yes", 1]).to_numpy()
+
+    forest = ArrayForest.from_model(model, churn_index)
+    n_original = forest.n_trees
+    if args.prune_tolerance is not None:
+        forest = forest.select_trees(prune_trees(forest, X, y, args.prune_tolerance, args.max_proba_shift))
+        # Inscrit dans l'artefact : l'empreinte reste celle du modèle complet dont il est tiré
+        forest.pruning = {"original_trees": int(n_original), "trees": int(forest.n_trees),
+                          "accuracy_tolerance": args.prune_tolerance, "max_proba_shift": args.max_proba_shift}
+    forest.feature_names = [str(column) for column in training_columns]
+    forest.save(compact_path, source_digest=file_digest(model_path))
+
+    report = {"version": version, "artifact": compact_path, "pruning": forest.pruning,
+              **compaction_report(model, forest, n_original, model_path, columns_path, compact_path, X, y, churn_index)}
+
+    size, load, inference, accuracy = report["size_bytes"], report["load_seconds"], report["inference_ms"], report["accuracy"]
+    print(f"Version {version} -> {compact_path}")
+    print(f"  arbres        : {n_original} -> {forest.n_trees} ({len(forest.feature)} nœuds)")
+    print(f"  taille        : {size['original'] / 1024:.1f} Ko -> {size['compact'] / 1024:.1f} Ko")
+    print(f"  chargement    : {load['original'] * 1000:.1f} ms -> {load['compact'] * 1000:.1f} ms")
+    print(f"  1 client      : {inference['original_single']:.3f} ms -> {inference['compact_single']:.3f} ms")
+    print(f"  {inference['batch_rows']} clients : {inference['original_batch']:.1f} ms -> {inference['compact_batch']:.1f} ms")
+    print(f"  exactitude    : {accuracy['original']:.4f} -> {accuracy['compact']:.4f} ({accuracy['delta']:+.4f})")
+    print(f"  écart proba   : moyen {report['proba_abs_diff']['mean']:.2e}, max {report['proba_abs_diff']['max']:.2e}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import numpy as np
+
+from API.forest import ArrayForest
+
+# Champs du formulaire client, dans l'ordre de ChurnPredictionData
+NUMERIC_FIELDS = ["SeniorCitizen", "tenure", "MonthlyCharges", "TotalCharges"]
+CATEGORICAL_FIELDS = [
+    "gender", "Partner", "Dependents", "PhoneService", "MultipleLines", "InternetService",
+    "OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV",
+    "StreamingMovies", "Contract", "PaperlessBilling", "PaymentMethod"
+]
+
+# Valeurs saisies en français ramenées aux catégories vues à l'entraînement
+VALUE_ALIASES = {"Oui": "Yes", "Non": "No"}
+
+
+def normalize_category(value):
+    """
+    Valeur catégorielle telle que l'encodeur la cherche : espaces en bord retirés, alias
+    ramenés à Yes/No. Partagée avec la clé du cache, pour qu'une même clé donne le même encodage.
+    """
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    return VALUE_ALIASES.get(value, value)
+
+
+def field_getter(customer):
+    """Accès uniforme aux champs d'un dictionnaire ou d'un modèle pydantic."""
+    if isinstance(customer, dict):
+        return customer.get
+    # Les champs d'un modèle pydantic sont stockés dans son __dict__
+    return vars(customer).get
+
+
+class FeatureEncoder:
+    """
+    Encodeur one-hot compilé à partir de training_columns.
+
+    Au chargement, chaque colonne numérique et chaque couple (champ, catégorie)
+    est associé à son indice de colonne ; l'encodage d'un client se réduit ensuite
+    à quelques écritures dans une ligne float32, sans DataFrame.
+    Une catégorie inconnue (ou de référence, supprimée par get_dummies) laisse
+    toutes les colonnes du champ à 0, comme pd.get_dummies + reindex.
+    """
+
+    def __init__(self, training_columns):
+        self.columns = list(training_columns)
+        self.n_features = len(self.columns)
+        self.numeric_index = {}
+        self.category_index = {}
+
+        for idx, column in enumerate(self.columns):
+            if column in NUMERIC_FIELDS:
+                self.numeric_index[column] = idx
+                continue
+            for field in CATEGORICAL_FIELDS:
+                if column.startswith(field + "_"):
+                    self.category_index[(field, column[len(field) + 1:])] = idx
+                    break
+
+        # Listes figées pour la boucle d'encodage
+        self._numeric_items = list(self.numeric_index.items())
+        self._categorical_fields = sorted({field for field, _ in self.category_index})
+
+    def allocate(self, n_rows=1):
+        """Alloue une matrice de sortie vide (n_rows, n_features) en float32."""
+        return np.zeros((n_rows, self.n_features), dtype=np.float32)
+
+    def encode_into(self, customer, row):
+        """Écrit un client (dict ou modèle pydantic) dans une ligne préallouée et remise à zéro."""
+        get = field_getter(customer)
+        for field, idx in self._numeric_items:
+            value = get(field)
+            row[idx] = float(value) if value is not None else 0.0
+        for field in self._categorical_fields:
+            value = get(field)
+            idx = self.category_index.get((field, normalize_category(value)))
+            if idx is not None:
+                row[idx] = 1.0
+        return row
+
+    def encode_one(self, customer):
+        """Encode un client dans une matrice (1, n_features)."""
+        matrix = self.allocate(1)
+        self.encode_into(customer, matrix[0])
+        return matrix
+
+    def encode_many(self, customers):
+        """Encode une séquence de clients dans une seule matrice (n, n_features)."""
+        matrix = self.allocate(len(customers))
+        for row, customer in zip(matrix, customers):
+            self.encode_into(customer, row)
+        return matrix
+
+    def encode_columns(self, n_rows, numeric, categorical):
+        """
+        Encode des colonnes entières, sans passer par un client à la fois :
+        numeric[champ] est un tableau de valeurs, categorical[champ] un couple
+        (codes, dictionnaire) où codes[i] indexe la valeur de la ligne i dans le
+        dictionnaire (-1 pour une valeur absente, qui laisse le champ à 0).
+        """
+        matrix = self.allocate(n_rows)
+        rows = np.arange(n_rows)
+        for field, idx in self._numeric_items:
+            matrix[:, idx] = numeric[field]
+        for field in self._categorical_fields:
+            codes, dictionary = categorical[field]
+            # Colonne de chaque valeur du dictionnaire (-1 : catégorie inconnue ou de référence), puis -1 pour les absents
+            targets = np.array(
+                [self.category_index.get((field, normalize_category(value)), -1) for value in dictionary] + [-1],
+                dtype=np.int64
+            )
+            columns = targets[np.where(codes < 0, len(dictionary), codes)]
+            known = columns >= 0
+            matrix[rows[known], columns[known]] = 1.0
+        return matrix
+
+
+def get_churn_class_index(model):
+    """
+    Retourne l'indice de la classe 'churn' dans model.classes_
+    (le modèle peut avoir été entraîné avec 'Yes'/'No' ou 1/0).
+    """
+    classes = list(model.classes_)
+    for label in ("Yes", 1):
+        if label in classes:
+            return classes.index(label)
+    return len(classes) - 1
+
+
+def top_feature_importances(model, training_columns, n=10):
+    """Retourne les n variables les plus importantes du modèle sous forme de liste de dictionnaires."""
+    if not hasattr(model, "feature_importances_"):
+        return None
+    importances = np.asarray(model.feature_importances_)
+    order = np.argsort(-importances, kind="stable")[:n]
+    columns = list(training_columns)
+    return [{"Feature": columns[i], "Importance": float(importances[i])} for i in order]
+
+
+def format_prediction(is_churn, churn_proba):
+    """Formate une prédiction comme l'API /predict."""
+    return {
+        "prediction": "Le client va se désabonner" if is_churn else "Le client va rester",
+        "probabilité": f"{churn_proba * 100:.2f}%"
+    }
+
+
+def format_contributions(bias, contributions, training_columns):
+    """Formate la décomposition d'une prédiction : biais et contribution de chaque colonne d'entraînement."""
+    values = np.round(np.asarray(contributions, dtype=np.float64), 6).tolist()
+    return {"bias": round(float(bias), 6), "features": dict(zip(training_columns, values))}
+
+
+class ChurnPredictor:
+    """
+    Regroupe le modèle, l'encodeur compilé et les importances (calculées une seule fois).
+    Le label est dérivé du même appel predict_proba que la probabilité.
+
+    engine="model" utilise model.predict_proba ; engine="numpy" utilise le moteur
+    ArrayForest (arbres aplatis en tableaux NumPy), plus rapide sur de petits lots.
+    Un ArrayForest déjà chargé (par exemple projeté en mémoire) peut être fourni via `forest`.
+    """
+
+    def __init__(self, model, training_columns, engine="model", forest=None):
+        self.model = model
+        self.training_columns = list(training_columns)
+        self.encoder = FeatureEncoder(training_columns)
+        self.churn_index = get_churn_class_index(model)
+        self.feature_importances = top_feature_importances(model, training_columns)
+        self.engine = engine
+        # Moteur NumPy servant aux décompositions des prédictions (construit au premier besoin)
+        self._explainer = None
+        if engine == "numpy":
+            self.scorer = forest if forest is not None else ArrayForest.from_model(model, self.churn_index)
+        elif engine == "model":
+            self.scorer = model
+        else:
+            raise ValueError(f"Moteur d'inférence inconnu : {engine} (model ou numpy)")
+
+    def predict_matrix(self, X):
+        """Retourne (is_churn, churn_proba) pour une matrice déjà encodée."""
+        probas = self.scorer.predict_proba(X)
+        is_churn = probas.argmax(axis=1) == self.churn_index
+        return is_churn, probas[:, self.churn_index]
+
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            self._explainer = self.scorer if self.engine == "numpy" else ArrayForest.from_model(self.model, self.churn_index)
+        return self._explainer
+
+    def explain_matrix(self, X):
+        """
+        Décompose la probabilité de churn de chaque ligne : biais + une contribution par colonne
+        d'entraînement, de somme égale à la probabilité. Retourne (biais (n,), contributions (n, n_colonnes)).
+        """
+        forest = self.explainer
+        bias, contributions = forest.contributions(X)
+        if forest.kind == "xgboost":
+            # Contributions en marge (log-odds) ramenées aux probabilités, proportionnellement
+            margin = bias + contributions.sum(axis=1)
+            proba, bias_proba = 1.0 / (1.0 + np.exp(-margin)), 1.0 / (1.0 + np.exp(-bias))
+            gap = margin - bias
+            small = np.abs(gap) < 1e-12
+            ratio = np.where(small, bias_proba * (1.0 - bias_proba), (proba - bias_proba) / np.where(small, 1.0, gap))
+            bias, contributions = bias_proba, contributions * ratio[:, None]
+            if self.churn_index != forest.churn_index:
+                bias, contributions = 1.0 - bias, -contributions
+        return bias, contributions
+
+    def explain_many(self, customers):
+        """Décomposition des probabilités de churn d'une séquence de clients (voir explain_matrix)."""
+        return self.explain_matrix(self.encoder.encode_many(customers))
+
+    def predict_one(self, customer):
+        """Retourne (is_churn, churn_proba) pour un client."""
+        is_churn, churn_proba = self.predict_matrix(self.encoder.encode_one(customer))
+        return bool(is_churn[0]), float(churn_proba[0])
+
+    def predict_many(self, customers):
+        """Retourne (is_churn, churn_proba) pour une séquence de clients, en un seul passage du modèle."""
+        if not customers:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+        return self.predict_matrix(self.encoder.encode_many(customers))
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+
+def default_model_threads(inference_threads, processes=1):
+    """Threads internes du modèle pour que pool x modèle x processus ne dépasse pas le nombre de cœurs."""
+    return max(1, (os.cpu_count() or 1) // max(1, inference_threads * processes))
+
+
+def pin_model_threads(model, n_threads):
+    """
+    Fixe le parallélisme interne du modèle (n_jobs de scikit-learn, nthread de XGBoost,
+    y compris dans un Pipeline). Retourne les paramètres modifiés.
+    """
+    if not n_threads or not hasattr(model, "get_params"):
+        return {}
+    pinned = {name: n_threads for name in model.get_params() if name == "n_jobs" or name.endswith("__n_jobs")}
+    if pinned:
+        model.set_params(**pinned)
+    return pinned
+
+
+class InferenceExecutor:
+    """
+    Pool borné de threads réservé aux appels du modèle.
+
+    Les endpoints asynchrones y déposent le travail CPU (validation, encodage,
+    predict_proba) et attendent le résultat sans bloquer la boucle d'événements.
+    Au-delà de `threads` appels simultanés, les suivants attendent leur tour dans
+    la file du pool au lieu de se partager les cœurs. threads=0 conserve l'ancien
+    comportement : pool partagé des endpoints synchrones (anyio).
+    """
+
+    def __init__(self, threads):
+        self.threads = threads
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix="inference") if threads > 0 else None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+
+    async def run(self, fn, *args):
+        """Exécute fn(*args) dans le pool et attend son résultat."""
+        with self._lock:
+            self.submitted += 1
+        try:
+            if self._pool is None:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool, functools.partial(fn, *args))
+        finally:
+            with self._lock:
+                self.completed += 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            in_flight = self.submitted - self.completed
+        return {
+            "threads": self.threads,
+            "in_flight": in_flight,
+            # Appels en attente d'un thread libre
+            "queued": max(0, in_flight - self.threads) if self.threads > 0 else 0,
+            "completed": self.completed
+        }
@@ -0,0 +1,405 @@
+import argparse
+import json
+
+import joblib
+import numpy as np
+
+
+class ArrayForest:
+    """
+    Moteur d'inférence NumPy pour les forêts d'arbres (XGBoost ou scikit-learn).
+
+    Au chargement, tous les arbres sont aplatis dans des tableaux contigus
+    (feature, threshold, left, right, value) ; un nœud feuille pointe sur
+    lui-même. La prédiction parcourt ensuite tous les arbres pour toutes les
+    lignes en même temps, niveau par niveau (max_depth itérations vectorisées),
+    sans appel Python par arbre.
+
+    - XGBoost (binary:logistic) : marge = base_margin + somme des feuilles, puis sigmoïde,
+      branche gauche si x < seuil, valeurs manquantes selon default_left.
+    - scikit-learn (RandomForest / ExtraTrees) : moyenne des probabilités des feuilles,
+      branche gauche si x <= seuil.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 max_depth, classes, kind, churn_index=1, base_margin=0.0, node_value=None, block_size=512):
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.default_left = default_left
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.kind = kind
+        self.churn_index = churn_index
+        self.base_margin = base_margin
+        # Valeur de chaque nœud (interne ou feuille), pour la décomposition des prédictions
+        self.node_value = value if node_value is None else node_value
+        self.block_size = block_size
+        self.n_trees = len(roots)
+        # Empreinte SHA-256 du modèle source, renseignée par save()
+        self.source_digest = None
+        # Colonnes d'entraînement et importances du modèle source : avec elles, l'artefact
+        # suffit à servir les prédictions sans charger le modèle ni sa librairie
+        self.feature_names = None
+        self.feature_importances_ = None
+        # Par arbre et par variable : gain cumulé des découpages et nombre de découpages,
+        # pour recalculer les importances d'un sous-ensemble d'arbres (select_trees)
+        self.tree_gain = None
+        self.tree_splits = None
+        # Élagage appliqué (arbres d'origine et conservés, tolérances), None si complet ; renseigné par API.compact
+        self.pruning = None
+        # Enfants gauche et droit entrelacés : seul tableau d'enfants stocké (left / right en sont des vues)
+        self.children = np.empty(2 * len(left), dtype=np.int32)
+        self.children[0::2] = left
+        self.children[1::2] = right
+
+    @property
+    def left(self):
+        return self.children[0::2]
+
+    @property
+    def right(self):
+        return self.children[1::2]
+
+    @classmethod
+    def from_model(cls, model, churn_index=None, block_size=512):
+        """Aplatit un XGBClassifier ou une forêt scikit-learn déjà entraînés."""
+        if hasattr(model, "get_booster"):
+            forest = cls._from_xgboost(model, block_size)
+        elif hasattr(model, "estimators_"):
+            forest = cls._from_sklearn(model, churn_index, block_size)
+        else:
+            raise TypeError(f"Modèle non supporté par le moteur NumPy : {type(model).__name__}")
+        if hasattr(model, "feature_importances_"):
+            forest.feature_importances_ = np.asarray(model.feature_importances_)
+        return forest
+
+    @classmethod
+    def _from_xgboost(cls, model, block_size):
+        raw = json.loads(model.get_booster().save_raw("json"))
+        learner = raw["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Objectif XGBoost non supporté par le moteur NumPy : {objective}")
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        n_features = int(learner["learner_model_param"]["num_feature"])
+        trees = learner["gradient_booster"]["model"]["trees"]
+
+        parts = []
+        for tree in trees:
+            left = np.asarray(tree["left_children"], dtype=np.int32)
+            is_leaf = left == -1
+            splits = np.asarray(tree["split_indices"], dtype=np.int64)[~is_leaf]
+            parts.append({
+                "feature": np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int32)),
+                "threshold": np.asarray(tree["split_conditions"], dtype=np.float32),
+                "left": left,
+                "right": np.asarray(tree["right_children"], dtype=np.int32),
+                "is_leaf": is_leaf,
+                "leaf_value": np.where(is_leaf, np.asarray(tree["split_conditions"], dtype=np.float32), 0),
+                "node_value": _xgboost_node_means(left, np.asarray(tree["right_children"], dtype=np.int32),
+                                                  np.asarray(tree["split_conditions"], dtype=np.float64),
+                                                  np.asarray(tree["sum_hessian"], dtype=np.float64)),
+                "default_left": np.asarray(tree["default_left"], dtype=bool),
+                # Importance "gain" de XGBoost : gain moyen des découpages de chaque variable
+                "gain": np.bincount(splits, weights=np.asarray(tree["loss_changes"], dtype=np.float64)[~is_leaf],
+                                    minlength=n_features),
+                "splits": np.bincount(splits, minlength=n_features).astype(np.float64),
+            })
+
+        # La sigmoïde donne la probabilité de la classe d'indice 1
+        forest = cls._concatenate(parts, classes=np.asarray(model.classes_), kind="xgboost",
+                                  churn_index=1, block_size=block_size)
+        forest.base_margin = float(np.log(base_score / (1.0 - base_score)))
+        return forest
+
+    @classmethod
+    def _from_sklearn(cls, model, churn_index, block_size):
+        classes = np.asarray(model.classes_)
+        if churn_index is None:
+            churn_index = len(classes) - 1
+
+        parts = []
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            left = tree.children_left.astype(np.int32)
+            is_leaf = left == -1
+            # Proportion de la classe churn dans chaque nœud (comptes ou fractions selon la version)
+            counts = tree.value[:, 0, :]
+            fractions = (counts[:, churn_index] / counts.sum(axis=1)).astype(np.float32)
+            parts.append({
+                "feature": np.where(is_leaf, 0, tree.feature).astype(np.int32),
+                "threshold": _float32_floor(tree.threshold),
+                "left": left,
+                "right": tree.children_right.astype(np.int32),
+                "is_leaf": is_leaf,
+                "leaf_value": np.where(is_leaf, fractions, 0).astype(np.float32),
+                "node_value": fractions,
+                "default_left": np.zeros(len(left), dtype=bool),
+                # Importance scikit-learn : moyenne des importances des arbres non réduits à une feuille
+                "gain": estimator.feature_importances_.astype(np.float64),
+                "splits": np.full(model.n_features_in_, float(tree.node_count > 1)),
+            })
+
+        return cls._concatenate(parts, classes=classes, kind="sklearn", churn_index=churn_index,
+                                block_size=block_size)
+
+    @classmethod
+    def _concatenate(cls, parts, classes, kind, churn_index, block_size):
+        """Concatène les arbres avec des indices de nœuds globaux ; les feuilles bouclent sur elles-mêmes."""
+        offsets = np.cumsum([0] + [len(p["left"]) for p in parts])
+        roots = offsets[:-1].astype(np.int32)
+
+        left, right, max_depth = [], [], 0
+        for offset, part in zip(offsets, parts):
+            own = np.arange(len(part["left"]), dtype=np.int32)
+            left.append(np.where(part["is_leaf"], own, part["left"]) + offset)
+            right.append(np.where(part["is_leaf"], own, part["right"]) + offset)
+            max_depth = max(max_depth, _tree_depth(part["left"], part["right"]))
+
+        forest = cls(
+            feature=np.concatenate([p["feature"] for p in parts]),
+            threshold=np.concatenate([p["threshold"] for p in parts]),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            value=np.concatenate([p["leaf_value"] for p in parts]),
+            default_left=np.concatenate([p["default_left"] for p in parts]),
+            roots=roots,
+            max_depth=max_depth,
+            classes=classes,
+            kind=kind,
+            churn_index=churn_index,
+            node_value=np.concatenate([p["node_value"] for p in parts]),
+            block_size=block_size,
+        )
+        forest.tree_gain = np.vstack([p["gain"] for p in parts])
+        forest.tree_splits = np.vstack([p["splits"] for p in parts])
+        return forest
+
+    def tree_importances(self):
+        """Importances calculées sur les arbres du moteur (gain moyen par découpage, total ramené à 1)."""
+        splits = self.tree_splits.sum(axis=0)
+        importances = np.divide(self.tree_gain.sum(axis=0), splits, out=np.zeros(len(splits)), where=splits > 0)
+        total = importances.sum()
+        return importances / total if total > 0 else importances
+
+    def _descend(self, X):
+        """
+        Parcours niveau par niveau : produit, à chaque niveau, les nœuds courants puis
+        les nœuds atteints (matrices (n_rows, n_trees)) et l'indice de ligne * n_features.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        index_dtype = np.int32 if n_rows * n_features < 2 ** 31 else np.int64
+        row_base = (np.arange(n_rows, dtype=index_dtype) * n_features)[:, None]
+        has_missing = self.kind == "xgboost" and np.isnan(flat).any()
+
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat.take(row_base + self.feature.take(nodes))
+            threshold = self.threshold.take(nodes)
+            if self.kind == "sklearn":
+                go_right = x > threshold
+            elif has_missing:
+                go_right = ~((x < threshold) | (np.isnan(x) & self.default_left.take(nodes)))
+            else:
+                go_right = x >= threshold
+            # children[2 * nœud] = enfant gauche, children[2 * nœud + 1] = enfant droit
+            next_nodes = self.children.take((nodes << 1) + go_right)
+            yield nodes, next_nodes, row_base
+            nodes = next_nodes
+
+    def apply(self, X):
+        """Indice global de la feuille atteinte dans chaque arbre, matrice (n_rows, n_trees)."""
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _, nodes, _ in self._descend(X):
+            pass
+        return nodes
+
+    def contributions(self, X):
+        """
+        Décomposition des prédictions le long des chemins (méthode de Saabas) :
+        chaque nœud traversé attribue à sa variable de séparation l'écart de valeur
+        entre le nœud et son enfant. Retourne (biais (n_rows,), contributions (n_rows, n_features))
+        avec biais + somme des contributions = marge (XGBoost) ou probabilité churn (scikit-learn).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        scale = 1.0 if self.kind == "xgboost" else 1.0 / self.n_trees
+        bias = float(self.node_value[self.roots].sum(dtype=np.float64)) * scale + self.base_margin
+        contributions = np.zeros((n_rows, n_features), dtype=np.float64)
+        for start in range(0, n_rows, self.block_size):
+            block = X[start:start + self.block_size]
+            flat = contributions[start:start + len(block)].reshape(-1)
+            for nodes, next_nodes, row_base in self._descend(block):
+                # Une feuille boucle sur elle-même : écart nul, sans effet sur la variable 0
+                delta = self.node_value.take(next_nodes) - self.node_value.take(nodes)
+                target = (row_base + self.feature.take(nodes)).ravel()
+                flat += np.bincount(target, weights=delta.ravel(), minlength=flat.size)
+        contributions *= scale
+        return np.full(n_rows, bias), contributions
+
+    def churn_proba(self, X):
+        """Probabilité de la classe churn pour chaque ligne (parcours par blocs de block_size lignes)."""
+        n_rows = len(X)
+        result = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, self.block_size):
+            leaves = self.apply(X[start:start + self.block_size])
+            leaf_sum = self.value[leaves].sum(axis=1, dtype=np.float64)
+            if self.kind == "xgboost":
+                result[start:start + len(leaves)] = 1.0 / (1.0 + np.exp(-(self.base_margin + leaf_sum)))
+            else:
+                result[start:start + len(leaves)] = leaf_sum / self.n_trees
+        return result
+
+    def tree_values(self, X):
+        """Valeur de la feuille atteinte dans chaque arbre, matrice (n_rows, n_trees) ; sert à l'élagage."""
+        return np.vstack([
+            self.value[self.apply(X[start:start + self.block_size])]
+            for start in range(0, len(X), self.block_size)
+        ])
+
+    def select_trees(self, trees):
+        """Nouveau moteur limité aux arbres d'indices `trees` (dans l'ordre d'origine)."""
+        trees = np.sort(np.asarray(trees, dtype=np.int64))
+        bounds = np.append(self.roots, len(self.feature)).astype(np.int64)
+        sizes = bounds[trees + 1] - bounds[trees]
+        nodes = np.concatenate([np.arange(bounds[t], bounds[t + 1]) for t in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        # Décalage des indices de nœuds de chaque arbre conservé vers sa nouvelle position
+        shift = np.repeat(roots - bounds[trees], sizes)
+        children = self.children.reshape(-1, 2)[nodes] + shift[:, None]
+
+        forest = ArrayForest(
+            feature=self.feature[nodes],
+            threshold=self.threshold[nodes],
+            left=children[:, 0].astype(np.int32),
+            right=children[:, 1].astype(np.int32),
+            value=self.value[nodes],
+            default_left=self.default_left[nodes],
+            roots=roots.astype(np.int32),
+            max_depth=self.max_depth,
+            classes=self.classes_,
+            kind=self.kind,
+            churn_index=self.churn_index,
+            base_margin=self.base_margin,
+            node_value=self.node_value[nodes],
+            block_size=self.block_size,
+        )
+        forest.feature_names = self.feature_names
+        forest.tree_gain = self.tree_gain[trees]
+        forest.tree_splits = self.tree_splits[trees]
+        # Importances des seuls arbres conservés, et non celles du modèle complet
+        forest.feature_importances_ = forest.tree_importances().astype(np.float32)
+        return forest
+
+    def predict_proba(self, X):
+        """Même contrat que model.predict_proba pour un classifieur binaire (colonnes dans l'ordre de classes_)."""
+        churn = self.churn_proba(X)
+        probas = np.empty((len(churn), 2), dtype=np.float64)
+        probas[:, self.churn_index] = churn
+        probas[:, 1 - self.churn_index] = 1.0 - churn
+        return probas
+
+    def save(self, path, source_digest=None):
+        """
+        Sauvegarde les tableaux sans compression : joblib.load(path, mmap_mode='r')
+        les projette alors en mémoire, et tous les processus qui chargent le même
+        fichier partagent les mêmes pages physiques.
+        """
+        self.source_digest = source_digest
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """Charge un moteur sauvegardé par save(), tableaux projetés en mémoire par défaut."""
+        forest = joblib.load(path, mmap_mode=mmap_mode)
+        if not isinstance(forest, ArrayForest):
+            raise TypeError(f"{path} ne contient pas un ArrayForest")
+        return forest
+
+    @property
+    def is_self_contained(self):
+        """Vrai si l'artefact porte les colonnes d'entraînement et les importances du modèle."""
+        return self.feature_names is not None and self.feature_importances_ is not None
+
+
+def build_artifact(model_path, columns_path, output_path):
+    """
+    Construit l'artefact compact d'un modèle joblib : arbres aplatis (float32 / int32),
+    colonnes d'entraînement, importances et empreinte du modèle source.
+    """
+    from API.cache import file_digest
+    from API.encoder import get_churn_class_index
+
+    model = joblib.load(model_path)
+    forest = ArrayForest.from_model(model, get_churn_class_index(model))
+    forest.feature_names = [str(column) for column in joblib.load(columns_path)]
+    forest.save(output_path, source_digest=file_digest(model_path))
+    return forest
+
+
+def _xgboost_node_means(left, right, leaf_value, cover):
+    """
+    Valeur attendue de chaque nœud d'un arbre XGBoost : la feuille elle-même, ou la
+    moyenne de ses enfants pondérée par leur couverture (sum_hessian), comme le calcul
+    des contributions approchées de XGBoost (les base_weights, poids régularisés des
+    nœuds internes, ne sont pas des moyennes de sous-arbres).
+    """
+    mean = leaf_value.copy()
+    # Nœuds du plus profond au moins profond : les enfants sont calculés avant leur parent
+    order, level = [], [0]
+    while level:
+        order.append(level)
+        level = [child for node in level for child in (left[node], right[node]) if child != -1]
+    for level in reversed(order):
+        for node in level:
+            if left[node] != -1:
+                l, r = left[node], right[node]
+                mean[node] = (mean[l] * cover[l] + mean[r] * cover[r]) / cover[node]
+    return mean.astype(np.float32)
+
+
+def _float32_floor(threshold):
+    """
+    Seuils float64 de scikit-learn arrondis au float32 inférieur : pour un x float32,
+    x <= seuil64 équivaut alors exactement à x <= seuil32.
+    """
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def _tree_depth(left, right):
+    """Profondeur maximale d'un arbre décrit par ses tableaux d'enfants (-1 pour une feuille)."""
+    depth = 0
+    level = [0]
+    while level:
+        children = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if children:
+            depth += 1
+        level = children
+    return depth
+
+
+def main():
+    """Construit l'artefact ArrayForest (projetable en mémoire) à partir d'un modèle joblib."""
+    # Fonction importée depuis son module (et non __main__) pour que l'artefact reste chargeable
+    from API.forest import build_artifact
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("model", nargs="?", default="model/modele_random_forest.pkl")
+    parser.add_argument("output", nargs="?", default="model/forest_arrays.joblib")
+    parser.add_argument("--columns", default="model/training_columns.pkl")
+    args = parser.parse_args()
+
+    forest = build_artifact(args.model, args.columns, args.output)
+    print(f"{forest.n_trees} arbres, {len(forest.feature)} nœuds -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,28 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-import joblib
-import pandas as pd
-import uvicorn
+import time
+# Début du chargement de l'API, pour les durées de démarrage rapportées par /ready
+STARTUP_STARTED = time.perf_counter()
+
+from fastapi import BackgroundTasks, FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional
+import anyio
+import hmac
+import json
+import numpy as np
 import os
 
+from API.batching import MicroBatcher
+from API.cache import PredictionCache, customer_key
+from API.encoder import format_contributions, format_prediction
+from API.executor import InferenceExecutor, default_model_threads
+from API.metrics import Metrics, MetricsMiddleware
+from API.registry import ModelRegistry, ModelServer
+from API.streaming import DuplexStreamingResponse, iter_chunks, iter_records
+
+IMPORTS_SECONDS = time.perf_counter() - STARTUP_STARTED
+
 # Définition du modèle de données d'entrée
 # Le modèle de données est adapté pour la prédiction de churn télécoms
 class ChurnPredictionData(BaseModel):
@@ -31,77 +49,478 @@ class ChurnPredictionData(BaseModel):
 # Initialisation de l'application FastAPI
 app = FastAPI()
 
-# Chargement du modèle et des colonnes d'entraînement
-try:
-    # Le chemin d'accès est relatif au dossier du projet
-    # Le '..' permet de remonter d'un niveau si le script est exécuté depuis 'API/'
-    # Cependant, la commande 'uvicorn API.main:app' est lancée depuis la racine du projet
-    # donc le chemin 'model/' est correct
-    model = joblib.load('model/modele_random_forest.pkl')
-    training_columns = joblib.load('model/training_columns.pkl')
-except FileNotFoundError as e:
+# Histogrammes de latence par étape et compteurs exposés sur /metrics (METRICS_ENABLED=0 pour les couper)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+metrics = Metrics(enabled=METRICS_ENABLED)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Nombre maximal de clients acceptés par appel à /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+
+# Nombre maximal de lignes acceptées par /predict/columnar (Arrow / Parquet)
+MAX_COLUMNAR_ROWS = int(os.environ.get("MAX_COLUMNAR_ROWS", 2000000))
+
+# Cache des prédictions pour les profils clients déjà scorés (0 entrée = désactivé)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+
+# Nombre de lignes scorées ensemble par /predict/stream (borne la mémoire du flux)
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 5000))
+
+# Regroupement des /predict concurrents en un seul passage du modèle (désactivé par défaut)
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "0") == "1"
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 64))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", 2))
+
+# Démarrage rapide (serverless) : la version est servie depuis l'artefact compact forest_arrays.joblib
+# (python -m API.forest), sans charger le modèle ni XGBoost / scikit-learn / pandas
+FAST_STARTUP = os.environ.get("FAST_STARTUP", "0") == "1"
+
+# Moteur d'inférence : "model" (predict_proba de la librairie) ou "numpy" (arbres aplatis, API/forest.py)
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "numpy" if FAST_STARTUP else "model")
+
+# Threads du pool des endpoints synchrones, par worker (gunicorn.conf.py le renseigne)
+API_THREADS = int(os.environ.get("API_THREADS", 0))
+
+# Pool de threads réservé aux appels du modèle, par worker (0 = pool partagé des endpoints synchrones,
+# parallélisme interne du modèle laissé tel quel)
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", min(4, os.cpu_count() or 1)))
+
+# Threads internes du modèle par appel (n_jobs / nthread) : par défaut les cœurs divisés par INFERENCE_THREADS
+MODEL_THREADS = int(os.environ.get(
+    "MODEL_THREADS", default_model_threads(INFERENCE_THREADS) if INFERENCE_THREADS > 0 else 0
+))
+
+# Dossier des versions du modèle (voir API/registry.py) et fréquence de relecture de model/CURRENT
+MODEL_ROOT = os.environ.get("MODEL_ROOT", "model")
+MODEL_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_INTERVAL", 10))
+# Jeton exigé par POST /models/{version}/activate (en-tête Authorization: Bearer <jeton>) ;
+# vide par défaut : l'activation par l'API est désactivée (python -m API.registry activate reste possible)
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN", "")
+
+MODEL_NOT_LOADED = {"error": "Modèle ou colonnes d'entraînement non chargés. Vérifiez la présence des fichiers du modèle."}
+
+inference_executor = InferenceExecutor(INFERENCE_THREADS)
+
+# Les entrées du cache sont préfixées par la version : un changement de modèle les invalide
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+# Chargement de la version active du modèle (model/CURRENT, sinon les fichiers de model/)
+# Le chemin 'model/' est relatif à la racine du projet, d'où est lancée la commande 'uvicorn API.main:app'
+model_server = ModelServer(
+    ModelRegistry(MODEL_ROOT),
+    INFERENCE_ENGINE,
+    on_swap=lambda loaded: prediction_cache.ensure_model(loaded.token),
+    model_threads=MODEL_THREADS,
+    compact=FAST_STARTUP
+)
+model_server.sync_with_registry()
+if model_server.current is None:
     # Affiche une erreur claire si les fichiers ne sont pas trouvés
-    print(f"Erreur: Fichier introuvable. Assurez-vous que les fichiers '.pkl' sont bien dans le sous-dossier 'model/'. Détails: {e}")
-    model = None
-    training_columns = None
+    print(f"Erreur: aucun modèle chargé. Assurez-vous que les fichiers '.pkl' sont bien dans le sous-dossier '{MODEL_ROOT}/'.")
+elif FAST_STARTUP and model_server.current.artifact != "compact":
+    print("Avertissement: artefact compact absent ou périmé, modèle complet chargé (python -m API.forest pour le générer).")
+
+# Durées du démarrage de ce processus, par étape (imports puis chargement de la version initiale)
+STARTUP_PHASES = {"imports": IMPORTS_SECONDS, **(model_server.current.phases if model_server.current else {})}
+STARTUP_SECONDS = time.perf_counter() - STARTUP_STARTED
+
+
+def score_customers(serving, customers, source):
+    """Encode puis score des clients en un passage du modèle, en chronométrant chaque étape."""
+    with metrics.stage("encode"):
+        X = serving.predictor.encoder.encode_many(customers)
+    with metrics.stage("predict"):
+        is_churn, churn_proba = serving.predictor.predict_matrix(X)
+    metrics.observe_batch(source, len(customers))
+    return is_churn, churn_proba
 
-# Nouvelle fonction pour extraire les importances des variables
-def get_feature_importances(model, training_columns):
+
+def predict_cached(serving, customers, source="predict"):
+    """
+    Prédit une liste de clients avec la version `serving`, en ne passant au modèle
+    que ceux absents du cache. Retourne une liste de (is_churn, churn_proba) dans l'ordre d'entrée.
+    """
+    with metrics.stage("cache"):
+        keys = [(serving.token, *customer_key(customer)) for customer in customers]
+        outcomes = prediction_cache.get_many(keys)
+    missing = [i for i, outcome in enumerate(outcomes) if outcome is None]
+
+    if missing:
+        is_churn, churn_proba = score_customers(serving, [customers[i] for i in missing], source)
+        for i, churn, proba in zip(missing, is_churn, churn_proba):
+            outcomes[i] = (bool(churn), float(proba))
+        prediction_cache.put_many([(keys[i], outcomes[i]) for i in missing])
+    return outcomes
+
+
+def explain_customers(serving, customers):
+    """Décomposition de la probabilité de chaque client (biais + une contribution par colonne d'entraînement)."""
+    with metrics.stage("explain"):
+        bias, contributions = serving.predictor.explain_many(customers)
+        columns = serving.predictor.training_columns
+        return [format_contributions(b, row, columns) for b, row in zip(bias, contributions)]
+
+
+def score_coalesced(items):
     """
-    Extrait les importances des caractéristiques du modèle
-    et les formate pour un retour JSON.
+    Score un lot de couples (version, client) formé par le MicroBatcher.
+    Les clients sont regroupés par version (un swap peut survenir pendant la collecte).
     """
-    if hasattr(model, 'feature_importances_'):
-        importances = model.feature_importances_
-        feature_names = training_columns
+    results = [None] * len(items)
+    groups = {}
+    for i, (serving, _) in enumerate(items):
+        groups.setdefault(serving, []).append(i)
+    for serving, positions in groups.items():
+        outcomes = predict_cached(serving, [items[i][1] for i in positions], "microbatch")
+        for i, outcome in zip(positions, outcomes):
+            results[i] = outcome
+    return results
+
+
+micro_batcher = MicroBatcher(score_coalesced, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS,
+                             run_sync=inference_executor.run)
 
-        # Créer un DataFrame pour faciliter le tri et la visualisation
-        feature_importance_df = pd.DataFrame({
-            'Feature': feature_names,
-            'Importance': importances
-        }).sort_values(by='Importance', ascending=False)
 
-        # On retourne les 10 plus importantes sous forme de liste de dictionnaires pour l'API
-        return feature_importance_df.head(10).to_dict('records')
-    return None
+def format_validation_errors(error: ValidationError):
+    """Liste des erreurs pydantic, au format renvoyé par l'API."""
+    return [{"champ": ".".join(str(l) for l in d["loc"]), "message": d["msg"]} for d in error.errors()]
+
+@app.on_event("startup")
+def configure_threadpool():
+    """Dimensionne le pool de threads des endpoints synchrones si API_THREADS est défini."""
+    if API_THREADS > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADS
+
+@app.on_event("startup")
+def watch_model_registry():
+    """Suit les activations de version faites par les autres workers (un thread par worker)."""
+    if MODEL_POLL_INTERVAL > 0:
+        model_server.watch(MODEL_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if MICROBATCH_ENABLED:
+        micro_batcher.start()
+
+@app.on_event("shutdown")
+async def stop_micro_batcher():
+    await micro_batcher.stop()
+
+@app.on_event("shutdown")
+def stop_inference_executor():
+    inference_executor.shutdown()
 
 # Endpoint de l'API pour la prédiction
-@app.post("/predict")
-def predict_churn(data: ChurnPredictionData):
+# Le corps est validé dans l'endpoint (étape "validate" des métriques) ; le schéma reste documenté
+@app.post("/predict", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": ChurnPredictionData.schema()}}}})
+async def predict_churn(body: Dict[str, Any], explain: bool = False):
     """
     Accepte les données d'un client et renvoie une prédiction de churn,
     ainsi que l'importance des variables.
+    Avec ?explain=true, ajoute la contribution de chaque variable à la probabilité de ce client.
+    Avec MICROBATCH_ENABLED=1, les requêtes concurrentes sont scorées ensemble.
     """
-    if model is None or training_columns is None:
-        return {"error": "Modèle ou colonnes d'entraînement non chargés. Vérifiez la présence des fichiers du modèle."}
+    # Même réponse 422 qu'une validation faite par FastAPI, mais chronométrée avec les autres étapes
+    with metrics.stage("validate"):
+        try:
+            data = ChurnPredictionData.parse_obj(body)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
 
-    # Crée un DataFrame à partir des données de l'utilisateur
-    input_df = pd.DataFrame([data.dict()])
+    # La version lue ici sert toute la requête, même si une autre est mise en service entre-temps
+    serving = model_server.current
+    if serving is None:
+        metrics.count_error("/predict")
+        return MODEL_NOT_LOADED
 
-    # Assurer que le DataFrame d'entrée a les mêmes colonnes que le DataFrame d'entraînement
-    missing_cols = set(training_columns) - set(input_df.columns)
-    for c in missing_cols:
-        input_df[c] = 0
+    # Encodage direct dans une ligne float32 et un seul appel predict_proba (sauf si déjà en cache),
+    # dans le pool d'inférence, hors de la boucle d'événements
+    if micro_batcher.running:
+        is_churn, churn_proba = await micro_batcher.submit((serving, data))
+    else:
+        is_churn, churn_proba = (await inference_executor.run(predict_cached, serving, [data]))[0]
 
-    input_df = input_df[training_columns]
+    response = {
+        **format_prediction(is_churn, churn_proba),
+        "feature_importances": serving.predictor.feature_importances,
+        "model_version": serving.version
+    }
+    if explain:
+        response["contributions"] = (await inference_executor.run(explain_customers, serving, [data]))[0]
 
-    # Prédiction avec le modèle
-    prediction_raw = model.predict(input_df)[0]
-    proba_raw = model.predict_proba(input_df)[0]
-    confidence = round(proba_raw[1] * 100, 2)  # La probabilité de la classe 'Yes'
+    # Retourne la prédiction, la probabilité ET les importances des variables (calculées au chargement)
+    with metrics.stage("serialize"):
+        return JSONResponse(response)
 
-    # Interprétation de la prédiction
-    prediction_message = "Le client va se désabonner" if prediction_raw == "Yes" else "Le client va rester"
+def score_batch(serving, customers, explain=False):
+    """
+    Valide, score et sérialise les clients de /predict/batch (réponse construite
+    dans le pool d'inférence : le JSON d'un gros lot ne bloque pas la boucle d'événements).
+    """
+    # Validation client par client : on garde la position d'origine de chaque client valide
+    results: List[Dict[str, Any]] = [None] * len(customers)
+    valid_customers = []
+    valid_positions = []
+    with metrics.stage("validate"):
+        for i, item in enumerate(customers):
+            try:
+                valid_customers.append(ChurnPredictionData.parse_obj(item))
+                valid_positions.append(i)
+            except ValidationError as e:
+                results[i] = {"index": i, "error": format_validation_errors(e)}
 
-    # Récupérer les importances des variables
-    feature_importances = get_feature_importances(model, training_columns)
+    # Une seule matrice encodée pour les clients absents du cache, un seul passage du modèle
+    outcomes = predict_cached(serving, valid_customers, "predict_batch")
+    for position, (churn, proba) in zip(valid_positions, outcomes):
+        results[position] = {"index": position, **format_prediction(churn, proba)}
+    if explain and valid_customers:
+        for position, contributions in zip(valid_positions, explain_customers(serving, valid_customers)):
+            results[position]["contributions"] = contributions
 
-    # Retourne la prédiction, la probabilité ET les importances des variables
-    return {
-        "prediction": prediction_message,
-        "probabilité": f"{confidence:.2f}%",
-        "feature_importances": feature_importances
+    with metrics.stage("serialize"):
+        return JSONResponse({
+            "results": results,
+            "n_scored": len(valid_customers),
+            "n_errors": len(customers) - len(valid_customers),
+            "feature_importances": serving.predictor.feature_importances,
+            "model_version": serving.version
+        })
+
+# Endpoint de l'API pour la prédiction par lots
+@app.post("/predict/batch")
+async def predict_churn_batch(customers: List[Any], explain: bool = False):
+    """
+    Accepte une liste de clients et renvoie une prédiction par client, dans l'ordre d'entrée.
+    Les clients invalides reçoivent une erreur de validation sans faire échouer le lot.
+    Avec ?explain=true, chaque résultat contient aussi les contributions des variables.
+    """
+    serving = model_server.current
+    if serving is None:
+        metrics.count_error("/predict/batch")
+        return MODEL_NOT_LOADED
+
+    if len(customers) > MAX_BATCH_SIZE:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Lot trop volumineux : {len(customers)} clients reçus, maximum {MAX_BATCH_SIZE}."}
+        )
+
+    return await inference_executor.run(score_batch, serving, customers, explain)
+
+def score_stream_chunk(serving, chunk, first_index):
+    """
+    Valide et score un morceau de /predict/stream.
+    Retourne (lignes NDJSON, nombre de lignes scorées, nombre de lignes rejetées).
+    """
+    outputs: List[Dict[str, Any]] = [None] * len(chunk)
+    valid_customers = []
+    valid_offsets = []
+    with metrics.stage("validate"):
+        for offset, (record, error) in enumerate(chunk):
+            if error is None:
+                try:
+                    valid_customers.append(ChurnPredictionData.parse_obj(record))
+                    valid_offsets.append(offset)
+                    continue
+                except ValidationError as e:
+                    error = format_validation_errors(e)
+            outputs[offset] = {"index": first_index + offset, "error": error}
+
+    # Pas de cache ici : un extrait complet ne contient chaque client qu'une fois
+    is_churn, churn_proba = score_customers(serving, valid_customers, "predict_stream")
+    for offset, churn, proba in zip(valid_offsets, is_churn, churn_proba):
+        outputs[offset] = {"index": first_index + offset, **format_prediction(churn, proba)}
+        customer_id = chunk[offset][0].get("customerID")
+        if customer_id is not None:
+            outputs[offset]["customerID"] = customer_id
+
+    with metrics.stage("serialize"):
+        body = "".join(json.dumps(output, ensure_ascii=False) + "\n" for output in outputs)
+    return body, len(valid_customers), len(chunk) - len(valid_customers)
+
+
+# Endpoint de l'API pour le scoring en flux (NDJSON ou CSV)
+@app.post("/predict/stream")
+async def predict_churn_stream(request: Request, format: Optional[str] = None):
+    """
+    Score un fichier NDJSON (un client par ligne) ou CSV (colonnes de telco_clean.csv)
+    sans le charger en mémoire : le corps est lu par morceaux de STREAM_CHUNK_SIZE lignes
+    et les résultats sont renvoyés en NDJSON au fur et à mesure.
+    Le corps n'est lu que lorsque le client a consommé les résultats précédents,
+    la mémoire reste donc constante quelle que soit la taille du fichier.
+    La dernière ligne est un résumé (lignes scorées, rejetées, débit).
+    Tout le fichier est scoré par la version en service au début de la requête.
+    """
+    serving = model_server.current
+    if serving is None:
+        metrics.count_error("/predict/stream")
+        return MODEL_NOT_LOADED
+
+    input_format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if input_format not in ("ndjson", "csv"):
+        return JSONResponse(status_code=400, content={"error": f"Format inconnu : {input_format} (ndjson ou csv)."})
+
+    async def generate():
+        started = time.perf_counter()
+        rows_scored = 0
+        rows_rejected = 0
+        records = iter_records(request.stream(), input_format)
+        async for chunk in iter_chunks(records, STREAM_CHUNK_SIZE):
+            # Le scoring tourne dans le pool d'inférence, hors de la boucle d'événements
+            body, scored, rejected = await inference_executor.run(
+                score_stream_chunk, serving, chunk, rows_scored + rows_rejected
+            )
+            rows_scored += scored
+            rows_rejected += rejected
+            yield body
+
+        elapsed = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "rows_scored": rows_scored,
+            "rows_rejected": rows_rejected,
+            "duration_s": round(elapsed, 3),
+            "rows_per_second": round(rows_scored / elapsed, 1) if elapsed > 0 else 0.0,
+            "model_version": serving.version
+        }}) + "\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+def score_columnar(serving, body, input_format, output_format):
+    """
+    Lit, score et sérialise une table Arrow / Parquet dans le pool d'inférence.
+    Les colonnes sont encodées directement dans la matrice du modèle, sans dictionnaire par client.
+    """
+    # pyarrow n'est importé qu'au premier appel : le démarrage rapide n'en paie pas le coût
+    from API.columnar import ColumnarError, MEDIA_TYPES, read_table, scores_table, table_features, write_table
+
+    try:
+        with metrics.stage("decode"):
+            table = read_table(body, input_format)
+            if table.num_rows > MAX_COLUMNAR_ROWS:
+                return JSONResponse(
+                    status_code=413,
+                    content={"error": f"Table trop volumineuse : {table.num_rows} lignes, maximum {MAX_COLUMNAR_ROWS}."}
+                )
+            numeric, categorical, valid = table_features(table)
+    except ColumnarError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    with metrics.stage("encode"):
+        X = serving.predictor.encoder.encode_columns(table.num_rows, numeric, categorical)
+    is_churn = np.zeros(table.num_rows, dtype=bool)
+    churn_proba = np.zeros(table.num_rows, dtype=np.float64)
+    if valid.any():
+        with metrics.stage("predict"):
+            is_churn[valid], churn_proba[valid] = serving.predictor.predict_matrix(X[valid])
+        metrics.observe_batch("predict_columnar", int(valid.sum()))
+
+    with metrics.stage("serialize"):
+        content = write_table(scores_table(table, valid, is_churn, churn_proba, serving.version), output_format)
+    return Response(content, media_type=MEDIA_TYPES[output_format])
+
+
+# Endpoint de l'API pour le scoring en masse au format colonnes (Arrow IPC ou Parquet)
+@app.post("/predict/columnar")
+async def predict_churn_columnar(request: Request, format: Optional[str] = None, output: Optional[str] = None):
+    """
+    Score un flux Arrow IPC ou un fichier Parquet aux colonnes de telco_clean.csv
+    (Content-Type application/vnd.apache.arrow.stream ou application/vnd.apache.parquet,
+    ou ?format=arrow|parquet). Renvoie une table index / customerID / churn / churn_proba
+    dans le même format, ou celui demandé par ?output=arrow|parquet.
+    Les lignes incomplètes reçoivent des scores nuls.
+    """
+    serving = model_server.current
+    if serving is None:
+        metrics.count_error("/predict/columnar")
+        return MODEL_NOT_LOADED
+
+    content_type = request.headers.get("content-type", "")
+    input_format = format or ("parquet" if "parquet" in content_type else "arrow")
+    output_format = output or input_format
+    for requested in (input_format, output_format):
+        if requested not in ("arrow", "parquet"):
+            return JSONResponse(status_code=400, content={"error": f"Format inconnu : {requested} (arrow ou parquet)."})
+
+    body = await request.body()
+    return await inference_executor.run(score_columnar, serving, body, input_format, output_format)
+
+# Métriques au format texte Prometheus (une instance par worker)
+@app.get("/metrics")
+def prometheus_metrics():
+    if not metrics.enabled:
+        return JSONResponse(status_code=404, content={"error": "Métriques désactivées (METRICS_ENABLED=0)."})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Statistiques du cache des prédictions, pour le dimensionner
+@app.get("/cache/stats")
+def cache_stats():
+    return prediction_cache.stats()
+
+# Taille moyenne des lots formés par le regroupement des /predict
+@app.get("/microbatch/stats")
+def micro_batch_stats():
+    return {"enabled": micro_batcher.running, **micro_batcher.stats()}
+
+# Occupation du pool d'inférence (appels en cours et en attente)
+@app.get("/executor/stats")
+def inference_executor_stats():
+    return {**inference_executor.stats(), "model_threads": MODEL_THREADS}
+
+# Disponibilité du service (sonde de démarrage / readiness)
+@app.get("/ready")
+def readiness():
+    """
+    200 si un modèle est chargé et chauffé, 503 sinon. Indique l'artefact servi, son
+    élagage éventuel et la durée du démarrage de ce processus, au total et par étape.
+    """
+    serving = model_server.current
+    content = {
+        "ready": serving is not None,
+        "model_version": serving.version if serving else None,
+        "artifact": serving.artifact if serving else None,
+        "pruning": serving.pruning if serving else None,
+        "fast_startup": FAST_STARTUP,
+        "startup_seconds": round(STARTUP_SECONDS, 4),
+        "startup_phases": {phase: round(seconds, 4) for phase, seconds in STARTUP_PHASES.items()},
     }
+    return JSONResponse(status_code=200 if serving is not None else 503, content=content)
+
+# Versions disponibles et version en service
+@app.get("/models")
+def list_models():
+    return model_server.status()
+
+# Mise en service à chaud d'une version (déploiement ou retour arrière)
+@app.post("/models/{version}/activate")
+def activate_model(version: str, request: Request, background_tasks: BackgroundTasks):
+    """
+    Charge et chauffe `version` en arrière-plan, puis la désigne comme version active
+    (model/CURRENT) et la met en service, sans interrompre les requêtes en cours. Si le
+    chargement échoue, la version active ne change pas (erreur visible dans /models).
+    Les autres workers la suivent à leur prochaine relecture du registre.
+    Réservé aux détenteurs de MODEL_ADMIN_TOKEN ; sans jeton configuré, l'endpoint est désactivé.
+    """
+    if not MODEL_ADMIN_TOKEN:
+        return JSONResponse(status_code=404, content={"error": "Activation désactivée (MODEL_ADMIN_TOKEN non défini)."})
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        return JSONResponse(status_code=401, content={"error": "Jeton d'administration manquant ou invalide."},
+                            headers={"WWW-Authenticate": "Bearer"})
+    if not model_server.registry.exists(version):
+        return JSONResponse(status_code=404, content={"error": f"Version inconnue : {version}"})
+    background_tasks.add_task(activate_in_background, version)
+    return JSONResponse(status_code=202, content={"status": "chargement", "version": version})
+
+def activate_in_background(version):
+    try:
+        model_server.activate(version)
+    except Exception:
+        # Déjà affichée et exposée par /models (last_error, failed_versions)
+        pass
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
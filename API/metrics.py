@@ -0,0 +1,168 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Bornes des histogrammes (secondes pour les durées, nombre de clients pour les lots)
+DURATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    """Histogramme à bornes fixes : un compteur par intervalle, plus la somme et le nombre d'observations."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(bornes cumulées [(le, compte)], somme, nombre) au format Prometheus."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return cumulative, total, count
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Métriques de l'API en mémoire du processus (une instance par worker) :
+    durées par étape du scoring, durées et nombre de requêtes par route,
+    erreurs et tailles de lots. render() produit le format texte Prometheus.
+    Désactivées (enabled=False), stage() renvoie un contexte vide et rien n'est enregistré.
+    """
+
+    def __init__(self, enabled=True, prefix="churn_api"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.stage_seconds = {}
+        self.request_seconds = {}
+        self.batch_sizes = {}
+        self.requests_total = {}
+        self.errors_total = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, family, label, buckets):
+        histogram = family.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(label, Histogram(buckets))
+        return histogram
+
+    def stage(self, name):
+        """Contexte qui chronomètre une étape : `with metrics.stage("encode"): ...`."""
+        if not self.enabled:
+            return _DISABLED
+        return _StageTimer(self._histogram(self.stage_seconds, name, DURATION_BUCKETS))
+
+    def observe_request(self, route, status, seconds):
+        if not self.enabled:
+            return
+        self._histogram(self.request_seconds, route, DURATION_BUCKETS).observe(seconds)
+        with self._lock:
+            key = (route, status)
+            self.requests_total[key] = self.requests_total.get(key, 0) + 1
+            if status >= 400:
+                self.errors_total[route] = self.errors_total.get(route, 0) + 1
+
+    def count_error(self, route):
+        """Erreur renvoyée avec un statut 200 (par exemple modèle non chargé) ou ligne rejetée."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.errors_total[route] = self.errors_total.get(route, 0) + 1
+
+    def observe_batch(self, source, size):
+        if self.enabled:
+            self._histogram(self.batch_sizes, source, BATCH_SIZE_BUCKETS).observe(size)
+
+    def render(self):
+        """Texte d'exposition Prometheus (version 0.0.4)."""
+        lines = []
+        self._render_histograms(lines, "stage_duration_seconds", "stage", self.stage_seconds,
+                                "Durée de chaque étape du scoring")
+        self._render_histograms(lines, "request_duration_seconds", "route", self.request_seconds,
+                                "Durée totale des requêtes HTTP")
+        self._render_histograms(lines, "batch_size", "source", self.batch_sizes,
+                                "Nombre de clients scorés par passage du modèle")
+
+        with self._lock:
+            requests_total = dict(self.requests_total)
+            errors_total = dict(self.errors_total)
+        name = f"{self.prefix}_requests_total"
+        lines += [f"# HELP {name} Nombre de requêtes HTTP par route et statut", f"# TYPE {name} counter"]
+        for (route, status), value in sorted(requests_total.items()):
+            lines.append(f'{name}{{route="{route}",status="{status}"}} {value}')
+        name = f"{self.prefix}_errors_total"
+        lines += [f"# HELP {name} Nombre d'erreurs par route", f"# TYPE {name} counter"]
+        for route, value in sorted(errors_total.items()):
+            lines.append(f'{name}{{route="{route}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _render_histograms(self, lines, suffix, label, family, help_text):
+        name = f"{self.prefix}_{suffix}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for value, histogram in sorted(family.items()):
+            cumulative, total, count = histogram.snapshot()
+            for bound, bucket_count in cumulative:
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {bucket_count}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {total}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : durée et statut de chaque requête HTTP, étiquetés par route (et non par URL)."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "autre"
+            self.metrics.observe_request(route, status, time.perf_counter() - started)
@@ -0,0 +1,353 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import joblib
+
+from API.cache import artifact_fingerprint, file_digest
+from API.encoder import ChurnPredictor
+from API.executor import pin_model_threads
+from API.forest import ArrayForest, build_artifact
+
+# Organisation du dossier model/ :
+#   model/CURRENT                      version active (une ligne), optionnel
+#   model/<version>/manifest.json      description de la version
+#   model/<version>/modele_random_forest.pkl
+#   model/<version>/training_columns.pkl
+#   model/<version>/forest_arrays.joblib   (optionnel, moteur NumPy projeté en mémoire, démarrage rapide)
+# Les fichiers posés directement dans model/ forment la version "initial".
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+MODEL_FILE = "modele_random_forest.pkl"
+COLUMNS_FILE = "training_columns.pkl"
+FOREST_FILE = "forest_arrays.joblib"
+INITIAL_VERSION = "initial"
+
+# Client de référence pour l'inférence de chauffe d'une nouvelle version
+WARMUP_CUSTOMER = {
+    "gender": "Male", "SeniorCitizen": 0, "Partner": "Yes", "Dependents": "No", "tenure": 12,
+    "PhoneService": "Yes", "MultipleLines": "No", "InternetService": "Fiber optic",
+    "OnlineSecurity": "No", "OnlineBackup": "Yes", "DeviceProtection": "No", "TechSupport": "No",
+    "StreamingTV": "Yes", "StreamingMovies": "Yes", "Contract": "Month-to-month",
+    "PaperlessBilling": "Yes", "PaymentMethod": "Electronic check",
+    "MonthlyCharges": 85.5, "TotalCharges": 1020.5
+}
+
+
+class ModelVersion:
+    """Une version chargée et chauffée du modèle ; non modifiée une fois en service."""
+
+    def __init__(self, version, manifest, predictor, token, load_seconds, phases=None, artifact="model", pruning=None):
+        self.version = version
+        self.manifest = manifest
+        self.predictor = predictor
+        # Identifie la version et ses fichiers (clé du cache des prédictions)
+        self.token = token
+        self.load_seconds = load_seconds
+        # Durée de chaque étape du chargement (lecture des fichiers, prédicteur, chauffe)
+        self.phases = phases or {}
+        # "compact" si la version est servie depuis forest_arrays.joblib seul, "model" sinon
+        self.artifact = artifact
+        # Élagage de l'ArrayForest qui sert les prédictions (voir API.compact), None si complet
+        self.pruning = pruning
+
+
+class ModelRegistry:
+    """Versions du modèle rangées dans des sous-dossiers de model/, chacune décrite par un manifeste."""
+
+    def __init__(self, root="model"):
+        self.root = str(root)
+
+    def version_dir(self, version):
+        return self.root if version == INITIAL_VERSION else os.path.join(self.root, version)
+
+    def model_path(self, version):
+        return os.path.join(self.version_dir(version), MODEL_FILE)
+
+    def columns_path(self, version):
+        return os.path.join(self.version_dir(version), COLUMNS_FILE)
+
+    def exists(self, version):
+        return os.path.exists(self.model_path(version)) and os.path.exists(self.columns_path(version))
+
+    def read_manifest(self, version):
+        """Manifeste d'une version ; la version "initial" n'en a pas et reçoit un manifeste minimal."""
+        path = os.path.join(self.version_dir(version), MANIFEST_FILE)
+        if version != INITIAL_VERSION and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"version": version, "model_file": MODEL_FILE, "columns_file": COLUMNS_FILE}
+
+    def list_versions(self):
+        """Versions disponibles, de la plus ancienne à la plus récente."""
+        versions = [INITIAL_VERSION] if self.exists(INITIAL_VERSION) else []
+        if os.path.isdir(self.root):
+            published = [
+                self.read_manifest(name) for name in os.listdir(self.root)
+                if os.path.exists(os.path.join(self.root, name, MANIFEST_FILE)) and self.exists(name)
+            ]
+            versions += [m["version"] for m in sorted(published, key=lambda m: m.get("created_at", ""))]
+        return versions
+
+    def active_version(self):
+        """Version désignée par model/CURRENT, sinon "initial", sinon la plus récente."""
+        current_path = os.path.join(self.root, CURRENT_FILE)
+        if os.path.exists(current_path):
+            with open(current_path, encoding="utf-8") as f:
+                version = f.read().strip()
+            if version and self.exists(version):
+                return version
+        versions = self.list_versions()
+        if INITIAL_VERSION in versions:
+            return INITIAL_VERSION
+        return versions[-1] if versions else None
+
+    def read_current(self):
+        """Contenu de model/CURRENT tel quel, ou None s'il n'existe pas."""
+        current_path = os.path.join(self.root, CURRENT_FILE)
+        if not os.path.exists(current_path):
+            return None
+        with open(current_path, encoding="utf-8") as f:
+            return f.read().strip()
+
+    def set_active(self, version):
+        """
+        Écrit model/CURRENT de façon atomique (les autres workers le relisent) et retourne
+        son contenu précédent. À n'appeler qu'une fois la version chargée et chauffée.
+        """
+        if not self.exists(version):
+            raise KeyError(version)
+        previous = self.read_current()
+        self._write_current(version)
+        return previous
+
+    def restore_current(self, previous):
+        """Rétablit model/CURRENT tel que retourné par set_active (None : pas de fichier)."""
+        if previous is None:
+            try:
+                os.remove(os.path.join(self.root, CURRENT_FILE))
+            except FileNotFoundError:
+                pass
+        else:
+            self._write_current(previous)
+
+    def _write_current(self, version):
+        current_path = os.path.join(self.root, CURRENT_FILE)
+        tmp_path = f"{current_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, current_path)
+
+    def load(self, version, engine="model", model_threads=0, compact=False):
+        """
+        Charge une version, construit son prédicteur et la chauffe par une inférence de test.
+        model_threads > 0 fixe le parallélisme interne du modèle (n_jobs).
+        compact=True sert la version depuis forest_arrays.joblib seul quand il est à jour
+        et complet : ni le modèle, ni XGBoost / scikit-learn, ni pandas ne sont chargés.
+        """
+        started = time.perf_counter()
+        phases = {}
+        model_path = self.model_path(version)
+
+        forest = None
+        forest_path = os.path.join(self.version_dir(version), FOREST_FILE)
+        if (engine == "numpy" or compact) and os.path.exists(forest_path):
+            # Tableaux projetés en mémoire, partagés entre workers ; ignorés s'ils viennent d'un autre modèle
+            forest = ArrayForest.load(forest_path, mmap_mode="r")
+            if forest.source_digest != file_digest(model_path):
+                print(f"Avertissement: {forest_path} ne correspond pas à {model_path}, il sera reconstruit en mémoire.")
+                forest = None
+
+        if compact and forest is not None and forest.is_self_contained:
+            # L'ArrayForest tient lieu de modèle (classes_, feature_importances_, predict_proba)
+            model, training_columns, engine, artifact = forest, forest.feature_names, "numpy", "compact"
+        else:
+            if forest is not None and forest.pruning is not None:
+                # Un artefact élagué ne sert qu'en mode compact : à côté du modèle complet, ses
+                # scores ne correspondraient plus aux importances ni au cache de ce modèle
+                print(f"Avertissement: {forest_path} est élagué, moteur reconstruit en mémoire depuis {model_path}.")
+                forest = None
+            model = joblib.load(model_path)
+            pin_model_threads(model, model_threads)
+            training_columns = joblib.load(self.columns_path(version))
+            artifact = "model"
+        phases["read_artifacts"] = time.perf_counter() - started
+
+        step = time.perf_counter()
+        predictor = ChurnPredictor(model, training_columns, engine, forest)
+        phases["build_predictor"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        predictor.predict_one(WARMUP_CUSTOMER)
+        phases["warmup"] = time.perf_counter() - step
+
+        token = f"{version}|{artifact_fingerprint(model_path, self.columns_path(version))}"
+        if forest is not None and forest.pruning is not None:
+            # Les prédictions d'une forêt élaguée ne partagent pas le cache de celles du modèle complet
+            token += "|pruned:{trees}/{original_trees}:{accuracy_tolerance}:{max_proba_shift}".format(**forest.pruning)
+        return ModelVersion(version, self.read_manifest(version), predictor, token,
+                            time.perf_counter() - started, phases, artifact,
+                            forest.pruning if forest is not None else None)
+
+    def publish(self, version, model_path, columns_path, description=""):
+        """Copie un modèle entraîné dans model/<version>/, construit son artefact compact et écrit son manifeste."""
+        if version == INITIAL_VERSION or os.path.exists(os.path.join(self.root, version)):
+            raise FileExistsError(f"La version {version} existe déjà")
+        target = os.path.join(self.root, version)
+        os.makedirs(target)
+        shutil.copyfile(model_path, os.path.join(target, MODEL_FILE))
+        shutil.copyfile(columns_path, os.path.join(target, COLUMNS_FILE))
+        build_artifact(os.path.join(target, MODEL_FILE), os.path.join(target, COLUMNS_FILE),
+                       os.path.join(target, FOREST_FILE))
+        manifest = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "description": description,
+            "model_file": MODEL_FILE,
+            "columns_file": COLUMNS_FILE,
+            "sha256": {
+                MODEL_FILE: file_digest(os.path.join(target, MODEL_FILE)),
+                COLUMNS_FILE: file_digest(os.path.join(target, COLUMNS_FILE)),
+            }
+        }
+        with open(os.path.join(target, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return manifest
+
+
+class ModelServer:
+    """
+    Version du modèle en service, remplaçable à chaud.
+
+    Une nouvelle version est chargée et chauffée à côté de l'ancienne, puis
+    `current` est remplacé en une seule affectation : une requête qui a déjà
+    lu `current` termine sur l'ancienne version, les suivantes utilisent la
+    nouvelle. Chaque worker surveille aussi model/CURRENT (watch) pour suivre
+    une activation faite par un autre worker ; une version dont le chargement a
+    échoué dans ce worker n'y est pas retentée, sauf par activate().
+    """
+
+    def __init__(self, registry, engine="model", on_swap=None, model_threads=0, compact=False):
+        self.registry = registry
+        self.engine = engine
+        self.model_threads = model_threads
+        self.compact = compact
+        # Appelé avec la nouvelle ModelVersion juste après sa mise en service
+        self.on_swap = on_swap
+        self.current = None
+        self.loading_version = None
+        self.last_error = None
+        # Versions dont le chargement a échoué dans ce worker -> message d'erreur
+        self.failed_versions = {}
+        self._swap_lock = threading.Lock()
+
+    def swap(self, version, activate=False):
+        """
+        Charge, chauffe puis met en service une version. Retourne la ModelVersion en service.
+        activate=True écrit aussi model/CURRENT, une fois la version chauffée seulement, et
+        le rétablit si la mise en service échoue.
+        """
+        with self._swap_lock:
+            if self.current is not None and self.current.version == version and not activate:
+                return self.current
+            self.loading_version = version
+            try:
+                loaded = self.registry.load(version, self.engine, self.model_threads, self.compact)
+                previous = self.registry.set_active(version) if activate else None
+            except Exception as e:
+                self.last_error = self.failed_versions[version] = f"{version}: {e}"
+                print(f"Erreur: chargement de la version {version} impossible. Détails: {e}")
+                raise
+            finally:
+                self.loading_version = None
+            try:
+                if self.on_swap is not None:
+                    self.on_swap(loaded)
+            except Exception:
+                if activate:
+                    self.registry.restore_current(previous)
+                raise
+            self.current = loaded
+            self.last_error = None
+            self.failed_versions.pop(version, None)
+            return loaded
+
+    def activate(self, version):
+        """Charge et chauffe `version` puis la désigne comme active ; en cas d'échec, model/CURRENT est inchangé."""
+        return self.swap(version, activate=True)
+
+    def sync_with_registry(self):
+        """Met en service la version active du registre si elle a changé et n'a pas déjà échoué ici."""
+        version = self.registry.active_version()
+        if version is None or version in self.failed_versions:
+            return
+        if self.current is None or self.current.version != version:
+            try:
+                self.swap(version)
+            except Exception:
+                # Erreur déjà affichée et exposée par status() ; la version ne sera pas retentée
+                pass
+
+    def watch(self, interval):
+        """Thread de fond qui relit la version active toutes les `interval` secondes."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.sync_with_registry()
+
+        thread = threading.Thread(target=loop, name="model-registry-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        current = self.current
+        return {
+            "serving": current.version if current else None,
+            "serving_load_seconds": round(current.load_seconds, 3) if current else None,
+            "serving_artifact": current.artifact if current else None,
+            "active": self.registry.active_version(),
+            "loading": self.loading_version,
+            "last_error": self.last_error,
+            "failed_versions": sorted(self.failed_versions),
+            "versions": self.registry.list_versions()
+        }
+
+
+def main():
+    """Publie un modèle entraîné comme nouvelle version, ou change la version active."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--root", default="model")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="copie un modèle dans model/<version>/")
+    publish.add_argument("version")
+    publish.add_argument("model_path")
+    publish.add_argument("columns_path")
+    publish.add_argument("--description", default="")
+    publish.add_argument("--activate", action="store_true")
+
+    activate = commands.add_parser("activate", help="charge et chauffe la version puis écrit model/CURRENT")
+    activate.add_argument("version")
+
+    commands.add_parser("list", help="liste les versions")
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        manifest = registry.publish(args.version, args.model_path, args.columns_path, args.description)
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
+        if args.activate:
+            ModelServer(registry).activate(args.version)
+    elif args.command == "activate":
+        ModelServer(registry).activate(args.version)
+    active = registry.active_version()
+    for version in registry.list_versions():
+        print(("* " if version == active else "  ") + version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import codecs
+import csv
+import json
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+
+async def iter_line_batches(byte_chunks):
+    """
+    Découpe un flux d'octets (request.stream()) en lignes de texte UTF-8.
+    Produit une liste de lignes complètes par morceau reçu : seule la ligne
+    en cours de réception reste en mémoire entre deux morceaux.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in byte_chunks:
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            continue
+        *lines, pending = pending.split("\n")
+        yield [line.rstrip("\r") for line in lines]
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield [pending.rstrip("\r")]
+
+
+async def iter_records(byte_chunks, input_format="ndjson"):
+    """
+    Produit des couples (enregistrement, erreur) à partir d'un flux NDJSON ou CSV.
+    En CSV, la première ligne est l'en-tête (mêmes colonnes que APP/data/telco_clean.csv).
+    Une ligne illisible donne (None, message) au lieu d'interrompre le flux.
+    """
+    header = None
+    async for lines in iter_line_batches(byte_chunks):
+        for line in lines:
+            if not line.strip():
+                continue
+            if input_format == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [name.strip() for name in values]
+                    continue
+                if len(values) != len(header):
+                    yield None, f"{len(values)} colonnes au lieu de {len(header)}"
+                    continue
+                yield dict(zip(header, values)), None
+            else:
+                try:
+                    yield json.loads(line), None
+                except ValueError as e:
+                    yield None, f"JSON invalide : {e}"
+
+
+async def iter_chunks(records, chunk_size):
+    """Regroupe les couples (enregistrement, erreur) en listes de taille fixe."""
+    chunk = []
+    async for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse dont le générateur lit lui-même le corps de la requête.
+
+    La version de Starlette écoute `receive` en parallèle pour détecter la
+    déconnexion du client, ce qui consommerait les morceaux du corps encore
+    en cours d'envoi. Ici, la déconnexion est détectée par la lecture du corps
+    (ClientDisconnect) ou par l'échec de l'envoi.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
@@ -1,6 +1,5 @@
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 
 from utils.chatbot import get_chatbot_response
 
@@ -13,14 +12,46 @@ st.set_page_config(
     page_icon="📱",
     layout="wide"
 )
-from utils.data_loader import load_data
+from utils.data_loader import (DASHBOARD_BACKEND, DASHBOARD_REFRESH_SECONDS, load_dashboard_backend,
+                               load_delta_refresher, load_kpi_engine, load_portfolio_scorer)
 from utils.ui_style import set_background, custom_sidebar_style
 from utils.auth import check_authentication
+from utils.chart_data import histogram_figure, box_figure, sunburst_figure, retention_figure
+from utils.kpi_engine import kpi_table
+from utils.portfolio_scoring import active_model
 
 
 
-# Chargement des données
-data = load_data()
+# Chargement des données : en mémoire ou jeu partitionné lu par morceaux (DASHBOARD_BACKEND)
+backend = load_dashboard_backend()
+kpi_engine = load_kpi_engine()
+
+# Nouveaux clients (fichiers de DASHBOARD_DELTA_DIR) ajoutés avant le calcul de la page
+delta_refresher = load_delta_refresher()
+delta_refresher.refresh()
+
+
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS if DASHBOARD_REFRESH_SECONDS > 0 else None)
+def watch_new_customers(version):
+    """Relance la page dès que des clients ont été ajoutés, par cette session ou une autre."""
+    delta_refresher.refresh()
+    if backend.version != version:
+        st.rerun()
+
+
+watch_new_customers(backend.version)
+
+# Colonnes proposées pour découper les courbes de rétention
+RETENTION_SEGMENTS = ('Contract', 'InternetService', 'PaymentMethod')
+
+# Agrégats des graphiques : (colonnes de regroupement, colonne sommée ou None pour compter)
+CHART_GROUPS = {
+    'tenure_by_churn': (('Churn', 'tenure'), None),
+    'charges_by_churn_contract': (('Churn', 'Contract', 'MonthlyCharges'), None),
+    'charges_by_service': (('Contract', 'InternetService', 'Churn'), 'MonthlyCharges'),
+    # Courbes de rétention : une grille par (segments, ancienneté, churn), les segments étant choisis dans l'onglet
+    'retention': ((*RETENTION_SEGMENTS, 'tenure', 'Churn'), None),
+}
 
 # Appliquer les styles UI
 set_background()
@@ -34,7 +65,7 @@ with st.sidebar:
     st.header("🔎 Filtres Stratégiques")
 
     # 1. Filtre Type de Contrat - Version professionnelle
-    contract_options = data['Contract'].unique().tolist()
+    contract_options = backend.options('Contract')
     selected_contract = st.selectbox(
         "Type de contrat",
         options=["Tous"] + contract_options,
@@ -43,7 +74,7 @@ with st.sidebar:
     )
 
     # 2. Filtre Genre
-    gender_options = ["Tous"] + data['gender'].unique().tolist()
+    gender_options = ["Tous"] + backend.options('gender')
     gender_filter = st.radio(
         "Genre",
         options=gender_options,
@@ -53,7 +84,7 @@ with st.sidebar:
     )
 
     # 2. Nouveau filtre : Méthode de paiement (en dessous des sliders)
-    payment_methods = ["Toutes"] + sorted(data['PaymentMethod'].unique().tolist())
+    payment_methods = ["Toutes"] + sorted(backend.options('PaymentMethod'))
     selected_payment = st.selectbox(
         "Méthode de paiement",
         options=payment_methods,
@@ -63,7 +94,7 @@ with st.sidebar:
 
     # 3. Filtres avancés
     with st.expander("Filtres Avancés"):
-        internet_options = ["Tous"] + data['InternetService'].unique().tolist()
+        internet_options = ["Tous"] + backend.options('InternetService')
         internet_service = st.selectbox(
             "Service Internet",
             options=internet_options,
@@ -71,19 +102,21 @@ with st.sidebar:
             key="internet_selector"
         )
 
+        tenure_min, tenure_max = backend.bounds('tenure')
         tenure_range = st.slider(
             "Ancienneté (mois)",
-            min_value=int(data['tenure'].min()),
-            max_value=int(data['tenure'].max()),
+            min_value=int(tenure_min),
+            max_value=int(tenure_max),
             value=(0, 72),
             key="tenure_selector"
         )
 
+        charges_min, charges_max = backend.bounds('MonthlyCharges')
         monthly_charges = st.slider(
             "Charges mensuelles ($)",
-            min_value=float(data['MonthlyCharges'].min()),
-            max_value=float(data['MonthlyCharges'].max()),
-            value=(float(data['MonthlyCharges'].min()), float(data['MonthlyCharges'].max())),
+            min_value=float(charges_min),
+            max_value=float(charges_max),
+            value=(float(charges_min), float(charges_max)),
             key="charges_selector"
         )
 
@@ -91,29 +124,19 @@ with st.sidebar:
 
 # APPLICATION DES FILTRES (VERSION FINALE)
 
-df_filtered = data.copy()
-
-# Filtre Contrat
-if selected_contract != "Tous":
-    df_filtered = df_filtered[df_filtered['Contract'] == selected_contract]
-
-# Filtres obligatoires
-df_filtered = df_filtered[
-    df_filtered['tenure'].between(*tenure_range) &
-    df_filtered['MonthlyCharges'].between(*monthly_charges)
-]
-
-# Filtres optionnels
-if gender_filter != "Tous":
-    df_filtered = df_filtered[df_filtered['gender'] == gender_filter]
-
-if internet_service != "Tous":
-    df_filtered = df_filtered[df_filtered['InternetService'] == internet_service]
-
-
-# Ajouter cette condition à votre bloc de filtrage existant
-if selected_payment != "Toutes":
-    df_filtered = df_filtered[df_filtered['PaymentMethod'] == selected_payment]
+# Les filtres sont résolus par la source de données (index en mémoire ou prédicats
+# poussés dans le scan du jeu partitionné), qui renvoie KPIs et agrégats des graphiques ;
+# les KPIs, calculés une fois par état de filtres, servent aux tuiles, à l'export et au chatbot
+selected_values = {
+    'Contract': selected_contract,
+    'gender': gender_filter,
+    'InternetService': internet_service,
+    'PaymentMethod': selected_payment,
+}
+active_equals = {column: value for column, value in selected_values.items() if value not in ("Tous", "Toutes")}
+active_ranges = {'tenure': tenure_range, 'MonthlyCharges': monthly_charges}
+summary = backend.summary(active_equals, active_ranges, CHART_GROUPS)
+kpis = kpi_engine.kpis(active_equals, active_ranges, CHART_GROUPS)
 
 
 # SECTION KPI - HEADER (VERSION SÉCURISÉE)
@@ -123,51 +146,39 @@ st.markdown("**Outil décisionnel pour la rétention client**")
 st.divider()
 
 
-def safe_divide(a, b):
-    return a / b if b != 0 else 0
-
-
 # Ligne 1 - KPIs Principaux
 kpi1, kpi2, kpi3, kpi4 = st.columns(4)
 
-total_clients = len(df_filtered)
+total_clients = kpis['clients']
 kpi1.metric(
     "👥 Clients Actifs",
     f"{total_clients:,}",
-    delta=f"{safe_divide((total_clients - len(data)), len(data)) * 100:.1f}%"
+    delta=f"{kpis['clients_delta_pct']:.1f}%"
 )
 
-churn_count = len(df_filtered[df_filtered['Churn'] == 'Yes'])
 kpi2.metric(
     "⚠️ Taux de Churn",
-    f"{safe_divide(churn_count, total_clients) * 100:.1f}%",
-    delta=f"{(safe_divide(churn_count, total_clients) - safe_divide(len(data[data['Churn'] == 'Yes']), len(data))) * 100:.1f}pts",
+    f"{kpis['churn_rate']:.1f}%",
+    delta=f"{kpis['churn_delta_pts']:.1f}pts",
     delta_color="inverse"
 )
 
-monthly_revenue = df_filtered['MonthlyCharges'].sum()
 kpi3.metric(
     "💸 Revenu Mensuel",
-    f"${monthly_revenue:,.0f}"
+    f"${kpis['monthly_revenue']:,.0f}"
 )
 
-avg_tenure = df_filtered['tenure'].mean()
 kpi4.metric(
     "⏳ Ancienneté Moyenne",
-    f"{avg_tenure:.1f} mois" if not pd.isna(avg_tenure) else "0 mois"
+    f"{kpis['avg_tenure']:.1f} mois" if total_clients else "0 mois"
 )
 
 # Ligne 2 - KPIs Secondaires
 kpi5, kpi6, kpi7 = st.columns(3)
 
-no_internet = safe_divide(len(df_filtered[df_filtered['InternetService'] == 'No']), total_clients) * 100
-kpi5.metric("📶 Sans Internet", f"{no_internet:.1f}%")
-
-paperless = safe_divide(len(df_filtered[df_filtered['PaperlessBilling'] == 'Yes']), total_clients) * 100
-kpi6.metric("🌱 Facture Démat", f"{paperless:.1f}%")
-
-seniors = safe_divide(len(df_filtered[df_filtered['SeniorCitizen'] == 1]), total_clients) * 100
-kpi7.metric("👵 Clients Seniors", f"{seniors:.1f}%")
+kpi5.metric("📶 Sans Internet", f"{kpis['no_internet_pct']:.1f}%")
+kpi6.metric("🌱 Facture Démat", f"{kpis['paperless_pct']:.1f}%")
+kpi7.metric("👵 Clients Seniors", f"{kpis['seniors_pct']:.1f}%")
 
 st.divider()
 
@@ -175,28 +186,8 @@ st.divider()
 # BOUTON DE TÉLÉCHARGEMENT DES KPIs
 
 
-# Créer un DataFrame contenant uniquement les KPIs
-kpi_data = {
-    'KPI': [
-        'Clients Actifs',
-        'Taux de Churn (%)',
-        'Revenu Mensuel ($)',
-        'Ancienneté Moyenne (mois)',
-        'Sans Internet (%)',
-        'Facture Démat (%)',
-        'Clients Seniors (%)'
-    ],
-    'Valeur': [
-        total_clients,
-        round(safe_divide(churn_count, total_clients) * 100, 2),
-        round(monthly_revenue, 2),
-        round(avg_tenure, 2) if not pd.isna(avg_tenure) else 0,
-        round(no_internet, 2),
-        round(paperless, 2),
-        round(seniors, 2)
-    ]
-}
-df_kpis = pd.DataFrame(kpi_data)
+# DataFrame des KPIs déjà calculés pour la sélection
+df_kpis = kpi_table(kpis)
 
 # Bouton qui prépare et affiche le bouton de téléchargement
 if st.button("✅ Préparer le fichier CSV des KPIs"):
@@ -229,21 +220,21 @@ with st.expander("🤖 Assistant d'Analyse des KPIs", expanded=True):
     user_question = st.text_input("Votre question ici :", key="chatbot_input")
 
     if user_question:
-        response = get_chatbot_response(df_filtered, user_question)
+        response = get_chatbot_response(kpis, user_question)
         st.info(response)
 
 
 # VISUALISATIONS
 
-if len(df_filtered) > 0:
-    tab1, tab2 = st.tabs(["Analyse Clients", "Services"])
+if total_clients > 0:
+    tab1, tab2, tab3, tab4 = st.tabs(["Analyse Clients", "Services", "Rétention", "Clients à Risque"])
 
     with tab1:
         col1, col2 = st.columns(2)
 
         with col1:
-            fig = px.histogram(
-                df_filtered,
+            fig = histogram_figure(
+                summary['groups']['tenure_by_churn'],
                 x='tenure',
                 color='Churn',
                 title="Distribution par Ancienneté",
@@ -253,8 +244,8 @@ if len(df_filtered) > 0:
             st.plotly_chart(fig, use_container_width=True)
 
         with col2:
-            fig = px.box(
-                df_filtered,
+            fig = box_figure(
+                summary['groups']['charges_by_churn_contract'],
                 x='Churn',
                 y='MonthlyCharges',
                 color='Contract',
@@ -268,8 +259,8 @@ if len(df_filtered) > 0:
             st.plotly_chart(fig, use_container_width=True)
 
     with tab2:
-        fig = px.sunburst(
-            df_filtered,
+        fig = sunburst_figure(
+            summary['groups']['charges_by_service'],
             path=['Contract', 'InternetService'],
             values='MonthlyCharges',
             color='Churn',
@@ -277,6 +268,55 @@ if len(df_filtered) > 0:
             color_discrete_map={'Yes': '#FF6347', 'No': '#5F9EA0'}
         )
         st.plotly_chart(fig, use_container_width=True)
+
+    with tab3:
+        retention_segments = st.multiselect(
+            "Courbes par",
+            options=list(RETENTION_SEGMENTS),
+            default=['Contract'],
+            key="retention_segments"
+        )
+        if retention_segments:
+            fig = retention_figure(
+                summary['groups']['retention'],
+                retention_segments,
+                title="Rétention des clients selon l'ancienneté (Kaplan-Meier)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("Choisissez au moins une colonne pour découper les courbes.")
+
+    with tab4:
+        if DASHBOARD_BACKEND == "dataset":
+            st.info("Le scoring du portefeuille n'est disponible qu'avec le jeu chargé en mémoire (DASHBOARD_BACKEND=memory).")
+        else:
+            # Scores calculés une fois par version du modèle ; les filtres ne font que les relire
+            top_n = st.slider("Nombre de clients affichés", min_value=10, max_value=200, value=50, step=10,
+                              key="top_n_selector")
+            risk = load_portfolio_scorer(*active_model()).selection(active_equals, active_ranges, top_n)
+            counts, edges = risk['histogram']
+
+            risk1, risk2 = st.columns(2)
+            risk1.metric("🎯 Risque Moyen Prédit", f"{risk['mean'] * 100:.1f}%")
+            risk2.metric("🚨 Clients à Risque (≥ 50%)", f"{int(counts[edges[:-1] >= 0.5].sum()):,}")
+
+            fig = px.bar(
+                x=(edges[:-1] + edges[1:]) / 2 * 100,
+                y=counts,
+                labels={'x': "Risque de churn prédit (%)", 'y': "Clients"},
+                title="Distribution du Risque de Churn"
+            )
+            fig.update_traces(width=(edges[1] - edges[0]) * 100, marker_color='#FF7F50')
+            fig.update_layout(bargap=0)
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(f"**Top {top_n} des clients les plus à risque**")
+            st.dataframe(
+                risk['top'][['Risque de churn (%)', 'customerID', 'Contract', 'tenure', 'MonthlyCharges',
+                             'InternetService', 'PaymentMethod', 'Churn']],
+                use_container_width=True,
+                hide_index=True
+            )
 else:
     st.warning("Aucune donnée ne correspond aux filtres sélectionnés. Veuillez élargir vos critères.")
 
@@ -4,8 +4,8 @@ import pandas as pd
 import plotly.graph_objects as go
 import time
 from pathlib import Path
-import joblib
 import os
+import sys
 import plotly.express as px
 
 st.set_page_config(
@@ -18,6 +18,7 @@ st.set_page_config(
 # mais leur usage est conservé dans le code.
 from utils.ui_style import set_background, custom_sidebar_style, apply_prediction_button_style
 from utils.auth import check_authentication
+from utils.data_loader import DASHBOARD_BACKEND, USE_COMPACT_MODEL, load_customer_index
 
 
 # =============================================
@@ -29,10 +30,33 @@ from utils.auth import check_authentication
 # Utilisation de .resolve() pour gérer les liens symboliques et obtenir le chemin absolu
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
-# Chemins des modèles - CORRECTION DU CHEMIN
-# Suppression du slash initial '/' pour un chemin relatif correct depuis la racine du projet
-MODEL_PATH = PROJECT_ROOT / "model" / "modele_random_forest.pkl"
-COLUMNS_PATH = PROJECT_ROOT / "model" / "training_columns.pkl"
+# Le module d'encodage est partagé avec l'API (dossier API/ à la racine du projet)
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from API.cache import PredictionCache, artifact_fingerprint, customer_key
+from API.encoder import format_contributions, format_prediction
+from API.registry import FOREST_FILE, INITIAL_VERSION, ModelRegistry
+
+# Chemins des modèles : version active du registre (model/CURRENT), sinon les fichiers de model/
+MODEL_REGISTRY = ModelRegistry(PROJECT_ROOT / "model")
+MODEL_VERSION = MODEL_REGISTRY.active_version() or INITIAL_VERSION
+MODEL_PATH = Path(MODEL_REGISTRY.model_path(MODEL_VERSION))
+COLUMNS_PATH = Path(MODEL_REGISTRY.columns_path(MODEL_VERSION))
+# Artefact compact (python -m API.compact) : servi à la place du modèle quand il lui correspond
+FOREST_PATH = Path(MODEL_REGISTRY.version_dir(MODEL_VERSION)) / FOREST_FILE
+
+# Valeurs du formulaire quand aucun client n'est recherché (TotalCharges : ancienneté × charges mensuelles)
+FORM_DEFAULTS = {
+    "gender": "Male", "SeniorCitizen": 0, "Partner": "No", "Dependents": "No", "tenure": 12,
+    "PhoneService": "Yes", "MultipleLines": "No", "InternetService": "DSL", "OnlineSecurity": "No",
+    "OnlineBackup": "No", "DeviceProtection": "No", "TechSupport": "No", "StreamingTV": "No",
+    "StreamingMovies": "No", "Contract": "Month-to-month", "PaperlessBilling": "No",
+    "PaymentMethod": "Electronic check", "MonthlyCharges": 65.5, "TotalCharges": None
+}
+GENDERS = ["Male", "Female"]
+CONTRACTS = ["Month-to-month", "One year", "Two year"]
+INTERNET_SERVICES = ["DSL", "Fiber optic", "No"]
+PAYMENT_METHODS = ["Electronic check", "Mailed check", "Bank transfer (automatic)", "Credit card (automatic)"]
 
 # URL de l'API : Lire depuis une variable d'environnement pour la flexibilité de déploiement
 API_URL = "https://telecom-churn-app-production-edab.up.railway.app/predict"
@@ -43,29 +67,64 @@ API_URL = "https://telecom-churn-app-production-edab.up.railway.app/predict"
 # =============================================
 
 @st.cache_resource  # Cache le chargement du modèle pour éviter de le recharger à chaque réexécution
-def load_churn_model(model_path, columns_path):
-    """Charge le modèle de prédiction et les colonnes d'entraînement."""
+def load_churn_model(version, fingerprint=None):
+    """
+    Charge une version du modèle comme l'API (encodeur partagé, inférence de chauffe) :
+    depuis l'artefact compact s'il est à jour, sinon depuis le modèle et les colonnes d'entraînement.
+    `fingerprint` ne sert que de clé de cache : le modèle est rechargé si ses fichiers changent.
+    """
     try:
-        model = joblib.load(model_path)
-        training_columns = joblib.load(columns_path)
-        return model, training_columns
+        return MODEL_REGISTRY.load(version, compact=USE_COMPACT_MODEL).predictor
     except FileNotFoundError:
         st.error(
-            f"Erreur: Fichier modèle ou colonnes introuvable. Vérifiez les chemins : {model_path} et {columns_path}")
+            f"Erreur: Fichier modèle ou colonnes introuvable. Vérifiez les chemins : {MODEL_PATH} et {COLUMNS_PATH}")
         st.stop()
     except Exception as e:
         st.error(f"Erreur lors du chargement du modèle : {e}")
         st.stop()
 
 
+@st.cache_resource  # Un seul cache de prédictions partagé par toutes les sessions
+def get_prediction_cache():
+    """Cache LRU des prédictions locales (mêmes réglages que l'API)."""
+    return PredictionCache(
+        int(os.environ.get("PREDICTION_CACHE_SIZE", 10000)),
+        float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+    )
+
+
 # Chargement initial des modèles
 # Le chargement est protégé par un try-except qui arrêtera l'application en cas d'échec
 try:
-    model, training_columns = load_churn_model(MODEL_PATH, COLUMNS_PATH)
+    model_fingerprint = artifact_fingerprint(MODEL_PATH, COLUMNS_PATH, FOREST_PATH)
+    predictor = load_churn_model(MODEL_VERSION, model_fingerprint)
 except:
     st.stop()
 
 
+def customer_fields(customer_index, position):
+    """Les 19 champs du formulaire pour le client à cette position de l'index (sans copier le jeu de données)."""
+    row = customer_index.row(position)
+    fields = {field: row[field] for field in FORM_DEFAULTS}
+    fields["SeniorCitizen"] = int(fields["SeniorCitizen"])
+    fields["tenure"] = int(fields["tenure"])
+    # Montants stockés en float32 : ramenés aux centimes saisis
+    fields["MonthlyCharges"] = round(float(fields["MonthlyCharges"]), 2)
+    # Charges totales absentes (nouveau client) : 0, comme l'encodeur du modèle
+    fields["TotalCharges"] = 0.0 if pd.isna(fields["TotalCharges"]) else round(float(fields["TotalCharges"]), 2)
+    return fields
+
+
+def service_value(checked, available, missing_label):
+    """
+    Valeur d'une option de service : "No internet service" / "No phone service" sans le
+    service de base (catégories distinctes de "No" à l'entraînement), sinon Yes/No.
+    """
+    if not available:
+        return missing_label
+    return "Yes" if checked else "No"
+
+
 def try_api_prediction(client_data: dict):
     """
     Tente une prédiction via l'API externe.
@@ -79,8 +138,10 @@ def try_api_prediction(client_data: dict):
 
     try:
         # Envoi des données avec timeout court
+        # explain=true : contributions des variables pour ce client
         response = requests.post(
             API_URL,
+            params={"explain": "true"},
             json=client_data,
             headers={"Content-Type": "application/json"},
             timeout=10  # Augmenté légèrement le timeout pour plus de robustesse
@@ -112,40 +173,29 @@ def try_api_prediction(client_data: dict):
         return None, None
 
 
-def try_local_prediction(client_data: dict, model, training_columns):
+def try_local_prediction(client_data: dict, predictor):
     """
     Tente une prédiction avec le modèle local chargé en mémoire.
+    Utilise le même encodeur que l'API : les deux chemins donnent la même réponse.
     """
     try:
-        input_df = pd.DataFrame([client_data])
-
-        # Le code d'encodage one-hot a été omis dans la version fournie,
-        # mais la conversion des valeurs 'Oui'/'Non' en 'Yes'/'No' est nécessaire.
-        mapping = {'Oui': 'Yes', 'Non': 'No'}
-        for col in ['MultipleLines', 'OnlineSecurity', 'OnlineBackup', 'DeviceProtection', 'TechSupport', 'StreamingTV',
-                    'StreamingMovies']:
-            if col in input_df.columns:
-                input_df[col] = input_df[col].map(lambda x: mapping.get(x, x))
-
-        # Encodage One-Hot pour le DataFrame
-        input_encoded = pd.get_dummies(input_df)
-
-        # Assurer que toutes les colonnes d'entraînement sont présentes, remplir avec 0 si manquant
-        input_encoded = input_encoded.reindex(columns=training_columns, fill_value=0)
-
-        prediction_raw = model.predict(input_encoded)[0]
-        proba_raw = model.predict_proba(input_encoded)[0]
-
-        # Trouver l'indice de la classe prédite pour obtenir sa probabilité
-        class_index = model.classes_.tolist().index(prediction_raw)
-        confidence = round(proba_raw[class_index] * 100, 2)
-
-        prediction_message = "Le client va se désabonner" if prediction_raw == "Yes" else "Le client va rester"
+        # Le cache est vidé automatiquement si les fichiers du modèle ont changé
+        prediction_cache = get_prediction_cache()
+        prediction_cache.ensure_model(model_fingerprint)
+
+        key = customer_key(client_data)
+        outcome = prediction_cache.get(key)
+        if outcome is None:
+            outcome = predictor.predict_one(client_data)
+            prediction_cache.put(key, outcome)
+        is_churn, churn_proba = outcome
+        bias, contributions = predictor.explain_many([client_data])
 
         return {
-            "prediction": prediction_message,
-            "probabilité": f"{confidence:.2f}%",
-            "feature_importances": get_feature_importances(model, training_columns, input_encoded)
+            **format_prediction(is_churn, churn_proba),
+            "feature_importances": predictor.feature_importances,
+            "contributions": format_contributions(bias[0], contributions[0], predictor.training_columns),
+            "model_version": MODEL_VERSION
         }, "modèle local"
     except Exception as e:
         st.error(f"Erreur lors de la prédiction locale : {e}")
@@ -153,26 +203,6 @@ def try_local_prediction(client_data: dict, model, training_columns):
         return None, str(e)
 
 
-def get_feature_importances(model, training_columns, input_data_encoded):
-    """
-    Extrait les importances des caractéristiques du modèle
-    et les formate pour l'affichage.
-    """
-    if hasattr(model, 'feature_importances_'):
-        importances = model.feature_importances_
-        feature_names = training_columns  # Les noms des colonnes après encodage one-hot
-
-        # Créer un DataFrame pour faciliter le tri et la visualisation
-        feature_importance_df = pd.DataFrame({
-            'Feature': feature_names,
-            'Importance': importances
-        }).sort_values(by='Importance', ascending=False)
-
-        # On peut ne garder que les N premières caractéristiques les plus importantes
-        return feature_importance_df.head(10)  # Retourne les 10 plus importantes
-    return None
-
-
 # =============================================
 # INTERFACE UTILISATEUR
 # =============================================
@@ -190,64 +220,93 @@ st.markdown("""
 """)
 st.divider()
 
+# Recherche d'un client existant : identifiant exact (index en temps constant) ou début
+# d'identifiant (bisection dans les identifiants triés) ; le formulaire est alors pré-rempli
+customer_index = load_customer_index()
+search_help = "Saisissez l'identifiant complet ou son début pour afficher les clients correspondants."
+if DASHBOARD_BACKEND == "dataset":
+    search_help += " Les clients ajoutés depuis le démarrage ne sont pas recherchés avec DASHBOARD_BACKEND=dataset."
+search = st.text_input("🔎 Rechercher un client existant (customerID)", key="customer_search", help=search_help)
+customer_id = None
+if search:
+    if customer_index.lookup(search) is not None:
+        customer_id = search.strip()
+    else:
+        suggestions = customer_index.complete(search)
+        if suggestions:
+            customer_id = st.selectbox("Clients correspondants", suggestions, index=None,
+                                       placeholder="Choisissez un client", key="customer_suggestion")
+        else:
+            st.warning("Aucun client ne correspond à cet identifiant.")
+defaults = customer_fields(customer_index, customer_index.lookup(customer_id)) if customer_id else FORM_DEFAULTS
+if customer_id:
+    st.info(f"Formulaire pré-rempli avec le client {customer_id} : la prédiction est lancée directement.")
+
 with st.form("prediction_form"):
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Informations Client")
-        gender = st.radio("Genre", ["Male", "Female"], horizontal=True)
-        senior = st.checkbox("Senior (65+ ans)", help="Indique si le client est âgé de 65 ans ou plus.")
-        partner = st.checkbox("Partenaire", help="Indique si le client a un partenaire.")
-        dependents = st.checkbox("Personnes à charge", help="Indique si le client a des personnes à charge.")
-        tenure = st.slider("Ancienneté (mois)", 1, 72, 12,
+        gender = st.radio("Genre", GENDERS, index=GENDERS.index(defaults["gender"]), horizontal=True)
+        senior = st.checkbox("Senior (65+ ans)", value=defaults["SeniorCitizen"] == 1,
+                             help="Indique si le client est âgé de 65 ans ou plus.")
+        partner = st.checkbox("Partenaire", value=defaults["Partner"] == "Yes",
+                              help="Indique si le client a un partenaire.")
+        dependents = st.checkbox("Personnes à charge", value=defaults["Dependents"] == "Yes",
+                                 help="Indique si le client a des personnes à charge.")
+        # 0 mois : client arrivé ce mois-ci (présent dans le jeu de données)
+        tenure = st.slider("Ancienneté (mois)", 0, 72, defaults["tenure"],
                            help="Nombre de mois pendant lesquels le client est resté avec la compagnie.")
 
     with col2:
         st.subheader("Services & Contrat")
-        contract = st.selectbox("Type de contrat", ["Month-to-month", "One year", "Two year"],
+        contract = st.selectbox("Type de contrat", CONTRACTS, index=CONTRACTS.index(defaults["Contract"]),
                                 help="Durée du contrat du client.")
-        internet = st.selectbox("Service Internet", ["DSL", "Fiber optic", "No"],
+        internet = st.selectbox("Service Internet", INTERNET_SERVICES,
+                                index=INTERNET_SERVICES.index(defaults["InternetService"]),
                                 help="Type de service Internet souscrit.")
-        payment = st.selectbox("Méthode de paiement",
-                               ["Electronic check", "Mailed check", "Bank transfer (automatic)",
-                                "Credit card (automatic)"],
+        payment = st.selectbox("Méthode de paiement", PAYMENT_METHODS,
+                               index=PAYMENT_METHODS.index(defaults["PaymentMethod"]),
                                help="Méthode de paiement préférée du client.")
-        monthly_charges = st.number_input("Charges mensuelles ($)", min_value=18.0, max_value=150.0, value=65.5,
-                                          step=0.5, format="%.2f", help="Montant total facturé au client chaque mois.")
+        monthly_charges = st.number_input("Charges mensuelles ($)", min_value=18.0, max_value=150.0,
+                                          value=defaults["MonthlyCharges"], step=0.5, format="%.2f",
+                                          help="Montant total facturé au client chaque mois.")
         total_charges = st.number_input("Charges totales ($)", min_value=0.0, max_value=10000.0,
-                                        value=float(tenure * monthly_charges), step=10.0, format="%.2f",
+                                        value=float(tenure * monthly_charges) if defaults["TotalCharges"] is None
+                                        else defaults["TotalCharges"], step=10.0, format="%.2f",
                                         help="Montant total facturé au client sur toute la durée du contrat.")
 
     # Services optionnels
     with st.expander("Services optionnels"):
         services_col1, services_col2 = st.columns(2)
         with services_col1:
-            phone = st.checkbox("Service téléphonique", value=True,
+            phone = st.checkbox("Service téléphonique", value=defaults["PhoneService"] == "Yes",
                                 help="Indique si le client a un service téléphonique.")
-            multiple_lines = st.checkbox("Lignes multiples",
+            multiple_lines = st.checkbox("Lignes multiples", value=defaults["MultipleLines"] == "Yes",
                                          help="Indique si le client a plusieurs lignes téléphoniques.")
-            online_security = st.checkbox("Sécurité en ligne",
+            online_security = st.checkbox("Sécurité en ligne", value=defaults["OnlineSecurity"] == "Yes",
                                           help="Indique si le client a souscrit à un service de sécurité en ligne.")
-            online_backup = st.checkbox("Sauvegarde en ligne",
+            online_backup = st.checkbox("Sauvegarde en ligne", value=defaults["OnlineBackup"] == "Yes",
                                         help="Indique si le client a souscrit à un service de sauvegarde en ligne.")
         with services_col2:
-            device_protection = st.checkbox("Protection appareil",
+            device_protection = st.checkbox("Protection appareil", value=defaults["DeviceProtection"] == "Yes",
                                             help="Indique si le client a souscrit à un service de protection d'appareil.")
-            tech_support = st.checkbox("Support technique",
+            tech_support = st.checkbox("Support technique", value=defaults["TechSupport"] == "Yes",
                                        help="Indique si le client a souscrit à un service de support technique.")
-            streaming_tv = st.checkbox("TV en streaming",
+            streaming_tv = st.checkbox("TV en streaming", value=defaults["StreamingTV"] == "Yes",
                                        help="Indique si le client a souscrit à un service de streaming TV.")
-            streaming_movies = st.checkbox("Films en streaming",
+            streaming_movies = st.checkbox("Films en streaming", value=defaults["StreamingMovies"] == "Yes",
                                            help="Indique si le client a souscrit à un service de streaming de films.")
 
-    paperless = st.checkbox("Facturation électronique",
+    paperless = st.checkbox("Facturation électronique", value=defaults["PaperlessBilling"] == "Yes",
                             help="Indique si le client reçoit ses factures par voie électronique.")
     submitted = st.form_submit_button("Lancer la prédiction", type="primary")
 
 # =============================================
 # LOGIQUE DE PRÉDICTION
 # =============================================
-if submitted:
+# Un client retrouvé par la recherche est scoré sans attendre la soumission du formulaire
+if submitted or customer_id:
     # Validation de la cohérence des charges totales
     expected_total_charges = round(tenure * monthly_charges, 2)
     if tenure > 0 and abs(
@@ -259,27 +318,32 @@ if submitted:
         La valeur saisie (${total_charges:.2f}) pourrait affecter la précision de la prédiction.
         """)
 
-    client_data = {
-        "gender": gender,
-        "SeniorCitizen": 1 if senior else 0,
-        "Partner": "Yes" if partner else "No",
-        "Dependents": "Yes" if dependents else "No",
-        "tenure": tenure,
-        "PhoneService": "Yes" if phone else "No",
-        "MultipleLines": "Yes" if multiple_lines else "No",
-        "InternetService": internet,
-        "OnlineSecurity": "Yes" if online_security else "No",
-        "OnlineBackup": "Yes" if online_backup else "No",
-        "DeviceProtection": "Yes" if device_protection else "No",
-        "TechSupport": "Yes" if tech_support else "No",
-        "StreamingTV": "Yes" if streaming_tv else "No",
-        "StreamingMovies": "Yes" if streaming_movies else "No",
-        "Contract": contract,
-        "PaperlessBilling": "Yes" if paperless else "No",
-        "PaymentMethod": payment,
-        "MonthlyCharges": monthly_charges,
-        "TotalCharges": total_charges
-    }
+    if customer_id and not submitted:
+        # Client retrouvé, formulaire non modifié : sa ligne telle quelle, comme le scoring du portefeuille
+        client_data = dict(defaults)
+    else:
+        has_internet = internet != "No"
+        client_data = {
+            "gender": gender,
+            "SeniorCitizen": 1 if senior else 0,
+            "Partner": "Yes" if partner else "No",
+            "Dependents": "Yes" if dependents else "No",
+            "tenure": tenure,
+            "PhoneService": "Yes" if phone else "No",
+            "MultipleLines": service_value(multiple_lines, phone, "No phone service"),
+            "InternetService": internet,
+            "OnlineSecurity": service_value(online_security, has_internet, "No internet service"),
+            "OnlineBackup": service_value(online_backup, has_internet, "No internet service"),
+            "DeviceProtection": service_value(device_protection, has_internet, "No internet service"),
+            "TechSupport": service_value(tech_support, has_internet, "No internet service"),
+            "StreamingTV": service_value(streaming_tv, has_internet, "No internet service"),
+            "StreamingMovies": service_value(streaming_movies, has_internet, "No internet service"),
+            "Contract": contract,
+            "PaperlessBilling": "Yes" if paperless else "No",
+            "PaymentMethod": payment,
+            "MonthlyCharges": monthly_charges,
+            "TotalCharges": total_charges
+        }
 
     # Barre de progression (simple visuel, peut être remplacé par un spinner)
     progress_text = "Calcul de la prédiction en cours..."
@@ -295,17 +359,19 @@ if submitted:
     # Fallback local si échec API
     if result is None:
         st.warning("L'API n'est pas disponible. Tentative avec le modèle local...")
-        result, error_msg = try_local_prediction(client_data, model, training_columns)
+        result, error_msg = try_local_prediction(client_data, predictor)
         if result is None:
             st.error(f"Échec de la prédiction locale : {error_msg}")
             st.stop()
         source = "local"
 
     # Affichage des résultats
-    st.success(f"Prédiction réussie via {source.upper()}")
+    model_version = result.get("model_version")
+    st.success(f"Prédiction réussie via {source.upper()}" + (f" (modèle {model_version})" if model_version else ""))
     prediction = result["prediction"]
     confidence = float(result["probabilité"].replace("%", ""))
     feature_importances_df = result.get("feature_importances")  # Récupérer les importances si disponibles
+    contributions = result.get("contributions")  # Contributions propres à ce client (API récente ou modèle local)
 
     # Onglets de résultats
     tab1, tab2 = st.tabs(["Résultat", "Recommandations & Facteurs Clés"])
@@ -369,9 +435,32 @@ if submitted:
 
         st.markdown("---")
         st.markdown("#### Impact des variables clés sur la prédiction")
-        if feature_importances_df is not None:
+        if contributions is not None:
+            # Les 10 variables qui déplacent le plus la probabilité de ce client, en points de pourcentage
+            contributions_df = pd.DataFrame({
+                "Feature": list(contributions["features"].keys()),
+                "Contribution": [value * 100 for value in contributions["features"].values()]
+            })
+            contributions_df = contributions_df.loc[
+                contributions_df["Contribution"].abs().sort_values(ascending=False).index[:10]]
+            contributions_df["Effet"] = contributions_df["Contribution"].map(
+                lambda value: "Augmente le risque" if value > 0 else "Réduit le risque")
+            fig_contributions = px.bar(
+                contributions_df,
+                x='Contribution',
+                y='Feature',
+                orientation='h',
+                color='Effet',
+                color_discrete_map={"Augmente le risque": "#cc0000", "Réduit le risque": "#008000"},
+                title="Contribution des variables à la probabilité de churn de ce client (points de %)"
+            )
+            fig_contributions.update_layout(yaxis={'categoryorder': 'total ascending'})
+            st.plotly_chart(fig_contributions, use_container_width=True)
+            st.caption(f"Probabilité de référence du modèle : {contributions['bias'] * 100:.2f}%. "
+                       "Chaque barre indique de combien la variable augmente ou réduit cette probabilité pour ce client.")
+        elif feature_importances_df is not None:
             fig_importance = px.bar(
-                feature_importances_df,
+                pd.DataFrame(feature_importances_df),
                 x='Importance',
                 y='Feature',
                 orientation='h',
@@ -0,0 +1,212 @@
+import math
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+# Nombre maximal de points aberrants dessinés par boîte (échantillon aléatoire fixe)
+MAX_OUTLIERS_PER_BOX = 200
+
+
+def group_totals(df, keys, weight=None):
+    """
+    Effectifs (ou sommes de `weight`, en float64) par combinaison des colonnes `keys`.
+    Les graphiques ne partent que de ces agrégats : additionnés morceau par morceau
+    (merge_totals), ils donnent le même résultat que sur le jeu complet.
+    """
+    key_columns = [df[column] for column in keys]
+    if weight is None:
+        return df.groupby(key_columns, sort=False, observed=True).size()
+    return df[weight].astype(np.float64).groupby(key_columns, sort=False, observed=True).sum()
+
+
+def merge_totals(total, part):
+    """Cumul de deux résultats de group_totals."""
+    return part if total is None else total.add(part, fill_value=0)
+
+
+def _nice_bin_size(span, nbins):
+    """Largeur de classe « ronde » (1, 2 ou 5 × 10^k), comme le découpage automatique de Plotly."""
+    raw = span / max(nbins, 1) if span > 0 else 1.0
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for step in (1, 2, 5, 10):
+        if step * magnitude >= raw:
+            return step * magnitude
+
+
+def histogram_bins(counts, x, color, nbins):
+    """
+    Effectifs par classe de `x` et par valeur de `color`, à partir des effectifs par
+    (color, x) : une ligne par classe non vide, avec le centre et la largeur de la classe.
+    """
+    counts = counts[counts > 0]
+    if counts.empty:
+        return pd.DataFrame(columns=[x, color, "count", "width"])
+    colors = counts.index.get_level_values(0)
+    values = counts.index.get_level_values(1).to_numpy(dtype=np.float64)
+    low, high = values.min(), values.max()
+    size = _nice_bin_size(high - low, nbins)
+    start = math.floor(low / size) * size
+    if np.all(values == np.round(values)) and size >= 1:
+        # Données entières : bornes décalées d'une demi-unité pour ne couper aucune valeur
+        start -= 0.5
+    n_bins = int((high - start) // size) + 1
+    bins = np.minimum(((values - start) // size).astype(np.int64), n_bins - 1)
+
+    groups, group_values = pd.factorize(colors)
+    binned = np.bincount(groups * n_bins + bins, weights=counts.to_numpy(), minlength=len(group_values) * n_bins)
+    binned = binned.reshape(len(group_values), n_bins)
+    group_index, bin_index = np.nonzero(binned)
+    return pd.DataFrame({
+        x: start + (bin_index + 0.5) * size,
+        color: np.asarray(group_values)[group_index],
+        "count": binned[group_index, bin_index].astype(np.int64),
+        "width": size,
+    })
+
+
+def _weighted_quantiles(values, counts, quantiles):
+    """Quantiles (méthode linéaire de np.quantile) d'un échantillon décrit par ses valeurs distinctes triées et leurs effectifs."""
+    cumulative = np.cumsum(counts)
+    positions = (cumulative[-1] - 1) * np.asarray(quantiles)
+    below = np.floor(positions)
+    low = values[np.searchsorted(cumulative, below, side="right")]
+    high = values[np.searchsorted(cumulative, np.minimum(below + 1, cumulative[-1] - 1), side="right")]
+    return low + (high - low) * (positions - below)
+
+
+def box_stats(counts, x, y, color, max_outliers=MAX_OUTLIERS_PER_BOX, seed=0):
+    """
+    Statistiques d'une boîte à moustaches par couple (x, color), à partir des effectifs par
+    (x, color, y) : quartiles (méthode linéaire), moustaches à 1,5 × IQR bornées aux données,
+    et un échantillon (sans remise) des points aberrants.
+    """
+    rng = np.random.default_rng(seed)
+    counts = counts[counts > 0]
+    rows = []
+    for (x_value, color_value), group in counts.groupby(level=[0, 1], sort=False, observed=True):
+        group = group.droplevel([0, 1]).sort_index()
+        values = group.index.to_numpy(dtype=np.float64)
+        weights = group.to_numpy().astype(np.int64)
+        q1, median, q3 = _weighted_quantiles(values, weights, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        lower = values[np.searchsorted(values, q1 - 1.5 * iqr, side="left")]
+        upper = values[np.searchsorted(values, q3 + 1.5 * iqr, side="right") - 1]
+        outside = (values < lower) | (values > upper)
+        outlier_counts = weights[outside]
+        if outlier_counts.sum() > max_outliers:
+            outlier_counts = rng.multivariate_hypergeometric(outlier_counts, max_outliers)
+        rows.append({x: x_value, color: color_value, "q1": q1, "median": median, "q3": q3,
+                     "lowerfence": lower, "upperfence": upper,
+                     "outliers": np.repeat(values[outside], outlier_counts).tolist(), "n": int(weights.sum())})
+    return pd.DataFrame(rows, columns=[x, color, "q1", "median", "q3", "lowerfence", "upperfence", "outliers", "n"])
+
+
+def sunburst_sums(sums, path, values, color):
+    """
+    Sommes de `values` par feuille de `path`, à partir des sommes par (path..., color).
+    La couleur d'une feuille est la valeur de `color` si elle est unique dans le groupe,
+    "(?)" sinon (règle de px.sunburst).
+    """
+    frame = sums.rename(values).reset_index()
+    leaves = frame.groupby(list(path), sort=False, observed=True)
+    grouped = pd.DataFrame({
+        values: leaves[values].sum(),
+        "_colors": leaves[color].nunique(),
+        color: leaves[color].first().astype(object),
+    }).reset_index()
+    grouped[color] = grouped[color].where(grouped.pop("_colors") == 1, "(?)")
+    return grouped
+
+
+def retention_curves(counts, segments, time="tenure", event="Churn", event_value="Yes"):
+    """
+    Courbes de rétention de Kaplan–Meier par combinaison des colonnes `segments`, à
+    partir des effectifs indexés par des niveaux nommés (segments, time, event...) :
+    une grille segments × durées triées, dont les clients encore présents se déduisent
+    par cumul depuis la fin et la rétention par produit cumulé, tous segments à la fois.
+    """
+    counts = counts[counts > 0]
+    segments = list(segments)
+    if counts.empty:
+        return pd.DataFrame(columns=["segment", time, "retention", "at_risk"])
+    index = counts.index
+    segment_codes, segment_values = pd.MultiIndex.from_arrays(
+        [index.get_level_values(column).astype(object) for column in segments]).factorize()
+    time_codes, time_values = pd.factorize(index.get_level_values(time), sort=True)
+    cells = segment_codes * len(time_values) + time_codes
+    weights = counts.to_numpy(dtype=np.float64)
+    churned = weights * (index.get_level_values(event) == event_value)
+    shape = (len(segment_values), len(time_values))
+    total = np.bincount(cells, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+    events = np.bincount(cells, weights=churned, minlength=shape[0] * shape[1]).reshape(shape)
+
+    # Clients toujours présents au début de chaque durée : effectifs cumulés depuis la plus longue
+    at_risk = np.cumsum(total[:, ::-1], axis=1)[:, ::-1]
+    hazard = np.divide(events, at_risk, out=np.zeros(shape), where=at_risk > 0)
+    retention = np.cumprod(1 - hazard, axis=1)
+    segment_index, time_index = np.nonzero(at_risk > 0)
+    labels = np.array([" / ".join(map(str, values)) for values in segment_values], dtype=object)
+    return pd.DataFrame({
+        "segment": labels[segment_index],
+        time: np.asarray(time_values)[time_index],
+        "retention": retention[segment_index, time_index] * 100,
+        "at_risk": at_risk[segment_index, time_index].astype(np.int64),
+    })
+
+
+def histogram_figure(counts, x, color, title, nbins, color_discrete_map):
+    """Équivalent de px.histogram(df, x, color, nbins) tracé à partir des effectifs par (color, x)."""
+    bins = histogram_bins(counts, x, color, nbins)
+    fig = px.bar(bins, x=x, y="count", color=color, title=title, color_discrete_map=color_discrete_map,
+                 category_orders={color: list(dict.fromkeys(bins[color]))})
+    fig.update_traces(width=bins["width"].iloc[0] if len(bins) else None)
+    fig.update_layout(bargap=0, barmode="relative")
+    return fig
+
+
+def box_figure(counts, x, y, color, title, color_discrete_map):
+    """Équivalent de px.box(df, x, y, color) : seuls les quartiles, moustaches et aberrants échantillonnés sont envoyés."""
+    stats = box_stats(counts, x, y, color)
+    fig = go.Figure()
+    for color_value, boxes in stats.groupby(color, sort=False, observed=True):
+        fig.add_trace(go.Box(
+            name=str(color_value),
+            x=boxes[x].tolist(),
+            q1=boxes["q1"].tolist(),
+            median=boxes["median"].tolist(),
+            q3=boxes["q3"].tolist(),
+            lowerfence=boxes["lowerfence"].tolist(),
+            upperfence=boxes["upperfence"].tolist(),
+            y=boxes["outliers"].tolist(),
+            boxpoints="outliers",
+            marker_color=color_discrete_map.get(color_value),
+            offsetgroup=str(color_value),
+            legendgroup=str(color_value),
+        ))
+    fig.update_layout(
+        title=title,
+        boxmode="group",
+        legend_title_text=color,
+        xaxis=dict(title=x, categoryorder="array", categoryarray=list(dict.fromkeys(stats[x]))),
+        yaxis_title=y,
+    )
+    return fig
+
+
+def sunburst_figure(sums, path, values, color, title, color_discrete_map):
+    """Équivalent de px.sunburst(df, path, values, color) sur les sommes par (path..., color)."""
+    return px.sunburst(sunburst_sums(sums, path, values, color), path=list(path), values=values, color=color,
+                       title=title, color_discrete_map=color_discrete_map)
+
+
+def retention_figure(counts, segments, title, time="tenure"):
+    """Courbes de rétention (en escalier) par segment, une trace par combinaison de `segments`."""
+    curves = retention_curves(counts, segments, time=time)
+    fig = px.line(curves, x=time, y="retention", color="segment", line_shape="hv", title=title,
+                  hover_data={"at_risk": True}, labels={"retention": "Clients retenus (%)", "segment": " / ".join(segments),
+                                                       "at_risk": "Clients suivis"})
+    fig.update_yaxes(range=[0, 100])
+    return fig
@@ -1,17 +1,14 @@
-import pandas as pd
 from typing import Dict, Any
 
 
 
 # LOGIQUE DU CHATBOT AMÉLIORÉE
 
-def safe_divide(a, b):
-    """Fonction utilitaire pour diviser sans erreur de division par zéro."""
-    return a / b if b != 0 else 0
-
-
-def get_chatbot_response(df: pd.DataFrame, user_input: str) -> str:
-   
+def get_chatbot_response(kpis: Dict[str, Any], user_input: str) -> str:
+    """
+    Réponse à une question sur les KPIs. kpis : KPIs de la sélection courante déjà
+    calculés par utils.kpi_engine (les mêmes que les tuiles et l'export).
+    """
     
     # Mettre en minuscules pour faciliter la correspondance des mots-clés
     user_input = user_input.lower()
@@ -27,24 +24,15 @@ def get_chatbot_response(df: pd.DataFrame, user_input: str) -> str:
         'clients_seniors': ['clients seniors', 'plus de 65 ans', 'personnes âgées']
     }
 
-    # Calcul des KPIs actuels pour le DataFrame filtré
-    total_clients = len(df)
-    churn_count = len(df[df['Churn'] == 'Yes'])
-    monthly_revenue = df['MonthlyCharges'].sum()
-    avg_tenure = df['tenure'].mean()
-    no_internet_percent = safe_divide(len(df[df['InternetService'] == 'No']), total_clients) * 100
-    paperless_percent = safe_divide(len(df[df['PaperlessBilling'] == 'Yes']), total_clients) * 100
-    seniors_percent = safe_divide(len(df[df['SeniorCitizen'] == 1]), total_clients) * 100
-
     # Stockage des valeurs des KPIs pour les réponses
     kpi_values = {
-        'clients_actifs': f"👥 {total_clients:,} clients actifs",
-        'taux_churn': f"⚠️ Le taux de churn est de {safe_divide(churn_count, total_clients) * 100:.1f}%",
-        'revenu_mensuel': f"💸 Le revenu mensuel total est de ${monthly_revenue:,.0f}",
-        'anciennete': f"⏳ L'ancienneté moyenne est de {avg_tenure:.1f} mois",
-        'sans_internet': f"  {no_internet_percent:.1f}% des clients n'ont pas de service internet",
-        'facture_demat': f"🌱 {paperless_percent:.1f}% des clients ont opté pour la facture dématérialisée",
-        'clients_seniors': f"👵 {seniors_percent:.1f}% des clients sont des seniors"
+        'clients_actifs': f"👥 {kpis['clients']:,} clients actifs",
+        'taux_churn': f"⚠️ Le taux de churn est de {kpis['churn_rate']:.1f}%",
+        'revenu_mensuel': f"💸 Le revenu mensuel total est de ${kpis['monthly_revenue']:,.0f}",
+        'anciennete': f"⏳ L'ancienneté moyenne est de {kpis['avg_tenure']:.1f} mois",
+        'sans_internet': f"  {kpis['no_internet_pct']:.1f}% des clients n'ont pas de service internet",
+        'facture_demat': f"🌱 {kpis['paperless_pct']:.1f}% des clients ont opté pour la facture dématérialisée",
+        'clients_seniors': f"👵 {kpis['seniors_pct']:.1f}% des clients sont des seniors"
     }
 
     # Cherche les KPIs demandés dans la question de l'utilisateur
@@ -0,0 +1,68 @@
+from bisect import bisect_left, bisect_right
+
+
+class CustomerIndex:
+    """
+    Index des identifiants clients d'une suite de DataFrames (jeu chargé puis clients
+    ajoutés), complété à chaque ajout sans être reconstruit.
+
+    - un dictionnaire customerID -> position de la ligne, pour une recherche exacte en temps constant,
+    - la liste triée des identifiants : les identifiants commençant par un préfixe y sont
+      contigus, trouvés par bisection sans parcourir le jeu de données,
+    - les DataFrames eux-mêmes, pour relire la ligne d'une position sans copier le jeu.
+    """
+
+    def __init__(self, frames=()):
+        self.positions = {}
+        self.sorted_ids = []
+        # (DataFrames, position de la première ligne de chacun), remplacés d'un bloc
+        self._parts = ([], [])
+        self._rows = 0
+        for frame in frames:
+            self.extend(frame)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def extend(self, frame):
+        """Ajoute les lignes de `frame` (colonne customerID), numérotées à la suite des précédentes."""
+        # tolist() d'une Series convertit en bloc, bien plus vite que de l'itérer
+        ids = frame["customerID"].tolist()
+        # Parcours à rebours : un identifiant répété désigne sa première ligne
+        added = dict(zip(reversed(ids), range(self._rows + len(ids) - 1, self._rows - 1, -1)))
+        if self.positions:
+            added = {customer_id: position for customer_id, position in added.items()
+                     if customer_id not in self.positions}
+        # Lignes d'abord, identifiants ensuite : une session qui trouve un identifiant peut relire sa ligne
+        frames, starts = self._parts
+        self._parts = (frames + [frame], starts + [self._rows])
+        self._rows += len(frame)
+        self.positions.update(added)
+        # Liste déjà triée + quelques identifiants : le tri fusionne en temps linéaire
+        self.sorted_ids = sorted(self.sorted_ids + list(added))
+
+    def replace_frames(self, frames):
+        """Remplace les DataFrames par d'autres aux mêmes lignes dans le même ordre (jeu reconstruit)."""
+        frames, starts, rows = list(frames), [], 0
+        for frame in frames:
+            starts.append(rows)
+            rows += len(frame)
+        self._parts = (frames, starts)
+
+    def lookup(self, customer_id):
+        """Position de la ligne du client, ou None s'il est inconnu."""
+        return self.positions.get(customer_id.strip())
+
+    def row(self, position):
+        """Ligne (Series) du client à cette position."""
+        frames, starts = self._parts
+        part = bisect_right(starts, position) - 1
+        return frames[part].iloc[position - starts[part]]
+
+    def complete(self, prefix, limit=10):
+        """Au plus `limit` identifiants commençant par `prefix`, dans l'ordre alphabétique."""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        start = bisect_left(self.sorted_ids, prefix)
+        return [customer_id for customer_id in self.sorted_ids[start:start + limit] if customer_id.startswith(prefix)]
@@ -0,0 +1,386 @@
+"""
+Sources de données du tableau de bord.
+
+- InMemoryBackend : jeu complet en mémoire (cache Feather), filtres résolus par
+  FilterIndex et KPIs lus dans KpiCube.
+- ArrowDatasetBackend : jeu Parquet partitionné (par exemple par Contract) lu par
+  pyarrow.dataset ; les filtres sont poussés dans le scan (élagage des partitions et
+  des groupes de lignes) et KPIs comme agrégats des graphiques sont cumulés morceau
+  par morceau avec pyarrow.compute, sans passer par pandas : la mémoire dépend de la
+  taille d'un morceau et du nombre de groupes, pas du jeu de données.
+
+Les deux exposent options(), bounds(), overall_totals() et summary(), que la page
+utilise sans savoir d'où viennent les données, ainsi que append() pour les nouveaux
+clients (voir utils.delta_refresh) et un numéro de version incrémenté à chaque ajout.
+Pour écrire le jeu partitionné depuis
+la racine du projet :
+    PYTHONPATH=APP python -m utils.dashboard_backend --output APP/data/telco_dataset --partition-by Contract
+"""
+import argparse
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.chart_data import group_totals, merge_totals
+from utils.customer_index import CustomerIndex
+from utils.delta_refresh import concat_frames, conform_frame, fits_integer
+from utils.filter_index import CATEGORICAL_FILTERS, NUMERIC_FILTERS, FilterIndex, filter_mask
+from utils.kpi_cube import MEASURES, KpiCube
+
+logger = logging.getLogger(__name__)
+
+# Colonnes lues pour les KPIs
+MEASURE_COLUMNS = ("Churn", "InternetService", "PaperlessBilling", "SeniorCitizen", "MonthlyCharges", "tenure")
+# Nombre de résultats partiels par morceau cumulés avant d'être fusionnés
+MAX_PARTIALS = 64
+# Part de lignes ajoutées (par rapport au jeu indexé) au-delà de laquelle index et cube sont reconstruits
+COMPACT_RATIO = 0.1
+
+
+def _table_totals(table):
+    """Sommes de MEASURES sur un morceau Arrow (mêmes définitions que kpi_cube)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    count = lambda mask: float(pc.sum(mask).as_py() or 0)
+    total = lambda column: float(pc.sum(pc.cast(table[column], pa.float64())).as_py() or 0.0)
+    return {
+        "clients": float(table.num_rows),
+        "churn": count(pc.equal(table["Churn"], "Yes")),
+        "monthly_revenue": total("MonthlyCharges"),
+        "tenure_sum": total("tenure"),
+        "no_internet": count(pc.equal(table["InternetService"], "No")),
+        "paperless": count(pc.equal(table["PaperlessBilling"], "Yes")),
+        "seniors": count(pc.equal(table["SeniorCitizen"], 1)),
+    }
+
+
+def _group_table(table, keys, weight):
+    """
+    Effectifs (ou sommes de `weight`) par combinaison de `keys` sur un morceau Arrow,
+    dans une table (keys..., value) aux clés décodées, prête à être concaténée.
+    """
+    import pyarrow as pa
+
+    if weight is None:
+        grouped = table.group_by(list(keys), use_threads=False).aggregate([([], "count_all")])
+    else:
+        grouped = table.group_by(list(keys), use_threads=False).aggregate([(weight, "sum")])
+    columns = [grouped[key].cast(grouped[key].type.value_type) if pa.types.is_dictionary(grouped[key].type)
+               else grouped[key] for key in keys]
+    return pa.table(columns + [grouped.column(len(keys)).cast(pa.float64())], names=list(keys) + ["value"])
+
+
+def _merge_groups(partials, keys):
+    import pyarrow as pa
+
+    return pa.concat_tables(partials).group_by(list(keys), use_threads=False).aggregate([("value", "sum")]) \
+        .rename_columns(list(keys) + ["value"])
+
+
+def state_key(equals, ranges, groups):
+    return (
+        tuple(sorted((equals or {}).items())),
+        tuple(sorted((column, tuple(float(v) for v in bounds)) for column, bounds in (ranges or {}).items())),
+        tuple(sorted((name, tuple(keys), weight) for name, (keys, weight) in groups.items())),
+    )
+
+
+class SummaryMemo:
+    """
+    Derniers résultats calculés par état de filtres (LRU), partageable entre sessions :
+    le verrou protège le dictionnaire, le calcul se fait hors verrou (deux sessions
+    peuvent calculer la même clé, la seconde écrase la première à l'identique).
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+class InMemoryBackend:
+    """
+    Jeu indexé (data, FilterIndex, KpiCube) et lignes ajoutées depuis (delta) : le cube
+    reçoit ces lignes directement, l'index ne couvre que data et les lignes ajoutées
+    sont filtrées par comparaison directe, jusqu'à ce qu'elles dépassent COMPACT_RATIO
+    du jeu indexé et que tout soit reconstruit sur l'ensemble.
+    """
+
+    def __init__(self, data, filter_index, kpi_cube, compact_ratio=COMPACT_RATIO):
+        self.data = data
+        self.filter_index = filter_index
+        self.kpi_cube = kpi_cube
+        self.compact_ratio = compact_ratio
+        self.delta = data.iloc[:0]
+        self.version = 0
+        self._customers = None
+        self._memo = SummaryMemo()
+        self._lock = threading.RLock()
+
+    def options(self, column):
+        options = self.filter_index.options[column]
+        if not len(self.delta):
+            return options
+        return list(dict.fromkeys(options + self.delta[column].dropna().unique().tolist()))
+
+    def bounds(self, column):
+        low, high = self.filter_index.bounds(column)
+        if len(self.delta):
+            low, high = min(low, self.delta[column].min()), max(high, self.delta[column].max())
+        return low, high
+
+    def overall_totals(self):
+        return self.kpi_cube.totals()
+
+    def summary(self, equals, ranges, groups):
+        """
+        KPIs (sommes de MEASURES) et agrégats des graphiques pour un état de filtres.
+        groups : {nom: (colonnes de regroupement, colonne sommée ou None pour compter)}.
+        """
+        # Seules les colonnes des graphiques sont copiées pour les lignes sélectionnées
+        columns = list(dict.fromkeys(column for keys, weight in groups.values()
+                                     for column in (*keys, *([weight] if weight else []))))
+
+        def compute():
+            frame = self.filter_index.filter(self.data, equals, ranges, columns)
+            added = self.delta[filter_mask(self.delta, equals, ranges)] if len(self.delta) else self.delta
+            grouped = {}
+            for name, (keys, weight) in groups.items():
+                grouped[name] = group_totals(frame, keys, weight)
+                if len(added):
+                    grouped[name] = merge_totals(grouped[name], group_totals(added, keys, weight))
+            return {"totals": self.kpi_cube.totals(equals, ranges), "groups": grouped}
+        with self._lock:
+            return self._memo.get_or_compute(state_key(equals, ranges, groups), compute)
+
+    def frames(self):
+        """Lignes indexées puis lignes ajoutées : l'ordre des positions de select() et take()."""
+        with self._lock:
+            return [self.data, self.delta]
+
+    def select(self, equals, ranges):
+        """Positions (triées) des clients qui vérifient les filtres."""
+        with self._lock:
+            rows = self.filter_index.select(equals, ranges)
+            if rows is None:
+                rows = np.arange(len(self.data))
+            if len(self.delta):
+                added = np.flatnonzero(filter_mask(self.delta, equals, ranges))
+                rows = np.concatenate([rows, len(self.data) + added])
+            return rows
+
+    def customer_index(self):
+        """Index des customerID (positions de take()), construit au premier appel puis complété par append()."""
+        with self._lock:
+            if self._customers is None:
+                self._customers = CustomerIndex(self.frames())
+            return self._customers
+
+    def snapshot(self, equals, ranges):
+        """Version, frames() et select() lus ensemble, sans ajout intercalé."""
+        with self._lock:
+            return self.version, self.frames(), self.select(equals, ranges)
+
+    def take(self, rows):
+        """Clients aux positions `rows` (numérotées comme par select()), dans cet ordre."""
+        with self._lock:
+            added = rows >= len(self.data)
+            if not added.any():
+                return self.data.take(rows)
+            parts = concat_frames([self.data.take(rows[~added]), self.delta.take(rows[added] - len(self.data))])
+            # Les lignes indexées viennent d'abord dans parts : retour à l'ordre demandé
+            return parts.take(np.argsort(np.argsort(added, kind="stable"), kind="stable"))
+
+    def append(self, rows):
+        """Ajoute des clients (DataFrame aux colonnes du jeu) ; coût proportionnel aux lignes ajoutées, hors reconstruction."""
+        rows = conform_frame(rows, self.data)
+        with self._lock:
+            self.delta = concat_frames([self.delta, rows])
+            if self._customers is not None:
+                self._customers.extend(rows)
+            if len(self.delta) > self.compact_ratio * len(self.data) or not self.kpi_cube.append(rows):
+                self._compact()
+            self.version += 1
+            self._memo = SummaryMemo()
+
+    def _compact(self):
+        self.data = concat_frames([self.data, self.delta])
+        self.filter_index = FilterIndex(self.data)
+        self.kpi_cube = KpiCube(self.data)
+        self.delta = self.data.iloc[:0]
+        if self._customers is not None:
+            # Mêmes lignes dans le même ordre : seules les références aux anciens morceaux sont libérées
+            self._customers.replace_frames([self.data])
+
+
+class ArrowDatasetBackend:
+    def __init__(self, path, chunk_rows=131072, categorical=CATEGORICAL_FILTERS, numeric=NUMERIC_FILTERS):
+        import pyarrow.dataset as ds
+
+        self.path = path
+        self.dataset = ds.dataset(path, format="parquet",
+                                  partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+        self.chunk_rows = chunk_rows
+        self.version = 0
+        self._memo = SummaryMemo()
+        self._lock = threading.RLock()
+
+        # Un premier scan (colonnes des filtres et des KPIs) : valeurs proposées, bornes et totaux
+        self._options = {column: {} for column in categorical}
+        self._bounds = {column: (np.inf, -np.inf) for column in numeric}
+        self._overall = dict.fromkeys(MEASURES, 0.0)
+        for chunk in self._chunks(None, set(categorical) | set(numeric) | set(MEASURE_COLUMNS)):
+            self._absorb(chunk)
+
+    def _absorb(self, chunk):
+        """Ajoute un morceau aux valeurs proposées, bornes et totaux du jeu complet."""
+        import pyarrow.compute as pc
+
+        for column in self._options:
+            values = pc.unique(chunk[column].combine_chunks()).drop_null()
+            self._options[column].update(dict.fromkeys(values.to_pylist()))
+        for column in self._bounds:
+            low, high = self._bounds[column]
+            extremes = pc.min_max(chunk[column])
+            self._bounds[column] = (min(low, extremes["min"].as_py()), max(high, extremes["max"].as_py()))
+        for name, value in _table_totals(chunk).items():
+            self._overall[name] += value
+
+    def _chunks(self, expression, columns):
+        """Morceaux Arrow d'au plus chunk_rows lignes, filtrés par pyarrow pendant la lecture."""
+        import pyarrow as pa
+
+        scanner = self.dataset.scanner(columns=sorted(columns), filter=expression, batch_size=self.chunk_rows,
+                                       batch_readahead=1, fragment_readahead=1)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield pa.Table.from_batches([batch])
+
+    def _expression(self, equals, ranges):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        expression = None
+        conditions = [ds.field(column) == value for column, value in (equals or {}).items()]
+        for column, (low, high) in (ranges or {}).items():
+            # Bornes au type de la colonne (float32), comme pour le backend en mémoire
+            column_type = self.dataset.schema.field(column).type
+            conditions.append((ds.field(column) >= pa.scalar(low).cast(column_type, safe=False))
+                              & (ds.field(column) <= pa.scalar(high).cast(column_type, safe=False)))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def options(self, column):
+        return list(self._options[column])
+
+    def bounds(self, column):
+        return self._bounds[column]
+
+    def overall_totals(self):
+        return dict(self._overall)
+
+    def summary(self, equals, ranges, groups):
+        """Même résultat que InMemoryBackend.summary, calculé en un scan filtré morceau par morceau."""
+        def compute():
+            columns = set(MEASURE_COLUMNS)
+            for keys, weight in groups.values():
+                columns |= set(keys) | ({weight} if weight else set())
+            totals = dict.fromkeys(MEASURES, 0.0)
+            partials = {name: [] for name in groups}
+            for chunk in self._chunks(self._expression(equals, ranges), columns):
+                for name, value in _table_totals(chunk).items():
+                    totals[name] += value
+                for name, (keys, weight) in groups.items():
+                    partials[name].append(_group_table(chunk, keys, weight))
+                    if len(partials[name]) >= MAX_PARTIALS:
+                        partials[name] = [_merge_groups(partials[name], keys)]
+            grouped = {}
+            for name, (keys, weight) in groups.items():
+                if not partials[name]:
+                    grouped[name] = pd.Series(dtype=np.float64)
+                    continue
+                frame = _merge_groups(partials[name], keys).to_pandas()
+                grouped[name] = frame.set_index(list(keys))["value"]
+            return {"totals": totals, "groups": grouped}
+        with self._lock:
+            return self._memo.get_or_compute(state_key(equals, ranges, groups), compute)
+
+    def append(self, rows):
+        """
+        Ajoute des clients au jeu partitionné, dans de nouveaux fichiers Parquet (les
+        fichiers existants ne sont pas réécrits) ; bornes, valeurs et totaux du jeu
+        complet sont mis à jour à partir de ces seules lignes.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        schema = self.dataset.schema
+        # Les fichiers existants fixent les types : une ligne qui n'y tient pas est rejetée, pas tronquée
+        fits = np.ones(len(rows), dtype=bool)
+        for field in schema:
+            if pa.types.is_integer(field.type):
+                fits &= fits_integer(rows[field.name], field.type.to_pandas_dtype())
+        if not fits.all():
+            logger.error("%d clients rejetés : valeurs hors des types du jeu partitionné (%s)",
+                         int((~fits).sum()), ", ".join(rows.loc[~fits, "customerID"].astype(str).head(5)))
+            rows = rows[fits]
+            if not len(rows):
+                return
+        table = pa.Table.from_pandas(rows[schema.names], preserve_index=False).cast(schema)
+        with self._lock:
+            ds.write_dataset(table, self.path, format="parquet", partitioning=self.dataset.partitioning.schema.names,
+                             partitioning_flavor="hive", basename_template=f"delta-{uuid.uuid4().hex}-{{i}}.parquet",
+                             existing_data_behavior="overwrite_or_ignore")
+            self._absorb(table)
+            self.dataset = ds.dataset(self.path, format="parquet",
+                                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+            self.version += 1
+            self._memo = SummaryMemo()
+
+
+def write_dataset(df, path, partition_by=("Contract",), rows_per_group=131072):
+    """Écrit le jeu clients en Parquet partitionné (répertoires Hive colonne=valeur)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(table, path, format="parquet", partitioning=list(partition_by), partitioning_flavor="hive",
+                     existing_data_behavior="delete_matching", max_rows_per_group=rows_per_group,
+                     min_rows_per_group=min(rows_per_group, 1 << 16))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="APP/data/telco_clean.csv")
+    parser.add_argument("--output", default="APP/data/telco_dataset")
+    parser.add_argument("--partition-by", nargs="+", default=["Contract"])
+    args = parser.parse_args()
+
+    from utils.data_loader import load_customers
+
+    df = load_customers(args.csv)
+    write_dataset(df, args.output, args.partition_by)
+    print(f"{len(df):,} clients écrits dans {args.output} (partitions : {', '.join(args.partition_by)})")
+
+
+if __name__ == "__main__":
+    main()
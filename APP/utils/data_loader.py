@@ -1,9 +1,186 @@
+import json
+import os
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from utils.customer_index import CustomerIndex
+from utils.dashboard_backend import ArrowDatasetBackend, InMemoryBackend
+from utils.delta_refresh import DeltaRefresher, DeltaSource
+from utils.filter_index import FilterIndex
+from utils.kpi_cube import KpiCube
+from utils.kpi_engine import KpiEngine
+from utils.portfolio_scoring import MODEL_REGISTRY, PortfolioScorer
+# API/ est rendu importable par utils.portfolio_scoring : même empreinte que le registre des modèles
+from API.cache import file_digest
+
+DATA_PATH = "APP/data/telco_clean.csv"
+# Source du tableau de bord : "memory" (jeu complet en mémoire) ou "dataset" (Parquet partitionné lu par morceaux)
+DASHBOARD_BACKEND = os.getenv("DASHBOARD_BACKEND", "memory")
+DASHBOARD_DATASET = os.getenv("DASHBOARD_DATASET", "APP/data/telco_dataset")
+DASHBOARD_CHUNK_ROWS = int(os.getenv("DASHBOARD_CHUNK_ROWS", "131072"))
+# Répertoire des fichiers CSV de nouveaux clients et intervalle de lecture en secondes (0 : désactivé)
+DASHBOARD_DELTA_DIR = os.getenv("DASHBOARD_DELTA_DIR", "APP/data/telco_deltas")
+DASHBOARD_REFRESH_SECONDS = float(os.getenv("DASHBOARD_REFRESH_SECONDS", "5"))
+# Modèle servi depuis l'artefact compact quand il est à jour : même variable et même défaut que l'API
+USE_COMPACT_MODEL = os.environ.get("FAST_STARTUP", "0") == "1"
+# Identifiant unique par client : chaîne (pas de catégorie à une valeur par ligne)
+ID_COLUMNS = ("customerID",)
+# Clé des métadonnées du cache décrivant le CSV d'origine (mtime, taille, SHA-256)
+SOURCE_KEY = b"telco_source"
+# Version des types de typed_frame, enregistrée avec le cache : un cache d'une autre version est reconstruit
+TYPES_VERSION = 2
+
+
+def cache_path_for(csv_path):
+    """Cache colonnes rangé à côté du CSV : telco_clean.csv -> telco_clean.feather."""
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+def typed_frame(df):
+    """
+    Types compacts : catégories pour les champs texte (Yes/No, services, contrat...),
+    int8 pour les indicateurs 0/1, int32 au moins pour les autres entiers (les clients
+    ajoutés ensuite doivent y tenir), float32 pour les montants.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in ID_COLUMNS:
+            columns[column] = values.astype(pd.StringDtype("pyarrow"))
+        elif values.dtype == object:
+            columns[column] = values.astype("category")
+        elif pd.api.types.is_bool_dtype(values) or (pd.api.types.is_integer_dtype(values) and values.isin([0, 1]).all()):
+            columns[column] = values.astype(np.int8)
+        elif pd.api.types.is_integer_dtype(values):
+            columns[column] = values.astype(np.promote_types(pd.to_numeric(values, downcast="integer").dtype, np.int32))
+        elif pd.api.types.is_float_dtype(values):
+            columns[column] = values.astype(np.float32)
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns)
+
+
+def _cached_source(cache_path):
+    """Description du CSV enregistrée dans le cache, ou None si le cache est absent ou illisible."""
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(cache_path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(metadata[SOURCE_KEY])
+    except (OSError, pa.ArrowInvalid, KeyError, ValueError):
+        return None
+
+
+def _read_cache(cache_path):
+    """
+    Lecture du cache Feather non compressé par projection mémoire : seules les catégories
+    sont converties, les identifiants restent des chaînes Arrow.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    strings = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+    return feather.read_table(cache_path, memory_map=True).to_pandas(types_mapper=strings.get, split_blocks=True)
+
+
+def _write_cache(df, cache_path, source):
+    """Écrit le cache Feather (remplacement atomique) ; un disque en lecture seule n'est pas une erreur."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCE_KEY: json.dumps(source)})
+    temporary = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, temporary, compression="uncompressed")
+        os.replace(temporary, cache_path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_customers(csv_path=DATA_PATH, cache_path=None):
+    """
+    Jeu de données clients typé. Lu depuis le cache Feather voisin du CSV tant que
+    celui-ci n'a pas changé (même mtime et taille, ou à défaut même SHA-256) et que le
+    cache a les types actuels (TYPES_VERSION) ; sinon le CSV est relu et le cache reconstruit.
+    """
+    cache_path = cache_path or cache_path_for(csv_path)
+    stat = os.stat(csv_path)
+    source = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "types": TYPES_VERSION}
+    cached = _cached_source(cache_path)
+
+    if cached and all(cached.get(key) == value for key, value in source.items()):
+        return _read_cache(cache_path)
+
+    source["sha256"] = file_digest(csv_path)
+    if cached and cached.get("sha256") == source["sha256"] and cached.get("types") == TYPES_VERSION:
+        # Contenu inchangé (fichier seulement touché) : le cache est réécrit avec la nouvelle date
+        df = _read_cache(cache_path)
+    else:
+        df = typed_frame(pd.read_csv(csv_path, encoding='utf-8'))
+    _write_cache(df, cache_path, source)
+    return df
+
+
 @st.cache_data
 def load_data():
-    df = pd.read_csv("APP/data/telco_clean.csv", encoding='utf-8')
-    return df
+    return load_customers()
+
+
+@st.cache_resource
+def load_customer_index():
+    """
+    Index des customerID (recherche exacte et par préfixe, lecture de la ligne d'un client),
+    construit une seule fois. En mémoire, c'est celui de la source du tableau de bord, complété
+    par les clients ajoutés ; avec DASHBOARD_BACKEND=dataset, il ne couvre que le jeu chargé.
+    """
+    backend = load_dashboard_backend()
+    if isinstance(backend, InMemoryBackend):
+        return backend.customer_index()
+    return CustomerIndex([load_customers()])
+
+
+@st.cache_resource
+def load_filter_index():
+    """Index de filtrage du tableau de bord, construit une seule fois pour le jeu de données chargé."""
+    return FilterIndex(load_data())
+
+
+@st.cache_resource
+def load_kpi_cube():
+    """Cube d'agrégats des KPIs du tableau de bord, construit une seule fois pour le jeu de données chargé."""
+    return KpiCube(load_data())
+
+
+@st.cache_resource
+def load_dashboard_backend():
+    """Source de données du tableau de bord choisie par DASHBOARD_BACKEND."""
+    if DASHBOARD_BACKEND == "dataset":
+        return ArrowDatasetBackend(DASHBOARD_DATASET, chunk_rows=DASHBOARD_CHUNK_ROWS)
+    return InMemoryBackend(load_data(), load_filter_index(), load_kpi_cube())
+
+
+@st.cache_resource
+def load_kpi_engine():
+    """KPIs du tableau de bord mémorisés par état de filtres, partagés entre les sessions."""
+    return KpiEngine(load_dashboard_backend())
+
+
+@st.cache_resource
+def load_delta_refresher():
+    """Lecture des nouveaux clients de DASHBOARD_DELTA_DIR, ajoutés à la source du tableau de bord."""
+    return DeltaRefresher(DeltaSource(DASHBOARD_DELTA_DIR), load_dashboard_backend(), DASHBOARD_REFRESH_SECONDS)
+
 
+@st.cache_resource
+def load_portfolio_scorer(model_version, fingerprint=None):
+    """
+    Scores de churn de tous les clients pour une version du modèle.
+    `fingerprint` ne sert que de clé de cache : tout est rescoré si les fichiers du modèle changent.
+    """
+    predictor = MODEL_REGISTRY.load(model_version, compact=USE_COMPACT_MODEL).predictor
+    return PortfolioScorer(predictor, load_dashboard_backend())
@@ -0,0 +1,180 @@
+"""
+Rafraîchissement incrémental du tableau de bord.
+
+Les nouveaux clients arrivent dans des fichiers CSV déposés dans un répertoire (mêmes
+colonnes que telco_clean.csv), qui ne font que grandir : nouveaux fichiers ou lignes
+ajoutées en fin de fichier. DeltaSource ne relit que les octets arrivés depuis le
+passage précédent ; DeltaRefresher les transmet, au plus une fois par intervalle, à la
+source de données du tableau de bord (append), qui met à jour ses agrégats avec ces
+seules lignes. La position de lecture d'un fichier n'avance qu'une fois ses lignes
+acceptées par append : un lot refusé est relu au passage suivant. Les lignes mal
+formées sont écartées une à une (journalisées), les montants illisibles deviennent
+manquants, sans faire perdre le reste du lot.
+"""
+import csv
+import glob
+import io
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+
+
+def fits_integer(values, dtype):
+    """Masque des valeurs entières, non manquantes et dans l'intervalle du type entier `dtype`."""
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    info = np.iinfo(dtype)
+    return (numbers == np.floor(numbers)) & (numbers >= info.min) & (numbers <= info.max)
+
+
+def conform_frame(df, like):
+    """
+    Colonnes de `like`, prises dans `df` et converties à ses types (catégories étendues
+    aux nouvelles valeurs). Une colonne entière dont une valeur ne tient pas dans le type
+    de `like` (ancienneté de 200 mois dans un int8) est élargie plutôt que tronquée.
+    """
+    columns = {}
+    for column, dtype in like.dtypes.items():
+        values = df[column]
+        if isinstance(dtype, pd.CategoricalDtype):
+            new = pd.Index(values.dropna().unique()).difference(dtype.categories)
+            columns[column] = values.astype(pd.CategoricalDtype(dtype.categories.append(new)))
+        elif pd.api.types.is_numeric_dtype(dtype):
+            # Valeur illisible (TotalCharges vide ou " ") : manquante, comme au chargement du CSV
+            numbers = pd.to_numeric(values, errors="coerce")
+            if pd.api.types.is_integer_dtype(dtype) and not fits_integer(numbers, dtype).all():
+                columns[column] = numbers
+            else:
+                columns[column] = numbers.astype(dtype)
+        else:
+            columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns)
+
+
+def concat_frames(frames):
+    """pd.concat qui garde les colonnes catégorielles (catégories réunies) au lieu de repasser en object."""
+    columns = {}
+    for column in frames[0].columns:
+        parts = [frame[column] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = pd.Series(union_categoricals(parts))
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_block(path, data):
+    """
+    DataFrame brut d'un bloc CSV (en-tête compris). Une ligne au mauvais nombre de champs
+    est écartée et journalisée au lieu de faire échouer tout le bloc ; les octets non UTF-8
+    sont remplacés.
+    """
+    try:
+        frame = pd.read_csv(io.BytesIO(data), encoding="utf-8", encoding_errors="replace")
+        # Première ligne trop longue : pandas en ferait un index implicite au lieu d'échouer
+        if isinstance(frame.index, pd.RangeIndex):
+            return frame
+    except pd.errors.ParserError:
+        pass
+    records = list(csv.reader(io.StringIO(data.decode("utf-8", errors="replace"))))
+    header, records = records[0], [record for record in records[1:] if record]
+    bad_lines = [record for record in records if len(record) != len(header)]
+    logger.error("%d lignes mal formées écartées dans %s : %s", len(bad_lines), path,
+                 "; ".join(",".join(record) for record in bad_lines[:3]))
+    kept = io.StringIO()
+    csv.writer(kept).writerows([header] + [record for record in records if len(record) == len(header)])
+    kept.seek(0)
+    return pd.read_csv(kept)
+
+
+class DeltaSource:
+    """Lignes ajoutées aux fichiers CSV de `directory` depuis la lecture précédente."""
+
+    def __init__(self, directory, pattern="*.csv"):
+        self.directory = directory
+        self.pattern = pattern
+        self._offsets = {}
+        self._headers = {}
+
+    def poll(self):
+        """
+        Nouvelles lignes complètes (une ligne en cours d'écriture attend le passage suivant) :
+        liste de (chemin, DataFrame brut, position de fin). La position n'est retenue que par
+        commit(), une fois les lignes ajoutées : d'ici là, le passage suivant les relit.
+        """
+        batches = []
+        for path in sorted(glob.glob(os.path.join(self.directory, self.pattern))):
+            offset = self._offsets.get(path, 0)
+            try:
+                if os.path.getsize(path) <= offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    block = f.read()
+            except OSError:
+                continue
+            end = block.rfind(b"\n") + 1
+            if end == 0:
+                continue
+            block = block[:end]
+            if offset == 0:
+                header, _, block = block.partition(b"\n")
+                self._headers[path] = header + b"\n"
+            if block.strip():
+                batches.append((path, read_block(path, self._headers[path] + block), offset + end))
+            else:
+                self._offsets[path] = offset + end
+        return batches
+
+    def commit(self, path, offset):
+        """Retient la position de lecture de `path` : les lignes avant `offset` ne seront plus relues."""
+        self._offsets[path] = offset
+
+
+class DeltaRefresher:
+    """Applique à `backend` les lignes de `source`, au plus une lecture toutes les `interval` secondes (0 : désactivé)."""
+
+    def __init__(self, source, backend, interval=5.0):
+        self.source = source
+        self.backend = backend
+        self.interval = interval
+        self._last_poll = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Nombre de lignes ajoutées par ce passage."""
+        if self.interval <= 0 or time.monotonic() - self._last_poll < self.interval:
+            return 0
+        # Un seul passage à la fois pour toutes les sessions ; les autres gardent les données actuelles
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_poll = time.monotonic()
+            batches = self.source.poll()
+            if not batches:
+                return 0
+            try:
+                # Un seul ajout pour tous les fichiers (une seule nouvelle version de la source)
+                self.backend.append(pd.concat([frame for _, frame, _ in batches], ignore_index=True))
+                accepted = batches
+            except (KeyError, ValueError, TypeError):
+                # Lot refusé : fichier par fichier, pour que les fichiers valides ne restent pas bloqués
+                accepted = []
+                for batch in batches:
+                    path, frame, _ = batch
+                    try:
+                        self.backend.append(frame)
+                        accepted.append(batch)
+                    except (KeyError, ValueError, TypeError) as exc:
+                        logger.error("%d lignes de %s refusées, relues au prochain passage : %s", len(frame), path, exc)
+            for path, _, offset in accepted:
+                self.source.commit(path, offset)
+            return sum(len(frame) for _, frame, _ in accepted)
+        finally:
+            self._lock.release()
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+
+# Colonnes filtrables du tableau de bord
+CATEGORICAL_FILTERS = ("Contract", "gender", "InternetService", "PaymentMethod")
+NUMERIC_FILTERS = ("tenure", "MonthlyCharges")
+
+
+class FilterIndex:
+    """
+    Index de filtrage construit une fois par jeu de données chargé.
+
+    - une bitmap compactée (np.packbits, 1 bit par ligne) par valeur de chaque colonne catégorielle,
+    - pour chaque colonne numérique, les valeurs triées et le rang de chaque ligne dans ce tri
+      (l'inverse des positions triées).
+
+    Un état de filtres se résout alors en quelques ET binaires sur les bitmaps et deux
+    searchsorted par intervalle, sans copier le DataFrame. La dernière bitmap calculée pour
+    chaque intervalle est conservée : déplacer un curseur ne recalcule pas les autres.
+    """
+
+    def __init__(self, df: pd.DataFrame, categorical=CATEGORICAL_FILTERS, numeric=NUMERIC_FILTERS):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        self.options = {}
+        for column in categorical:
+            # Codes dans l'ordre d'apparition, comme df[column].unique()
+            codes, uniques = pd.factorize(df[column])
+            self.options[column] = uniques.tolist()
+            self.bitmaps[column] = {
+                value: np.packbits(codes == code) for code, value in enumerate(self.options[column])
+            }
+
+        self.sorted_values = {}
+        self.ranks = {}
+        self._last_range = {}
+        rank_dtype = np.uint32 if self.n_rows < 2**32 else np.uint64
+        for column in numeric:
+            values = df[column].to_numpy()
+            order = np.argsort(values, kind="stable")
+            self.sorted_values[column] = values[order]
+            ranks = np.empty(self.n_rows, dtype=rank_dtype)
+            ranks[order] = np.arange(self.n_rows, dtype=rank_dtype)
+            self.ranks[column] = ranks
+
+    def bounds(self, column):
+        """Minimum et maximum d'une colonne numérique (lus aux extrémités du tri)."""
+        values = self.sorted_values[column]
+        return values[0], values[-1]
+
+    def _range_bitmap(self, column, low, high):
+        """Bitmap des lignes dont la valeur est dans [low, high], ou None si toutes y sont."""
+        values = self.sorted_values[column]
+        if values.dtype.kind == "f":
+            # Bornes converties au type de la colonne (float32) : 50.3 saisi retient les 50.3 stockés
+            low, high = values.dtype.type(low), values.dtype.type(high)
+        start = np.searchsorted(values, low, side="left")
+        stop = np.searchsorted(values, high, side="right")
+        if start == 0 and stop == self.n_rows:
+            return None
+        cached = self._last_range.get(column)
+        if cached is not None and cached[0] == (start, stop):
+            return cached[1]
+        # Parcours séquentiel des rangs : start <= rang < stop en une comparaison non signée
+        ranks = self.ranks[column]
+        bitmap = np.packbits((ranks - ranks.dtype.type(start)) < ranks.dtype.type(stop - start))
+        self._last_range[column] = ((start, stop), bitmap)
+        return bitmap
+
+    def select(self, equals=None, ranges=None):
+        """
+        Positions (triées) des lignes qui vérifient tous les filtres, ou None si aucun
+        filtre ne restreint la sélection.
+        equals : {colonne catégorielle: valeur}, ranges : {colonne numérique: (min, max)}.
+        Une valeur absente du jeu de données donne une sélection vide.
+        """
+        bitmaps = []
+        for column, value in (equals or {}).items():
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is None:
+                return np.empty(0, dtype=np.int64)
+            bitmaps.append(bitmap)
+        for column, (low, high) in (ranges or {}).items():
+            bitmap = self._range_bitmap(column, low, high)
+            if bitmap is not None:
+                bitmaps.append(bitmap)
+
+        if not bitmaps:
+            return None
+        selection = bitmaps[0] if len(bitmaps) == 1 else np.bitwise_and.reduce(bitmaps)
+        # Vue booléenne : np.flatnonzero est bien plus rapide sur bool que sur uint8
+        return np.flatnonzero(np.unpackbits(selection, count=self.n_rows).view(bool))
+
+    def filter(self, df: pd.DataFrame, equals=None, ranges=None, columns=None):
+        """
+        Sous-ensemble de df (celui qui a servi à construire l'index) sélectionné par les filtres,
+        limité aux colonnes `columns` si elles sont données : seules celles-ci sont copiées.
+        """
+        rows = self.select(equals, ranges)
+        if columns is None:
+            return df if rows is None else df.take(rows)
+        if rows is None:
+            return df[list(columns)]
+        return pd.DataFrame({column: df[column].take(rows) for column in columns})
+
+
+def filter_mask(df: pd.DataFrame, equals=None, ranges=None):
+    """
+    Masque des lignes de df qui vérifient les filtres, par comparaison directe (mêmes
+    règles que FilterIndex.select) : pour les quelques lignes ajoutées depuis la
+    construction de l'index.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in (equals or {}).items():
+        mask &= (df[column] == value).to_numpy(dtype=bool)
+    for column, (low, high) in (ranges or {}).items():
+        values = df[column].to_numpy()
+        if values.dtype.kind == "f":
+            low, high = values.dtype.type(low), values.dtype.type(high)
+        mask &= (values >= low) & (values <= high)
+    return mask
@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+from utils.filter_index import CATEGORICAL_FILTERS, NUMERIC_FILTERS
+
+
+# Mesures additives de chaque cellule, dans l'ordre du dernier axe du cube
+MEASURES = ("clients", "churn", "monthly_revenue", "tenure_sum", "no_internet", "paperless", "seniors")
+# Mesures booléennes, rangées comme bits d'un uint8 par ligne pour le balayage résiduel
+FLAGS = ("churn", "no_internet", "paperless", "seniors")
+
+
+def _flags(df):
+    return {
+        "churn": (df['Churn'] == 'Yes').to_numpy(),
+        "no_internet": (df['InternetService'] == 'No').to_numpy(),
+        "paperless": (df['PaperlessBilling'] == 'Yes').to_numpy(),
+        "seniors": (df['SeniorCitizen'] == 1).to_numpy(),
+    }
+
+
+def _row_sums(store, rows, keep):
+    """Sommes de MEASURES sur store[...][rows][keep] (indicateurs rangés en bits dans store["flags"])."""
+    flags = store["flags"][rows][keep]
+    return [
+        len(flags),
+        np.count_nonzero(flags & 1),
+        store["revenue"][rows][keep].sum(),
+        store["tenure"][rows][keep].sum(),
+        np.count_nonzero(flags & 2),
+        np.count_nonzero(flags & 4),
+        np.count_nonzero(flags & 8),
+    ]
+
+
+def _bucket_edges(values, max_buckets):
+    """Une tranche par valeur distincte s'il y en a peu (ancienneté en mois), sinon des quantiles."""
+    distinct = np.unique(values)
+    if len(distinct) <= max_buckets:
+        return distinct
+    return np.unique(np.quantile(values, np.linspace(0, 1, max_buckets, endpoint=False)))
+
+
+class KpiCube:
+    """
+    Cube d'agrégats des KPIs du tableau de bord, construit une fois par jeu de données.
+
+    Axes : les filtres catégoriels (Contract, gender, InternetService, PaymentMethod),
+    puis tenure et MonthlyCharges découpés en tranches ; chaque cellule contient les
+    comptes et sommes de MEASURES. Les KPIs d'une combinaison de filtres sont la somme
+    d'un sous-bloc du cube. Seules les lignes des tranches coupées par une borne
+    d'intervalle sont relues (balayage résiduel) : elles sont rangées par valeur
+    croissante, si bien que ce balayage porte sur des tranches contiguës de tableaux.
+
+    append() ajoute de nouvelles lignes aux seules cellules qu'elles touchent ; elles
+    sont gardées à part, non triées, pour le balayage résiduel.
+    """
+
+    def __init__(self, df: pd.DataFrame, categorical=CATEGORICAL_FILTERS, numeric=NUMERIC_FILTERS, max_buckets=80):
+        self.n_rows = len(df)
+        self.categorical = tuple(categorical)
+        self.numeric = tuple(numeric)
+
+        codes = []
+        self.categories = {}
+        for column in self.categorical:
+            column_codes, uniques = pd.factorize(df[column])
+            codes.append(column_codes)
+            self.categories[column] = {value: code for code, value in enumerate(uniques.tolist())}
+        self.category_shape = tuple(len(self.categories[c]) for c in self.categorical)
+        # Combinaison des valeurs catégorielles d'une ligne, en un seul code
+        combo = np.ravel_multi_index(codes, self.category_shape).astype(np.min_scalar_type(int(np.prod(self.category_shape))))
+
+        flags = _flags(df)
+        packed_flags = np.zeros(self.n_rows, dtype=np.uint8)
+        for bit, name in enumerate(FLAGS):
+            packed_flags |= flags[name].astype(np.uint8) << bit
+
+        values, buckets = {}, {}
+        self.bucket_min, self.bucket_max = {}, {}
+        self.numeric_dtypes = {column: df[column].dtype for column in self.numeric}
+        for column in self.numeric:
+            values[column] = df[column].to_numpy(dtype=np.float64)
+            edges = _bucket_edges(values[column], max_buckets)
+            buckets[column] = (np.searchsorted(edges, values[column], side="right") - 1).astype(np.min_scalar_type(len(edges)))
+            # Bornes réelles de chaque tranche : une tranche est entièrement dans [min, max] ou non
+            self.bucket_min[column] = np.full(len(edges), np.inf)
+            self.bucket_max[column] = np.full(len(edges), -np.inf)
+            np.minimum.at(self.bucket_min[column], buckets[column], values[column])
+            np.maximum.at(self.bucket_max[column], buckets[column], values[column])
+
+        revenue = values['MonthlyCharges'] if 'MonthlyCharges' in values else df['MonthlyCharges'].to_numpy(dtype=np.float64)
+        tenure = values['tenure'] if 'tenure' in values else df['tenure'].to_numpy(dtype=np.float64)
+
+        shape = self.category_shape + tuple(len(self.bucket_min[c]) for c in self.numeric)
+        cell = np.ravel_multi_index(codes + [buckets[c] for c in self.numeric], shape)
+        n_cells = int(np.prod(shape))
+        weights = {"clients": None, "monthly_revenue": revenue, "tenure_sum": tenure, **flags}
+        self.cube = np.stack(
+            [np.bincount(cell, weights=weights[name], minlength=n_cells) for name in MEASURES], axis=-1
+        ).reshape(shape + (len(MEASURES),))
+
+        # Lignes triées par valeur, pour chaque axe dont une tranche peut être coupée
+        # (les axes à une tranche par valeur distincte, comme tenure, n'en ont pas besoin)
+        self.residual = {}
+        for column in self.numeric:
+            if np.array_equal(self.bucket_min[column], self.bucket_max[column]):
+                continue
+            order = np.argsort(values[column], kind="stable")
+            self.residual[column] = {
+                "offsets": np.searchsorted(buckets[column][order], np.arange(len(self.bucket_min[column]) + 1)),
+                "combo": combo[order],
+                "flags": packed_flags[order],
+                "values": {c: values[c][order] for c in self.numeric},
+                "buckets": {c: buckets[c][order] for c in self.numeric if c != column},
+                "revenue": revenue[order],
+                "tenure": tenure[order],
+            }
+        # Lignes ajoutées par append(), dans l'ordre d'arrivée
+        self.appended = None
+
+    def _bounds(self, ranges, column):
+        """Bornes d'un intervalle, arrondies au type de la colonne (float32) comme les valeurs stockées."""
+        low, high = ranges.get(column, (-np.inf, np.inf))
+        dtype = self.numeric_dtypes[column]
+        if dtype.kind == "f":
+            low, high = float(dtype.type(low)), float(dtype.type(high))
+        return low, high
+
+    def _residual_totals(self, column, partial, partial_before, allowed, ranges):
+        """
+        Sommes de MEASURES sur les lignes des tranches coupées de `column` qui vérifient
+        les filtres ; les lignes d'une tranche coupée d'un axe déjà traité (partial_before)
+        sont ignorées pour ne pas être comptées deux fois.
+        """
+        store = self.residual[column]
+        sorted_values = store["values"][column]
+        low, high = self._bounds(ranges, column)
+        start, stop = np.searchsorted(sorted_values, low, side="left"), np.searchsorted(sorted_values, high, side="right")
+        totals = np.zeros(len(MEASURES))
+        for bucket in partial:
+            rows = slice(max(store["offsets"][bucket], start), min(store["offsets"][bucket + 1], stop))
+            if rows.start >= rows.stop:
+                continue
+            keep = allowed[store["combo"][rows]]
+            for other in self.numeric:
+                if other == column:
+                    continue
+                other_low, other_high = self._bounds(ranges, other)
+                other_values = store["values"][other][rows]
+                keep &= (other_values >= other_low) & (other_values <= other_high)
+                if len(partial_before.get(other, ())):
+                    keep &= ~np.isin(store["buckets"][other][rows], partial_before[other])
+            totals += _row_sums(store, rows, keep)
+
+        if self.appended is not None:
+            added = self.appended
+            keep = np.isin(added["buckets"][column], partial) & allowed[added["combo"]]
+            for other in self.numeric:
+                other_low, other_high = self._bounds(ranges, other)
+                keep &= (added["values"][other] >= other_low) & (added["values"][other] <= other_high)
+                if other != column and len(partial_before.get(other, ())):
+                    keep &= ~np.isin(added["buckets"][other], partial_before[other])
+            totals += _row_sums(added, slice(None), keep)
+        return totals
+
+    def append(self, df: pd.DataFrame):
+        """
+        Ajoute les lignes de df aux cellules du cube (coût proportionnel au nombre de
+        lignes). Renvoie False sans rien modifier si elles n'entrent pas dans ses axes
+        (valeur catégorielle inconnue, nouvelle valeur sur un axe à une tranche par
+        valeur) : le cube est alors à reconstruire.
+        """
+        codes = []
+        for column in self.categorical:
+            column_codes = pd.Index(list(self.categories[column])).get_indexer(df[column])
+            if (column_codes < 0).any():
+                return False
+            codes.append(column_codes)
+
+        values, buckets = {}, {}
+        for column in self.numeric:
+            values[column] = df[column].to_numpy(dtype=np.float64)
+            # Tranche dont le minimum précède la valeur (la première pour les valeurs plus petites)
+            buckets[column] = np.maximum(np.searchsorted(self.bucket_min[column], values[column], side="right") - 1, 0)
+            if column not in self.residual and not np.array_equal(self.bucket_min[column][buckets[column]], values[column]):
+                return False
+
+        flags = _flags(df)
+        revenue = df['MonthlyCharges'].to_numpy(dtype=np.float64)
+        tenure = df['tenure'].to_numpy(dtype=np.float64)
+        cell = np.ravel_multi_index(codes + [buckets[c] for c in self.numeric], self.cube.shape[:-1])
+        cells = self.cube.reshape(-1, len(MEASURES))
+        weights = {"clients": 1.0, "monthly_revenue": revenue, "tenure_sum": tenure, **flags}
+        for measure, name in enumerate(MEASURES):
+            np.add.at(cells[:, measure], cell, weights[name])
+        for column in self.numeric:
+            np.minimum.at(self.bucket_min[column], buckets[column], values[column])
+            np.maximum.at(self.bucket_max[column], buckets[column], values[column])
+        self.n_rows += len(df)
+
+        packed_flags = np.zeros(len(df), dtype=np.uint8)
+        for bit, name in enumerate(FLAGS):
+            packed_flags |= flags[name].astype(np.uint8) << bit
+        added = {
+            "combo": np.ravel_multi_index(codes, self.category_shape),
+            "flags": packed_flags,
+            "values": values,
+            "buckets": buckets,
+            "revenue": revenue,
+            "tenure": tenure,
+        }
+        if self.appended is not None:
+            previous = self.appended
+            added = {
+                key: ({c: np.concatenate([previous[key][c], value[c]]) for c in value} if isinstance(value, dict)
+                      else np.concatenate([previous[key], value]))
+                for key, value in added.items()
+            }
+        self.appended = added
+        return True
+
+    def totals(self, equals=None, ranges=None):
+        """
+        Sommes de MEASURES (dictionnaire) pour les lignes qui vérifient les filtres.
+        equals : {colonne catégorielle: valeur}, ranges : {colonne numérique: (min, max)}.
+        """
+        equals, ranges = equals or {}, ranges or {}
+        selection = []
+        for column in self.categorical:
+            if column in equals:
+                code = self.categories[column].get(equals[column])
+                if code is None:
+                    return dict.fromkeys(MEASURES, 0.0)
+                selection.append(slice(code, code + 1))
+            else:
+                selection.append(slice(None))
+
+        partial = {}
+        for column in self.numeric:
+            low, high = self._bounds(ranges, column)
+            inside = (self.bucket_min[column] >= low) & (self.bucket_max[column] <= high)
+            touched = (self.bucket_max[column] >= low) & (self.bucket_min[column] <= high)
+            full = np.flatnonzero(inside)
+            # Les tranches étant ordonnées, les tranches pleines forment un intervalle contigu
+            selection.append(slice(full[0], full[-1] + 1) if len(full) else slice(0, 0))
+            partial[column] = np.flatnonzero(touched & ~inside)
+
+        result = self.cube[tuple(selection)].reshape(-1, len(MEASURES)).sum(axis=0)
+
+        if any(len(buckets) for buckets in partial.values()):
+            # Combinaisons catégorielles retenues, indexées par le code combiné des lignes
+            allowed = np.zeros(self.category_shape, dtype=bool)
+            allowed[tuple(selection[:len(self.categorical)])] = True
+            allowed = allowed.ravel()
+            done = {}
+            for column in self.numeric:
+                if len(partial[column]):
+                    result = result + self._residual_totals(column, partial[column], done, allowed, ranges)
+                done[column] = partial[column]
+
+        return dict(zip(MEASURES, result.tolist()))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from utils.dashboard_backend import SummaryMemo, state_key
+from utils.kpi_cube import MEASURES
+
+# KPIs exportés : (clé, libellé du fichier CSV, décimales)
+EXPORTED_KPIS = (
+    ("clients", "Clients Actifs", 0),
+    ("churn_rate", "Taux de Churn (%)", 2),
+    ("monthly_revenue", "Revenu Mensuel ($)", 2),
+    ("avg_tenure", "Ancienneté Moyenne (mois)", 2),
+    ("no_internet_pct", "Sans Internet (%)", 2),
+    ("paperless_pct", "Facture Démat (%)", 2),
+    ("seniors_pct", "Clients Seniors (%)", 2),
+)
+
+
+def compute_kpis(totals, overall):
+    """
+    Tous les KPIs du tableau de bord en une passe sur les sommes de MEASURES de la
+    sélection et du jeu complet : parts rapportées au nombre de clients (0 si vide),
+    écarts au jeu complet.
+    """
+    sums = np.array([[totals[m] for m in MEASURES], [overall[m] for m in MEASURES]], dtype=np.float64)
+    clients = sums[:, :1]
+    # Chaque mesure divisée par le nombre de clients de sa ligne, 0 pour une sélection vide
+    shares = np.divide(sums, clients, out=np.zeros_like(sums), where=clients != 0)
+    share = dict(zip(MEASURES, shares[0]))
+    return {
+        "clients": int(sums[0, 0]),
+        "churn_count": int(sums[0, 1]),
+        "churn_rate": share["churn"] * 100,
+        "monthly_revenue": float(sums[0, 2]),
+        "avg_tenure": share["tenure_sum"],
+        "no_internet_pct": share["no_internet"] * 100,
+        "paperless_pct": share["paperless"] * 100,
+        "seniors_pct": share["seniors"] * 100,
+        "clients_delta_pct": (sums[0, 0] - sums[1, 0]) / sums[1, 0] * 100 if sums[1, 0] else 0.0,
+        "churn_delta_pts": (shares[0, 1] - shares[1, 1]) * 100,
+    }
+
+
+def kpi_table(kpis):
+    """Tableau KPI / Valeur du fichier CSV exporté."""
+    return pd.DataFrame({
+        "KPI": [label for _, label, _ in EXPORTED_KPIS],
+        "Valeur": [round(kpis[key], digits) if digits else kpis[key] for key, _, digits in EXPORTED_KPIS],
+    })
+
+
+class KpiEngine:
+    """
+    KPIs d'un état de filtres, calculés une fois puis partagés par les tuiles, l'export
+    CSV et le chatbot. Les sommes viennent de la source de données (summary, qui sert
+    aussi les graphiques : avec les mêmes `groups`, un seul calcul par état).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._memo = SummaryMemo()
+
+    def kpis(self, equals, ranges, groups):
+        def compute():
+            totals = self.backend.summary(equals, ranges, groups)["totals"]
+            return compute_kpis(totals, self.backend.overall_totals())
+        # La version de la source change à chaque ajout de clients : les KPIs sont alors recalculés
+        return self._memo.get_or_compute((self.backend.version,) + state_key(equals, ranges, groups), compute)
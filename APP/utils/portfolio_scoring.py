@@ -0,0 +1,121 @@
+"""
+Scoring du portefeuille : probabilité de churn de chaque client du jeu chargé.
+
+Tous les clients sont scorés une fois par modèle, par lots encodés colonne par colonne
+(FeatureEncoder.encode_columns, comme /predict/columnar) ; les clients ajoutés ensuite
+(utils.delta_refresh) sont seuls scorés à leur arrivée. Un changement de filtres ne
+fait que relire les scores des lignes sélectionnées.
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.dashboard_backend import SummaryMemo, state_key
+
+# Le registre des modèles est partagé avec l'API (dossier API/ à la racine du projet)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from API.cache import artifact_fingerprint
+from API.encoder import CATEGORICAL_FIELDS, NUMERIC_FIELDS
+from API.registry import FOREST_FILE, INITIAL_VERSION, ModelRegistry
+
+MODEL_REGISTRY = ModelRegistry(PROJECT_ROOT / "model")
+# Lignes encodées et scorées par appel du modèle
+PORTFOLIO_BATCH_ROWS = int(os.getenv("PORTFOLIO_BATCH_ROWS", "65536"))
+# Classes de l'histogramme des risques (probabilités de 0 à 1)
+RISK_BINS = 20
+
+
+def active_model():
+    """Version active du registre et empreinte de ses fichiers : un nouveau modèle donne un nouveau scoring."""
+    version = MODEL_REGISTRY.active_version() or INITIAL_VERSION
+    forest_path = os.path.join(MODEL_REGISTRY.version_dir(version), FOREST_FILE)
+    return version, artifact_fingerprint(MODEL_REGISTRY.model_path(version), MODEL_REGISTRY.columns_path(version),
+                                         forest_path)
+
+
+def frame_features(df):
+    """
+    Colonnes d'un DataFrame typé (catégories) pour FeatureEncoder.encode_columns :
+    codes et catégories tels quels, montants manquants à 0 comme dans encode_into.
+    """
+    numeric = {field: np.nan_to_num(df[field].to_numpy(dtype=np.float32)) for field in NUMERIC_FIELDS}
+    categorical = {}
+    for field in CATEGORICAL_FIELDS:
+        values = df[field].astype("category")
+        categorical[field] = (values.cat.codes.to_numpy(dtype=np.int64), values.cat.categories.tolist())
+    return numeric, categorical
+
+
+def score_frame(predictor, df, batch_rows=PORTFOLIO_BATCH_ROWS):
+    """Probabilité de churn (float32) de chaque ligne de df, par lots de batch_rows lignes."""
+    scores = np.empty(len(df), dtype=np.float32)
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        X = predictor.encoder.encode_columns(len(batch), *frame_features(batch))
+        scores[start:start + len(batch)] = predictor.predict_matrix(X)[1]
+    return scores
+
+
+def top_positions(risk, n):
+    """Indices des n plus grands risques, du plus élevé au plus faible (argpartition puis tri des n seuls)."""
+    if n < len(risk):
+        candidates = np.argpartition(risk, len(risk) - n)[len(risk) - n:]
+    else:
+        candidates = np.arange(len(risk))
+    return candidates[np.argsort(-risk[candidates], kind="stable")]
+
+
+class PortfolioScorer:
+    """
+    Scores des clients d'un InMemoryBackend (ordre : lignes indexées puis lignes
+    ajoutées, conservé quand la source se reconstruit) pour un prédicteur donné.
+    """
+
+    def __init__(self, predictor, backend, batch_rows=PORTFOLIO_BATCH_ROWS):
+        self.predictor = predictor
+        self.backend = backend
+        self.batch_rows = batch_rows
+        self.scores = np.empty(0, dtype=np.float32)
+        self._memo = SummaryMemo()
+        self._lock = threading.Lock()
+
+    def refresh(self, frames=None):
+        """
+        Score les clients arrivés depuis l'appel précédent (tous au premier appel), jusqu'à
+        la fin de `frames` (par défaut backend.frames()).
+        """
+        with self._lock:
+            frames = self.backend.frames() if frames is None else frames
+            scored, parts, offset = len(self.scores), [self.scores], 0
+            for frame in frames:
+                if offset + len(frame) > scored:
+                    parts.append(score_frame(self.predictor, frame.iloc[max(scored - offset, 0):], self.batch_rows))
+                offset += len(frame)
+            if len(parts) > 1:
+                self.scores = np.concatenate(parts)
+        return self.scores
+
+    def selection(self, equals, ranges, top_n):
+        """
+        Risques des clients sélectionnés par les filtres : histogramme (RISK_BINS classes),
+        nombre de clients et n clients les plus à risque (DataFrame), sans rescorer.
+        """
+        # Les positions restent valides après un ajout (les clients ne sont jamais déplacés) :
+        # seuls version, frames et sélection doivent être lus ensemble
+        version, frames, rows = self.backend.snapshot(equals, ranges)
+
+        def compute():
+            risk = self.refresh(frames)[rows]
+            counts, edges = np.histogram(risk, bins=RISK_BINS, range=(0.0, 1.0))
+            top = top_positions(risk, top_n)
+            customers = self.backend.take(rows[top]).reset_index(drop=True)
+            customers.insert(0, "Risque de churn (%)", np.round(risk[top].astype(np.float64) * 100, 1))
+            return {"histogram": (counts, edges), "clients": len(rows), "mean": float(risk.mean()) if len(risk) else 0.0,
+                    "top": customers}
+        key = (version, top_n) + state_key(equals, ranges, {})
+        return self._memo.get_or_compute(key, compute)
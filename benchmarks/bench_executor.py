@@ -0,0 +1,176 @@
+"""
+Latence de /predict sous charge, selon l'exécution des appels du modèle.
+
+Pour chaque mode, lance `uvicorn API.main:app` en local puis, pour chaque niveau
+de concurrence, fait tourner N clients qui enchaînent des /predict pendant
+--duration secondes (cache des prédictions désactivé : chaque appel passe par
+le modèle). En parallèle, une sonde appelle GET /cache/stats pour mesurer la
+réactivité du reste de l'API pendant la charge.
+- shared   : code actuel avec INFERENCE_THREADS=0, MODEL_THREADS=0 (pool partagé anyio, n_jobs
+             du modèle non fixé) ; le reste de l'API (micro-lots, cache, encodage) est celui d'aujourd'hui,
+- pool     : pool d'inférence borné et n_jobs fixé (valeurs par défaut de API/main.py),
+- baseline : l'API telle qu'au commit --baseline-ref (extrait dans un worktree git temporaire),
+             par exemple celui qui précède le pool d'inférence, dont /predict est un endpoint synchrone.
+
+Lancer depuis la racine du projet :
+    python -m benchmarks.bench_executor --clients 1 8 64
+    python -m benchmarks.bench_executor --baseline-ref "$(git log --format=%h --diff-filter=A -- API/executor.py)^"
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_workers import free_port
+
+MODES = {
+    "shared": {"INFERENCE_THREADS": "0", "MODEL_THREADS": "0"},
+    "pool": {},
+    "baseline": {},
+}
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    values = np.asarray(latencies) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(values, q)), 2) for q in (50, 95, 99)}
+
+
+async def load_level(base_url, payloads, n_clients, duration):
+    """N clients concurrents pendant `duration` secondes, plus une sonde toutes les 50 ms."""
+    latencies, probe_latencies, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=n_clients + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                response = await client.post("/predict", json=payloads[i % len(payloads)])
+                if response.status_code != 200 or "error" in response.json():
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+                i += n_clients
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                await client.get("/cache/stats")
+                probe_latencies.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *(worker(k) for k in range(n_clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "clients": n_clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+        "probe": percentiles(probe_latencies),
+    }
+
+
+def wait_ready(base_url, server, payload, timeout):
+    """Attend une première prédiction réussie (seul endpoint commun à toutes les versions de l'API)."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn s'est arrêté au démarrage")
+        try:
+            response = httpx.post(f"{base_url}/predict", json=payload, timeout=10)
+            if response.status_code == 200 and "error" not in response.json():
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"uvicorn n'a pas démarré en {timeout}s")
+
+
+def run_mode(mode, payloads, levels, duration, startup_timeout, cwd=None):
+    """Mesures d'un mode ; `cwd` : racine du code servi (worktree de la référence pour baseline)."""
+    port = free_port()
+    env = {**os.environ, "PREDICTION_CACHE_SIZE": "0", "MODEL_POLL_INTERVAL": "0",
+           "PYTHONWARNINGS": "ignore", **MODES[mode]}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "API.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url, server, payloads[0], startup_timeout)
+        # /executor/stats n'existe pas avant le pool d'inférence
+        response = httpx.get(f"{base_url}/executor/stats")
+        executor = response.json() if response.status_code == 200 else {}
+        return [
+            {"mode": mode, "inference_threads": executor.get("threads"), "model_threads": executor.get("model_threads"),
+             **asyncio.run(load_level(base_url, payloads, n_clients, duration))}
+            for n_clients in levels
+        ]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_baseline(ref, payloads, levels, duration, startup_timeout):
+    """Mode baseline : l'API du commit `ref`, extraite dans un worktree git supprimé ensuite."""
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = os.path.join(directory, "baseline")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, ref], check=True, capture_output=True)
+        try:
+            return run_mode("baseline", payloads, levels, duration, startup_timeout, cwd=worktree)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], check=False, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=["shared", "pool"])
+    parser.add_argument("--baseline-ref", help="commit git servi par le mode baseline (ajouté aux modes s'il est donné)")
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes par niveau de concurrence")
+    parser.add_argument("--data", default="APP/data/telco_clean.csv")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    payloads = pd.read_csv(args.data).drop(columns=["customerID", "Churn"]).to_dict("records")
+    modes = list(args.modes)
+    if args.baseline_ref and "baseline" not in modes:
+        modes.insert(0, "baseline")
+    if "baseline" in modes and not args.baseline_ref:
+        parser.error("le mode baseline demande --baseline-ref")
+
+    results = []
+    print(f"{'mode':>8} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'sonde p99':>10} {'erreurs':>8}")
+    for mode in modes:
+        if mode == "baseline":
+            rows = run_baseline(args.baseline_ref, payloads, args.clients, args.duration, args.startup_timeout)
+        else:
+            rows = run_mode(mode, payloads, args.clients, args.duration, args.startup_timeout)
+        for r in rows:
+            results.append(r)
+            print(f"{mode:>8} {r['clients']:>7} {r['req_per_s']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                  f"{r['p99_ms']:>8.2f} {r['probe']['p99_ms']:>10.2f} {r['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark du moteur NumPy (API/forest.py) contre model.predict_proba.
+
+Mesure, pour chaque taille de lot, la latence p50/p99 d'un appel et le débit
+(lignes/s) des deux moteurs et de la décomposition des prédictions (contributions,
+?explain=true de l'API), ainsi que l'écart maximal entre les probabilités des moteurs.
+Les lignes sont tirées de APP/data/telco_clean.csv et encodées avec FeatureEncoder.
+
+Lancer depuis la racine du projet :
+    python -m benchmarks.bench_forest
+    python -m benchmarks.bench_forest --sizes 1 100 10000 --output bench_forest.json
+"""
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from API.encoder import FeatureEncoder, get_churn_class_index
+from API.forest import ArrayForest
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def load_matrix(data_path, columns_path, n_rows):
+    """Encode le jeu de données et le répète jusqu'à n_rows lignes."""
+    df = pd.read_csv(data_path).drop(columns=["customerID", "Churn"])
+    X = FeatureEncoder(joblib.load(columns_path)).encode_many(df.to_dict("records"))
+    repeats = -(-n_rows // len(X))
+    return np.tile(X, (repeats, 1))[:n_rows]
+
+
+def time_calls(predict, X, batch_size, min_calls, time_budget):
+    """Latences (s) d'appels successifs sur des lots consécutifs de X."""
+    latencies = []
+    started = time.perf_counter()
+    start = 0
+    while len(latencies) < min_calls or time.perf_counter() - started < time_budget:
+        if start + batch_size > len(X):
+            start = 0
+        batch = X[start:start + batch_size]
+        t0 = time.perf_counter()
+        predict(batch)
+        latencies.append(time.perf_counter() - t0)
+        start += batch_size
+        if len(latencies) >= 10000:
+            break
+    return np.asarray(latencies)
+
+
+def summarize(latencies, batch_size):
+    return {
+        "calls": int(len(latencies)),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "rows_per_s": round(batch_size * len(latencies) / float(latencies.sum()), 1),
+    }
+
+
+def contributions_gap(model, forest, X):
+    """
+    Écart maximal (biais compris) entre les contributions du moteur NumPy et celles de
+    XGBoost (pred_contribs, approx_contribs : même méthode de Saabas) ; None hors XGBoost.
+    """
+    if forest.kind != "xgboost":
+        return None
+    import xgboost
+
+    booster = model.get_booster()
+    reference = booster.predict(xgboost.DMatrix(X, feature_names=booster.feature_names),
+                                pred_contribs=True, approx_contribs=True)
+    bias, contributions = forest.contributions(X)
+    return float(max(np.abs(contributions - reference[:, :-1]).max(), np.abs(bias - reference[:, -1]).max()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="model/modele_random_forest.pkl")
+    parser.add_argument("--columns", default="model/training_columns.pkl")
+    parser.add_argument("--data", default="APP/data/telco_clean.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--min-calls", type=int, default=5)
+    parser.add_argument("--time-budget", type=float, default=2.0, help="secondes par (moteur, taille)")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    forest = ArrayForest.from_model(model, get_churn_class_index(model))
+    X = load_matrix(args.data, args.columns, max(args.sizes))
+
+    engines = {"model": model.predict_proba, "numpy": forest.predict_proba, "contrib": forest.contributions}
+    max_diff = float(np.abs(forest.predict_proba(X[:10000]) - model.predict_proba(X[:10000])).max())
+    contrib_diff = contributions_gap(model, forest, X[:2000])
+
+    results = []
+    print(f"{'lot':>8} {'moteur':>7} {'p50 ms':>10} {'p99 ms':>10} {'lignes/s':>12}")
+    for size in args.sizes:
+        for name, predict in engines.items():
+            predict(X[:size])  # échauffement
+            stats = summarize(time_calls(predict, X, size, args.min_calls, args.time_budget), size)
+            results.append({"batch_size": size, "engine": name, **stats})
+            print(f"{size:>8} {name:>7} {stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f} {stats['rows_per_s']:>12,.0f}")
+    print(f"Écart maximal des probabilités (numpy vs model) : {max_diff:.2e}")
+    if contrib_diff is not None:
+        print(f"Écart maximal des contributions (numpy vs XGBoost approx_contribs) : {contrib_diff:.2e}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"max_abs_diff": max_diff, "max_contrib_diff": contrib_diff, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Temps de démarrage à froid de l'API (point d'entrée serverless index.py).
+
+Chaque mesure lance un nouvel interpréteur Python qui importe index.py (imports,
+lecture du modèle, chauffe) puis sert une première requête /predict par le
+transport ASGI ; le démarrage, la première requête et les étapes rapportées par
+/ready sont relevés. Modes comparés :
+- standard : FAST_STARTUP=0 (modèle joblib, XGBoost / scikit-learn / pandas importés),
+- fast     : FAST_STARTUP=1 (artefact compact model/forest_arrays.joblib, python -m API.forest).
+
+Avec --baseline, le script sort en erreur (code 1) si la médiane d'un mode dépasse
+celle de la référence de plus de --tolerance.
+
+Lancer depuis la racine du projet :
+    python -m benchmarks.bench_startup --repeats 5 --output bench_startup.json
+    python -m benchmarks.bench_startup --baseline bench_startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+MODES = {"standard": "0", "fast": "1"}
+
+# Exécuté dans un interpréteur neuf : rien n'est importé avant la mesure
+CHILD = """
+import time
+started = time.perf_counter()
+import index
+startup = time.perf_counter() - started
+
+import asyncio, json, httpx
+from API.registry import WARMUP_CUSTOMER
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=index.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        response = await client.post("/predict", json=WARMUP_CUSTOMER)
+        first = time.perf_counter() - t0
+        return response.status_code, first, (await client.get("/ready")).json()
+
+status, first, ready = asyncio.run(first_requests())
+print(json.dumps({"startup_s": startup, "first_request_s": first, "status": status, "ready": ready}))
+"""
+
+
+def measure(fast_startup):
+    env = {**os.environ, "FAST_STARTUP": fast_startup, "MODEL_POLL_INTERVAL": "0", "PYTHONWARNINGS": "ignore"}
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize(mode, runs):
+    startup = np.asarray([r["startup_s"] for r in runs])
+    phases = {}
+    for r in runs:
+        for phase, seconds in r["ready"]["startup_phases"].items():
+            phases.setdefault(phase, []).append(seconds)
+    return {
+        "mode": mode,
+        "runs": len(runs),
+        "artifact": runs[-1]["ready"]["artifact"],
+        "startup_median_s": round(float(np.median(startup)), 4),
+        "startup_max_s": round(float(startup.max()), 4),
+        "first_request_median_ms": round(float(np.median([r["first_request_s"] for r in runs])) * 1000, 3),
+        "phases_median_s": {phase: round(float(np.median(values)), 4) for phase, values in phases.items()},
+        "errors": sum(r["status"] != 200 for r in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="écart relatif toléré (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'mode':>9} {'artefact':>9} {'démarrage s':>12} {'max s':>8} {'1re requête ms':>15}  étapes (s)")
+    for mode in args.modes:
+        r = summarize(mode, [measure(MODES[mode]) for _ in range(args.repeats)])
+        results.append(r)
+        phases = ", ".join(f"{phase} {seconds:.3f}" for phase, seconds in r["phases_median_s"].items())
+        print(f"{mode:>9} {r['artifact']:>9} {r['startup_median_s']:>12.3f} {r['startup_max_s']:>8.3f} "
+              f"{r['first_request_median_ms']:>15.2f}  {phases}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            reference = {r["mode"]: r for r in json.load(f)}
+        regressions = [
+            f"{r['mode']} : démarrage {r['startup_median_s']} s (référence {reference[r['mode']]['startup_median_s']})"
+            for r in results
+            if r["mode"] in reference
+            and r["startup_median_s"] > reference[r["mode"]]["startup_median_s"] * (1 + args.tolerance)
+        ]
+        regressions += [f"{r['mode']} : {r['errors']} première(s) requête(s) en erreur" for r in results if r["errors"]]
+        for line in regressions:
+            print(f"RÉGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("Aucune régression par rapport à la référence.")
+
+
+if __name__ == "__main__":
+    main()
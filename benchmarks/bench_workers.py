@@ -0,0 +1,143 @@
+"""
+Mémoire résidente par worker gunicorn, avec et sans preload du modèle.
+
+Pour chaque nombre de workers, lance `gunicorn -c gunicorn.conf.py API.main:app`,
+envoie quelques prédictions pour que chaque worker ait servi des requêtes, puis
+lit /proc/<pid>/smaps_rollup (Linux) du maître et des workers :
+- RSS : pages résidentes (les pages partagées sont comptées dans chaque worker),
+- PSS : part proportionnelle (pages partagées divisées entre les processus),
+- USS : pages privées au processus.
+La somme des PSS est la mémoire réellement consommée par le service.
+
+Lancer depuis la racine du projet :
+    python -m benchmarks.bench_workers --workers 1 4 16
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pandas as pd
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory_kb(pid):
+    """RSS, PSS et USS (ko) d'un processus."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":"):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_kb": values.get("Rss", 0),
+        "pss_kb": values.get("Pss", 0),
+        "uss_kb": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def measure(n_workers, preload, payloads, requests_per_worker, startup_timeout):
+    port = free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(n_workers), "PORT": str(port),
+           "GUNICORN_PRELOAD": "1" if preload else "0", "PYTHONWARNINGS": "ignore"}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "API.main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}/predict"
+        while True:
+            if time.perf_counter() - started > startup_timeout:
+                raise RuntimeError(f"gunicorn n'a pas démarré en {startup_timeout}s")
+            try:
+                post_json(url, payloads[0])
+                if len(child_pids(server.pid)) >= n_workers:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        startup_s = time.perf_counter() - started
+
+        for i in range(requests_per_worker * n_workers):
+            post_json(url, payloads[i % len(payloads)])
+
+        workers = [memory_kb(pid) for pid in child_pids(server.pid)]
+        master = memory_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    def mean(key):
+        return round(sum(w[key] for w in workers) / len(workers) / 1024, 1)
+
+    return {
+        "workers": n_workers,
+        "preload": preload,
+        "startup_s": round(startup_s, 2),
+        "worker_rss_mb": mean("rss_kb"),
+        "worker_pss_mb": mean("pss_kb"),
+        "worker_uss_mb": mean("uss_kb"),
+        "total_pss_mb": round((sum(w["pss_kb"] for w in workers) + master["pss_kb"]) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "no-preload"], default=["preload", "no-preload"])
+    parser.add_argument("--data", default="APP/data/telco_clean.csv")
+    parser.add_argument("--requests-per-worker", type=int, default=20)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    payloads = pd.read_csv(args.data, nrows=200).drop(columns=["customerID", "Churn"]).to_dict("records")
+
+    results = []
+    print(f"{'workers':>7} {'mode':>11} {'démarrage s':>12} {'RSS/worker':>11} {'PSS/worker':>11} "
+          f"{'USS/worker':>11} {'PSS total':>10}")
+    for n_workers in args.workers:
+        for mode in args.modes:
+            r = measure(n_workers, mode == "preload", payloads, args.requests_per_worker, args.startup_timeout)
+            results.append(r)
+            print(f"{n_workers:>7} {mode:>11} {r['startup_s']:>12.2f} {r['worker_rss_mb']:>9.1f}Mo "
+                  f"{r['worker_pss_mb']:>9.1f}Mo {r['worker_uss_mb']:>9.1f}Mo {r['total_pss_mb']:>8.1f}Mo")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Banc de charge reproductible de l'API FastAPI.
+
+Chaque scénario (fichier JSON de benchmarks/scenarios/) décrit l'endpoint, la
+forme des requêtes et la concurrence :
+    endpoint          /predict, /predict/batch ou /predict/stream
+    payload           "single" (un client), "batch" (liste de batch_size clients)
+                      "stream" (fichier NDJSON ou CSV de batch_size lignes, clé "format")
+                      ou "columnar" (table Arrow IPC ou Parquet de batch_size lignes, clé "format")
+    concurrency       nombre de clients simultanés
+    requests          nombre de requêtes mesurées (duration_s borne optionnellement la durée)
+    warmup_requests   requêtes envoyées avant la mesure
+    sample_size, seed clients tirés de APP/data/telco_clean.csv (tirage reproductible)
+
+L'application tourne dans le processus via le transport ASGI de httpx (--mode asgi,
+par défaut) ou dans un uvicorn lancé en local (--mode uvicorn) ; aucun accès réseau
+n'est nécessaire. Pour chaque scénario : débit (requêtes/s et clients/s), latences
+p50/p95/p99, taux d'erreur et pic de mémoire résidente du serveur.
+
+Les résultats sont écrits en JSON (--output) ; avec --baseline, un précédent fichier
+de résultats sert de référence et le script sort en erreur (code 1) si un scénario
+régresse au-delà de --tolerance.
+
+Lancer depuis la racine du projet :
+    python -m benchmarks.loadtest --output bench_results.json
+    python -m benchmarks.loadtest benchmarks/scenarios/predict_single_c32.json --mode uvicorn
+    python -m benchmarks.loadtest --baseline bench_results.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_workers import free_port
+
+SCENARIO_DIR = os.path.join(os.path.dirname(__file__), "scenarios")
+
+# Variables d'environnement de l'API recopiées dans les résultats, pour comparer des exécutions
+ENV_SETTINGS = {
+    "INFERENCE_ENGINE", "INFERENCE_THREADS", "MODEL_THREADS", "MICROBATCH_ENABLED",
+    "PREDICTION_CACHE_SIZE", "STREAM_CHUNK_SIZE", "METRICS_ENABLED", "API_THREADS",
+}
+
+
+def load_scenario(path):
+    with open(path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    scenario.setdefault("batch_size", 1)
+    scenario.setdefault("concurrency", 1)
+    scenario.setdefault("requests", 100)
+    scenario.setdefault("warmup_requests", 0)
+    scenario.setdefault("seed", 0)
+    if scenario["payload"] not in ("single", "batch", "stream", "columnar"):
+        raise ValueError(f"{path} : payload inconnu {scenario['payload']!r} (single, batch, stream ou columnar)")
+    return scenario
+
+
+def build_requests(scenario, df):
+    """Corps des requêtes du scénario (json= ou content=), construits avant la mesure."""
+    rng = np.random.default_rng(scenario["seed"])
+    sample_size = min(scenario.get("sample_size", len(df)), len(df))
+    pool = df.iloc[rng.choice(len(df), sample_size, replace=False)].reset_index(drop=True)
+    customers = pool.drop(columns=["customerID", "Churn"]).to_dict("records")
+    n_requests = scenario["requests"] + scenario["warmup_requests"]
+    size = scenario["batch_size"]
+
+    bodies = []
+    for _ in range(n_requests):
+        if scenario["payload"] == "single":
+            bodies.append({"json": customers[rng.integers(len(customers))]})
+            continue
+        rows = rng.integers(len(pool), size=size)
+        if scenario["payload"] == "batch":
+            bodies.append({"json": [customers[i] for i in rows]})
+        elif scenario["payload"] == "columnar":
+            bodies.append(columnar_body(pool.iloc[rows], scenario.get("format", "arrow")))
+        elif scenario.get("format", "ndjson") == "csv":
+            bodies.append({"content": pool.iloc[rows].to_csv(index=False).encode(),
+                           "headers": {"Content-Type": "text/csv"}})
+        else:
+            lines = "\n".join(json.dumps(customers[i]) for i in rows)
+            bodies.append({"content": lines.encode(), "headers": {"Content-Type": "application/x-ndjson"}})
+    return bodies
+
+
+def columnar_body(df, output_format):
+    """Corps de requête Arrow IPC ou Parquet pour /predict/columnar."""
+    import pyarrow as pa
+    from API.columnar import MEDIA_TYPES, write_table
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return {"content": write_table(table, output_format), "headers": {"Content-Type": MEDIA_TYPES[output_format]}}
+
+
+def is_error(scenario, response):
+    if response.status_code != 200:
+        return True
+    if scenario["payload"] == "stream":
+        return '"summary"' not in response.text.rsplit("\n", 2)[-2]
+    if scenario["payload"] == "columnar":
+        return "json" in response.headers.get("content-type", "")
+    return "error" in response.json()
+
+
+async def run_scenario(client, scenario, bodies):
+    """Envoie les requêtes de chauffe puis les requêtes mesurées avec `concurrency` clients."""
+    warmup = scenario["warmup_requests"]
+    for body in bodies[:warmup]:
+        await client.post(scenario["endpoint"], **body)
+
+    queue = iter(bodies[warmup:])
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + scenario.get("duration_s", float("inf"))
+
+    async def worker():
+        nonlocal errors
+        for body in queue:
+            if time.perf_counter() > deadline:
+                return
+            t0 = time.perf_counter()
+            try:
+                failed = is_error(scenario, await client.post(scenario["endpoint"], **body))
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - t0)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(scenario["concurrency"])))
+    elapsed = time.perf_counter() - started
+
+    values = np.asarray(latencies) * 1000
+    return {
+        "name": scenario["name"],
+        "endpoint": scenario["endpoint"],
+        "concurrency": scenario["concurrency"],
+        "batch_size": scenario["batch_size"],
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "duration_s": round(elapsed, 3),
+        "req_per_s": round(len(latencies) / elapsed, 2),
+        "rows_per_s": round(len(latencies) * scenario["batch_size"] / elapsed, 1),
+        **{f"p{q}_ms": round(float(np.percentile(values, q)), 3) for q in (50, 95, 99)},
+    }
+
+
+def self_peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def process_peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+async def run_asgi(scenarios, requests_by_name):
+    """Application importée dans ce processus ; la mémoire mesurée inclut donc le client de charge."""
+    from API.main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for scenario in scenarios:
+                result = await run_scenario(client, scenario, requests_by_name[scenario["name"]])
+                results.append({**result, "peak_rss_mb": self_peak_rss_mb()})
+    return results
+
+
+async def run_uvicorn(scenarios, requests_by_name, startup_timeout):
+    port = free_port()
+    env = {**os.environ, "PYTHONWARNINGS": "ignore", "MODEL_POLL_INTERVAL": "0"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "API.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(s["concurrency"] for s in scenarios) + 1)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+            started = time.perf_counter()
+            while True:
+                if server.poll() is not None or time.perf_counter() - started > startup_timeout:
+                    raise RuntimeError("uvicorn n'a pas démarré")
+                try:
+                    if (await client.get("/models")).json().get("serving"):
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+            for scenario in scenarios:
+                result = await run_scenario(client, scenario, requests_by_name[scenario["name"]])
+                results.append({**result, "peak_rss_mb": process_peak_rss_mb(server.pid)})
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Scénarios dont le débit, la latence p95 ou le taux d'erreur régressent par rapport à la référence."""
+    reference = {r["name"]: r for r in baseline["scenarios"]}
+    regressions = []
+    for r in results:
+        ref = reference.get(r["name"])
+        if ref is None:
+            continue
+        if r["req_per_s"] < ref["req_per_s"] * (1 - tolerance):
+            regressions.append(f"{r['name']} : débit {r['req_per_s']} req/s (référence {ref['req_per_s']})")
+        if r["p95_ms"] > ref["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['name']} : p95 {r['p95_ms']} ms (référence {ref['p95_ms']})")
+        if r["error_rate"] > ref["error_rate"] + 0.01:
+            regressions.append(f"{r['name']} : taux d'erreur {r['error_rate']} (référence {ref['error_rate']})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help="fichiers de scénario (par défaut benchmarks/scenarios/*.json)")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--data", default="APP/data/telco_clean.csv")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="écart relatif toléré (0.15 = 15 %%)")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    paths = args.scenarios or sorted(glob.glob(os.path.join(SCENARIO_DIR, "*.json")))
+    scenarios = [load_scenario(path) for path in paths]
+    df = pd.read_csv(args.data)
+    requests_by_name = {s["name"]: build_requests(s, df) for s in scenarios}
+
+    if args.mode == "asgi":
+        results = asyncio.run(run_asgi(scenarios, requests_by_name))
+    else:
+        results = asyncio.run(run_uvicorn(scenarios, requests_by_name, args.startup_timeout))
+
+    print(f"{'scénario':<22} {'req/s':>9} {'lignes/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'erreurs':>8} {'RSS max':>9}")
+    for r in results:
+        print(f"{r['name']:<22} {r['req_per_s']:>9.1f} {r['rows_per_s']:>10,.0f} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['error_rate']:>8.2%} {r['peak_rss_mb']:>7.1f}Mo")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items() if k in ENV_SETTINGS},
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("mode") != args.mode:
+            print(f"Avertissement : référence mesurée en mode {baseline['meta'].get('mode')}, exécution en mode {args.mode}.")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"RÉGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("Aucune régression par rapport à la référence.")
+
+
+if __name__ == "__main__":
+    main()
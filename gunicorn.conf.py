@@ -0,0 +1,35 @@
+# Configuration gunicorn pour servir l'API avec plusieurs workers :
+#     gunicorn -c gunicorn.conf.py API.main:app
+#
+# Avec preload_app, le modèle est chargé une seule fois dans le processus maître
+# puis partagé par tous les workers après le fork (copy-on-write) : la mémoire
+# et le temps de démarrage ne croissent plus avec le nombre de workers.
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# Nombre de workers (WEB_CONCURRENCY, convention des hébergeurs) et threads par worker
+workers = int(os.environ.get("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+
+# GUNICORN_PRELOAD=0 pour revenir à un chargement du modèle par worker
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+# Les workers uvicorn sont asynchrones : `threads` dimensionne le pool des endpoints synchrones
+os.environ.setdefault("API_THREADS", str(threads))
+
+# Pool d'inférence par worker et parallélisme interne du modèle : au plus un thread de calcul par cœur
+os.environ.setdefault("INFERENCE_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+os.environ.setdefault("MODEL_THREADS", "1")
+
+
+def when_ready(server):
+    # Objets du modèle déplacés dans la génération permanente du ramasse-miettes :
+    # les collectes des workers ne réécrivent plus leurs en-têtes, les pages restent partagées
+    if preload_app:
+        gc.freeze()
@@ -1 +1,6 @@
-from API.main import app
\ No newline at end of file
+import os
+
+# Démarrage à froid rapide en serverless : version servie depuis l'artefact compact (voir API/main.py)
+os.environ.setdefault("FAST_STARTUP", "1")
+
+from API.main import app
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+APP_DIR = Path(__file__).resolve().parent.parent / "APP"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+from utils.dashboard_backend import InMemoryBackend
+from utils.delta_refresh import DeltaRefresher, DeltaSource
+from utils.filter_index import FilterIndex
+from utils.kpi_cube import KpiCube
+
+DATA = APP_DIR / "data" / "telco_clean.csv"
+
+
+def backend_and_rows(n_base=200):
+    raw = pd.read_csv(DATA)
+    base = raw.iloc[:n_base].copy()
+    for column in base.columns:
+        if base[column].dtype == object and column != "customerID":
+            base[column] = base[column].astype("category")
+    return InMemoryBackend(base, FilterIndex(base), KpiCube(base)), raw.iloc[n_base:n_base + 2]
+
+
+def csv_lines(rows):
+    return rows.to_csv(index=False).splitlines()
+
+
+def test_bad_line_does_not_drop_the_good_lines_after_it(tmp_path):
+    backend, rows = backend_and_rows()
+    header, first, second = csv_lines(rows)
+    bad = first + ",champ,en,trop"
+    # TotalCharges vide : montant manquant, la ligne est gardée
+    blank_total = second.rsplit(",", 2)[0] + ", ," + second.rsplit(",", 1)[1]
+    (tmp_path / "new.csv").write_text("\n".join([header, bad, first, blank_total]) + "\n", encoding="utf-8")
+
+    added = DeltaRefresher(DeltaSource(str(tmp_path)), backend, interval=1e-9).refresh()
+
+    assert added == 2
+    assert backend.overall_totals()["clients"] == 202
+    assert backend.delta["customerID"].tolist() == rows["customerID"].tolist()
+    assert pd.isna(backend.delta["TotalCharges"].iloc[1])
+
+
+def test_refused_batch_is_read_again_on_the_next_poll(tmp_path):
+    backend, rows = backend_and_rows()
+    (tmp_path / "new.csv").write_text("\n".join(csv_lines(rows)) + "\n", encoding="utf-8")
+    refresher = DeltaRefresher(DeltaSource(str(tmp_path)), backend, interval=1e-9)
+
+    append = backend.append
+    backend.append = lambda frame: (_ for _ in ()).throw(ValueError("refusé"))
+    assert refresher.refresh() == 0
+    backend.append = append
+    assert refresher.refresh() == 2
+    assert backend.overall_totals()["clients"] == 202
+    # Lignes retenues : plus rien à relire
+    assert refresher.refresh() == 0
@@ -0,0 +1,39 @@
+import os
+
+os.environ.setdefault("MODEL_POLL_INTERVAL", "0")
+
+from fastapi.testclient import TestClient
+
+from API.cache import customer_key
+from API.main import app, model_server
+
+CUSTOMER = {
+    "gender": "Female", "SeniorCitizen": 0, "Partner": "Yes", "Dependents": "Yes", "tenure": 60,
+    "PhoneService": "Yes", "MultipleLines": "No", "InternetService": "DSL",
+    "OnlineSecurity": "Yes", "OnlineBackup": "Yes", "DeviceProtection": "No", "TechSupport": "Yes",
+    "StreamingTV": "No", "StreamingMovies": "No", "Contract": "Two year",
+    "PaperlessBilling": "No", "PaymentMethod": "Bank transfer (automatic)",
+    "MonthlyCharges": 65.0, "TotalCharges": 3900.0
+}
+
+
+def expected_probability(customer):
+    _, churn_proba = model_server.current.predictor.predict_one(customer)
+    return f"{churn_proba * 100:.2f}%"
+
+
+def test_padded_and_clean_categories_do_not_share_a_wrong_cache_entry():
+    """Une valeur entourée d'espaces s'encode comme la valeur nette : même clé, même probabilité."""
+    padded = {**CUSTOMER, "Contract": "Two year ", "InternetService": " DSL"}
+    assert customer_key(padded) == customer_key(CUSTOMER)
+    with TestClient(app) as client:
+        padded_proba = client.post("/predict", json=padded).json()["probabilité"]
+        clean_proba = client.post("/predict", json=CUSTOMER).json()["probabilité"]
+    assert clean_proba == expected_probability(CUSTOMER)
+    assert padded_proba == clean_proba
+
+
+def test_encoder_strips_categories_like_the_cache_key():
+    encoder = model_server.current.predictor.encoder
+    padded = {**CUSTOMER, "Contract": "Two year ", "PaperlessBilling": "Non "}
+    assert (encoder.encode_one(padded) == encoder.encode_one({**CUSTOMER, "PaperlessBilling": "No"})).all()